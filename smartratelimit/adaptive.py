@@ -0,0 +1,133 @@
+"""Rate limits learned from the responses of APIs that do not report them."""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from smartratelimit.models import RateLimit
+from smartratelimit.storage import StorageBackend
+
+# Response statuses that mean requests are going out too fast
+BACKOFF_STATUSES = frozenset({429, 503})
+
+
+class AdaptiveRate:
+    """
+    An endpoint's limit, found by additive increase, multiplicative decrease.
+
+    Successful responses raise the limit by ``increase`` per window's worth
+    of requests; a 429 or 503 multiplies it by ``decrease``, at most once
+    per window so a burst of rejections counts as one signal. The rate is
+    kept in storage, so every process sharing it converges on one limit.
+    Increases are summed in process and written at most once per window;
+    only cuts are written as soon as they are seen.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        key: str,
+        limit: int,
+        window: timedelta,
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ):
+        if min_limit < 1:
+            raise ValueError(f"min_limit must be at least 1: {min_limit}")
+        if max_limit is not None and max_limit < min_limit:
+            raise ValueError(f"max_limit must not be below min_limit: {max_limit}")
+        if increase <= 0:
+            raise ValueError(f"increase must be positive: {increase}")
+        if not 0 < decrease < 1:
+            raise ValueError(f"decrease must be in (0, 1): {decrease}")
+        if window.total_seconds() <= 0:
+            raise ValueError(f"window must be positive: {window}")
+        self.storage = storage
+        self.key = key
+        self.window = window
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        # Start from the rate other processes have learned, if any
+        self.rate = storage.adapt_rate(key, float(limit), minimum=min_limit, maximum=max_limit)
+        # Increases not yet written, and when storage was last written (monotonic)
+        self._pending = 0.0
+        self._written_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self) -> int:
+        """The learned rate as a whole number of requests per window."""
+        # Allow for rounding in the sum of fractional increases
+        return max(self.min_limit, int(self.rate + 1e-9))
+
+    def adjustment(self, status_code: int) -> Optional[Tuple[float, float]]:
+        """
+        Record one response, getting the ``(increase, factor)`` to write now.
+
+        Returns:
+            The step for ``storage.adapt_rate``, or None if there is nothing
+            to write yet: the response tells nothing, or it is a success
+            whose increase waits for the rest of the window's
+        """
+        if status_code in BACKOFF_STATUSES:
+            factor = self.decrease
+        elif status_code < 400:
+            factor = 1.0
+        else:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            if factor == 1.0:
+                self._pending += self.increase / self.limit
+                if now - self._written_at < self.window.total_seconds():
+                    return None
+            increase, self._pending = self._pending, 0.0
+            self._written_at = now
+        # A cut applies to the rate the held-back increases reached
+        return increase * factor, factor
+
+    def learn(self, rate: float) -> Optional[int]:
+        """Record the rate after an adjustment, returning the new limit if it changed."""
+        before = self.limit
+        self.rate = rate
+        limit = self.limit
+        return limit if limit != before else None
+
+    def update(self, status_code: int) -> Optional[int]:
+        """
+        Learn from one response.
+
+        Returns:
+            The new limit if it changed, otherwise None
+        """
+        step = self.adjustment(status_code)
+        if step is None:
+            return None
+        increase, factor = step
+        return self.learn(
+            self.storage.adapt_rate(
+                self.key, self.rate, increase, factor, self.min_limit, self.max_limit, self.hold
+            )
+        )
+
+    @property
+    def hold(self) -> float:
+        """Seconds between cuts: one window, for the last cut to take effect."""
+        return self.window.total_seconds()
+
+    def to_rate_limit(self, endpoint: str) -> RateLimit:
+        """Describe the learned limit as the endpoint's rate limit."""
+        limit = self.limit
+        return RateLimit(
+            endpoint=endpoint,
+            limit=limit,
+            remaining=limit,
+            reset_time=datetime.utcnow() + self.window,
+            window=self.window,
+        )
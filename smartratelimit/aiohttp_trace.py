@@ -0,0 +1,177 @@
+"""aiohttp tracing hooks that rate limit every request a session sends."""
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Optional, Set
+
+try:
+    import aiohttp
+    from yarl import URL
+except ImportError:
+    raise ImportError(
+        "aiohttp support requires the 'aiohttp' package. "
+        "Install it with: pip install smartratelimit[aiohttp]"
+    )
+
+from smartratelimit.async_client import AsyncRateLimiter
+from smartratelimit.core import CostEstimate
+
+
+class RateLimitTraceConfig(aiohttp.TraceConfig):
+    """
+    aiohttp ``TraceConfig`` that rate limits every request a session sends.
+
+    Pass it to a session to limit all of its traffic, and get back the
+    native ``ClientResponse``, unread, so bodies can be streamed:
+
+        >>> trace = RateLimitTraceConfig(AsyncRateLimiter())
+        >>> async with aiohttp.ClientSession(trace_configs=[trace]) as session:
+        ...     async with session.get("https://api.github.com/users/octocat") as response:
+        ...         async for chunk in response.content.iter_chunked(65536):
+        ...             ...
+
+    Tokens are taken in ``on_request_start``, before the request is sent;
+    limits detected in the response headers update the limiter in
+    ``on_request_end``, before the body is read. A concurrency slot is held
+    until the response's connection is released, so a body being streamed
+    counts as in flight. Each redirect hop is limited as a request of its
+    own in ``on_request_redirect``. 429 responses are returned to the
+    caller rather than retried.
+
+    Per-request settings go in ``trace_request_ctx``, a dict with any of
+    ``cost``, ``priority``, ``weight`` and ``max_wait``, e.g.
+    ``session.get(url, trace_request_ctx={"priority": 10})``.
+    """
+
+    def __init__(
+        self,
+        limiter: AsyncRateLimiter,
+        cost: Optional[CostEstimate] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+    ):
+        """
+        Initialize the trace config.
+
+        Args:
+            limiter: Rate limiter whose limits and storage to use
+            cost: Tokens to charge each request up front, or a function of
+                (method, url, {"headers": headers}) estimating them
+            priority: Class of requests when tokens are scarce
+            weight: Share of the class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit
+        """
+        super().__init__()
+        self._limiter = limiter
+        self._cost = cost
+        self._priority = priority
+        self._weight = weight
+        self._max_wait = max_wait
+        self._releasing: Set[asyncio.Future] = set()
+        self.on_request_start.append(self._before_request)
+        self.on_request_end.append(self._after_request)
+        self.on_request_redirect.append(self._after_redirect)
+        self.on_request_exception.append(self._after_failure)
+
+    async def _before_request(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestStartParams,
+    ) -> None:
+        """Wait for tokens and a concurrency slot before the request is sent."""
+        context.release = None
+        await self._admit(context, params.method, str(params.url), params.headers)
+
+    async def _after_redirect(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestRedirectParams,
+    ) -> None:
+        """Settle a redirect hop, then wait for the limits of the next one."""
+        response = params.response
+        location = response.headers.get("Location") or response.headers.get("URI")
+        if location is None:
+            # aiohttp returns the redirect itself as the final response
+            return
+        try:
+            await self._limiter._update_from_response(response)
+        finally:
+            # aiohttp releases the redirect without reading its body
+            release, context.release = context.release, None
+            if release is not None:
+                await release()
+        try:
+            url = params.url.join(URL(location))
+        except ValueError:
+            return  # aiohttp refuses to follow it
+        await self._admit(context, params.method, str(url), params.headers)
+
+    async def _admit(self, context: SimpleNamespace, method: str, url: str, headers: Any) -> None:
+        """Take tokens and a concurrency slot for one request or redirect hop."""
+        limiter = self._limiter
+        overrides = context.trace_request_ctx if isinstance(context.trace_request_ctx, dict) else {}
+        cost = overrides.get("cost", self._cost)
+        max_wait = overrides.get("max_wait", self._max_wait)
+        endpoint = limiter._get_endpoint_key(url)
+        deadline = None if max_wait is None else asyncio.get_running_loop().time() + max_wait
+        charged = limiter._sync_limiter._estimate_cost(cost, method, url, {"headers": headers})
+
+        rate_limit = await limiter._limit_for(endpoint)
+        if rate_limit:
+            await limiter._acquire(
+                endpoint,
+                rate_limit,
+                url,
+                charged,
+                overrides.get("priority", self._priority),
+                overrides.get("weight", self._weight),
+                max_wait,
+            )
+        context.release = await limiter._hold_slot(endpoint, url, deadline, rate_limit, charged)
+
+    async def _after_request(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestEndParams,
+    ) -> None:
+        """Learn limits from the response headers; the body is left unread."""
+        response = params.response
+        try:
+            await self._limiter._update_from_response(response)
+        finally:
+            release, context.release = context.release, None
+            if release is not None:
+                self._release_with(response, release)
+
+    async def _after_failure(
+        self,
+        session: aiohttp.ClientSession,
+        context: SimpleNamespace,
+        params: aiohttp.TraceRequestExceptionParams,
+    ) -> None:
+        """Give back the concurrency slot of a request that failed."""
+        release, context.release = getattr(context, "release", None), None
+        if release is not None:
+            await release()
+
+    def _release_with(
+        self, response: aiohttp.ClientResponse, release: Callable[[], Awaitable[None]]
+    ) -> None:
+        """Give back a concurrency slot once the response's connection is released."""
+
+        def schedule() -> None:
+            # Connection callbacks are synchronous; keep the task until it is done
+            task = asyncio.ensure_future(release())
+            self._releasing.add(task)
+            task.add_done_callback(self._releasing.discard)
+
+        connection = response.connection
+        if connection is None:
+            # The body was already read, or there is none
+            schedule()
+        else:
+            connection.add_callback(schedule)
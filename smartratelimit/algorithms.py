@@ -0,0 +1,209 @@
+"""Rate limiting algorithms selectable per limiter.
+
+Storage backends keep the per-key state; the functions here are the pure
+state transitions shared by the in-process backends. RedisStorage mirrors
+them in Lua (see ``redis_scripts``).
+"""
+
+import bisect
+import math
+from typing import Deque, Optional, Tuple
+
+TOKEN_BUCKET = "token_bucket"
+GCRA = "gcra"
+SLIDING_LOG = "sliding_log"
+SLIDING_WINDOW = "sliding_window"
+
+ALGORITHMS = (TOKEN_BUCKET, GCRA, SLIDING_LOG, SLIDING_WINDOW)
+
+# Waits shorter than this are float rounding in the TAT arithmetic
+GCRA_TOLERANCE = 1e-9
+
+# (window index, previous window count, current window count)
+WindowCounterState = Tuple[int, float, float]
+
+
+def validate_algorithm(algorithm: str) -> str:
+    """Return the algorithm name, raising ValueError if it is unknown."""
+    if algorithm not in ALGORITHMS:
+        raise ValueError(
+            f"Unknown rate limit algorithm: {algorithm}. " f"Choose one of: {', '.join(ALGORITHMS)}"
+        )
+    return algorithm
+
+
+def gcra_acquire(
+    tat: Optional[float],
+    now: float,
+    tokens: float,
+    limit: int,
+    window_seconds: float,
+    max_wait: Optional[float] = 0.0,
+) -> Tuple[bool, float, Optional[float]]:
+    """
+    Generic cell rate algorithm step.
+
+    GCRA keeps a single "theoretical arrival time" (TAT) per key: the time at
+    which the key would be fully idle again. Each request pushes it forward by
+    one emission interval (``window / limit``) per token, and is allowed while
+    the TAT stays within ``limit`` intervals of now, which gives the same
+    burst and sustained rate as a token bucket of capacity ``limit``.
+
+    Args:
+        tat: Stored theoretical arrival time, or None for a new key
+        now: Current time on the same timeline as ``tat``
+        tokens: Number of tokens to take
+        limit: Requests allowed per window (also the burst size)
+        window_seconds: Window length in seconds
+        max_wait: Book ahead if allowed within this many seconds (None for no bound)
+
+    Returns:
+        Tuple of (granted, wait_seconds, new_tat). ``new_tat`` is None when
+        the request was refused and the stored value must not change.
+    """
+    if limit <= 0 or window_seconds <= 0:
+        return False, float("inf"), None
+
+    interval = window_seconds / limit
+    if tat is None or tat < now:
+        tat = now
+
+    new_tat = tat + tokens * interval
+    wait = new_tat - limit * interval - now
+    if wait <= GCRA_TOLERANCE:
+        return True, 0.0, new_tat
+    if max_wait is None or wait <= max_wait:
+        return True, wait, new_tat
+    return False, wait, None
+
+
+def gcra_tat_for_remaining(now: float, remaining: int, limit: int, window_seconds: float) -> float:
+    """TAT that leaves exactly ``remaining`` requests available at ``now``."""
+    if limit <= 0:
+        return now
+    used = max(0, limit - remaining)
+    return now + used * (window_seconds / limit)
+
+
+def sliding_log_acquire(
+    log: Deque[float],
+    now: float,
+    tokens: float,
+    limit: int,
+    window_seconds: float,
+    max_wait: Optional[float] = 0.0,
+    not_before: Optional[float] = None,
+) -> Tuple[bool, float]:
+    """
+    Sliding-window-log step (exact rolling window).
+
+    ``log`` holds one timestamp per admitted request, oldest first, and is
+    updated in place. Only the newest ``limit`` entries can ever decide a
+    wait, so callers should bound it with ``deque(maxlen=limit)``. Booked
+    requests are logged at the future time they are allowed to go out, or at
+    ``not_before`` if another limit holds them back longer.
+
+    Returns:
+        Tuple of (granted, wait_seconds)
+    """
+    count = int(math.ceil(tokens))
+    if count > limit or window_seconds <= 0:
+        return False, float("inf")
+
+    horizon = now - window_seconds
+    while log and log[0] <= horizon:
+        log.popleft()
+
+    excess = len(log) + count - limit
+    wait = 0.0
+    if excess > 0:
+        # The request fits once the excess-th oldest entry leaves the window
+        wait = log[excess - 1] + window_seconds - now
+        if max_wait is not None and wait > max_wait:
+            return False, wait
+
+    at = now + wait if not_before is None else max(now + wait, not_before)
+    for _ in range(count):
+        if log and at < log[-1]:
+            # Earlier than a booked entry: keep the log ordered
+            if len(log) == log.maxlen:
+                log.popleft()
+            log.insert(bisect.bisect_right(log, at), at)
+        else:
+            log.append(at)
+    return True, wait
+
+
+def sliding_window_acquire(
+    state: Optional[WindowCounterState],
+    now: float,
+    tokens: float,
+    limit: int,
+    window_seconds: float,
+    max_wait: Optional[float] = 0.0,
+) -> Tuple[bool, float, Optional[WindowCounterState]]:
+    """
+    Sliding-window-counter step (two fixed windows, weighted).
+
+    Estimates the rolling count as ``previous * (1 - elapsed / window) +
+    current``, which needs constant memory per key regardless of the limit.
+
+    Returns:
+        Tuple of (granted, wait_seconds, new_state). ``new_state`` is None
+        when the request was refused and the stored value must not change.
+    """
+    if tokens > limit or window_seconds <= 0:
+        return False, float("inf"), None
+
+    index = int(now // window_seconds)
+    previous, current = 0.0, 0.0
+    if state is not None:
+        if state[0] == index:
+            previous, current = state[1], state[2]
+        elif state[0] == index - 1:
+            previous = state[2]
+
+    elapsed = now - index * window_seconds
+    estimated = previous * (1 - elapsed / window_seconds) + current
+    if estimated + tokens <= limit:
+        return True, 0.0, (index, previous, current + tokens)
+
+    if current + tokens <= limit:
+        # Fits later in this window, once enough of the previous one decays
+        fits_at = window_seconds * (1 - (limit - current - tokens) / previous)
+        wait = fits_at - elapsed
+    else:
+        # Current window is full; it becomes the decaying one after rollover
+        fits_at = window_seconds * (1 - (limit - tokens) / current)
+        wait = window_seconds - elapsed + max(0.0, fits_at)
+
+    if max_wait is None or wait <= max_wait:
+        return True, wait, (index, previous, current + tokens)
+    return False, wait, None
+
+
+def gcra_refund(
+    tat: Optional[float], now: float, tokens: float, limit: int, window_seconds: float
+) -> Optional[float]:
+    """Give ``tokens`` back to a GCRA key; returns None once the key is idle."""
+    if tat is None or limit <= 0:
+        return None
+    tat -= tokens * (window_seconds / limit)
+    return tat if tat > now else None
+
+
+def sliding_log_refund(log: Deque[float], tokens: float) -> None:
+    """Drop the newest logged requests for ``tokens`` refunded tokens (in place)."""
+    # Rounded up like the charge, so a fractional cost is given back whole
+    for _ in range(min(len(log), int(math.ceil(tokens)))):
+        log.pop()
+
+
+def sliding_window_refund(
+    state: Optional[WindowCounterState], tokens: float
+) -> Optional[WindowCounterState]:
+    """Take ``tokens`` back off the current window's count."""
+    if state is None:
+        return None
+    index, previous, current = state
+    return index, previous, max(0.0, current - tokens)
@@ -2,13 +2,34 @@
 
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Union
-from urllib.parse import urlparse
-
+import time
+from contextlib import asynccontextmanager
+from datetime import timedelta
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from smartratelimit.async_storage import (
+    AsyncRedisStorage,
+    AsyncStorageBackend,
+    InlineStorage,
+    ThreadedStorage,
+)
 from smartratelimit.detector import RateLimitDetector
-from smartratelimit.models import RateLimit, RateLimitStatus, TokenBucket
-from smartratelimit.storage import StorageBackend
+from smartratelimit.models import RateLimit, RateLimitStatus
+from smartratelimit.scheduling import AsyncWaitQueue
+from smartratelimit.storage import MemoryStorage, RedisStorage, StorageBackend
+
+if TYPE_CHECKING:
+    from smartratelimit.core import CostEstimate, ResponseCost
 
 logger = logging.getLogger(__name__)
 
@@ -26,114 +47,340 @@ class AsyncRateLimiter:
 
     def __init__(
         self,
-        storage: str = "memory",
+        storage: Union[str, StorageBackend, AsyncStorageBackend] = "memory",
         default_limits: Optional[Dict[str, int]] = None,
         headers_map: Optional[Dict[str, str]] = None,
         raise_on_limit: bool = False,
+        algorithm: str = "token_bucket",
+        routes: Optional[Dict[str, List[str]]] = None,
+        cost: "CostEstimate" = 1,
+        actual_cost: Optional["ResponseCost"] = None,
+        no_limit_ttl: float = 10.0,
+        scheduling: str = "priority",
     ):
         """
         Initialize async rate limiter.
 
         Args:
-            storage: Storage backend ('memory', 'sqlite:///path', 'redis://host:port')
-            default_limits: Default limits like {'requests_per_second': 10}
+            storage: Storage backend ('memory', 'sqlite:///path', 'redis://host:port'),
+                or a StorageBackend or AsyncStorageBackend instance. Requests
+                await storage without blocking the event loop: Redis through
+                redis.asyncio, other backends on a worker thread
+            default_limits: Default limits like {'requests_per_second': 10}; every
+                window given is enforced, optionally with an 'algorithm' key for
+                the endpoints they apply to
             headers_map: Custom header name mapping
             raise_on_limit: If True, raise exception instead of waiting
+            algorithm: Default limiting algorithm ('token_bucket', 'gcra',
+                'sliding_log' or 'sliding_window')
+            routes: Route templates per host, e.g.
+                {'api.github.com': ['/search', '/repos/{owner}/{repo}/issues']};
+                requests matching a route get their own limits
+            cost: Tokens each request is charged up front, or a function of
+                (method, url, kwargs) estimating them
+            actual_cost: Function reading a request's true cost from its
+                response; the difference from the charged cost is debited
+                or refunded
+            no_limit_ttl: Seconds to remember that an endpoint has no known
+                limits, skipping storage lookups for it (0 to always look up)
+            scheduling: How requests waiting on an endpoint are ordered:
+                'priority' admits higher priorities first, 'fair' shares
+                admissions between priorities by their weights
         """
         from smartratelimit.core import RateLimiter
 
         # Reuse the storage creation logic from sync RateLimiter
+        async_storage = storage if isinstance(storage, AsyncStorageBackend) else None
         sync_limiter = RateLimiter(
-            storage=storage,
+            storage=storage if async_storage is None else async_storage.sync_backend,
             default_limits=default_limits,
             headers_map=headers_map,
             raise_on_limit=raise_on_limit,
+            algorithm=algorithm,
+            routes=routes,
+            cost=cost,
+            actual_cost=actual_cost,
+            no_limit_ttl=no_limit_ttl,
+            scheduling=scheduling,
         )
+        self._sync_limiter = sync_limiter
         self._storage = sync_limiter._storage
+        self._async_storage = async_storage or self._create_async_storage(storage)
         self._detector = sync_limiter._detector
         self._default_limits = sync_limiter._default_limits
         self._raise_on_limit = sync_limiter._raise_on_limit
+        self._algorithm = sync_limiter._algorithm
+        self._endpoint_algorithms = sync_limiter._endpoint_algorithms
+        self._composite_limits = sync_limiter._composite_limits
+        self._token_limits = sync_limiter._token_limits
+        self._leases = sync_limiter._leases
+        self._no_limits = sync_limiter._no_limits
+        self._routes = sync_limiter._routes
+        self._concurrency = sync_limiter._concurrency
+        self._wait_queues: Dict[str, AsyncWaitQueue] = {}
 
     async def __aenter__(self):
         """Async context manager entry."""
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Async context manager exit."""
-        pass
-
-    @staticmethod
-    def _get_endpoint_key(url: str) -> str:
-        """Extract endpoint key from URL."""
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}"
+        """Async context manager exit; gives back unused leased tokens."""
+        await self.aclose()
+
+    def _create_async_storage(self, storage: Union[str, StorageBackend]) -> AsyncStorageBackend:
+        """Get an awaitable view of the storage the sync limiter created."""
+        if isinstance(self._storage, MemoryStorage):
+            return InlineStorage(self._storage)
+        if isinstance(storage, str) and isinstance(self._storage, RedisStorage):
+            try:
+                return AsyncRedisStorage(storage, key_prefix=self._storage.key_prefix)
+            except ImportError as e:
+                logger.warning(f"redis.asyncio not available: {e}, using a worker thread")
+        return ThreadedStorage(self._storage)
+
+    def _get_endpoint_key(self, url: str) -> str:
+        """Extract endpoint key from URL, including the route if one matches."""
+        return self._sync_limiter._request_context(url).endpoint
 
     def _get_bucket_key(self, url: str, limit_type: str = "default") -> str:
         """Get token bucket key for URL."""
-        endpoint = self._get_endpoint_key(url)
-        return f"{endpoint}:{limit_type}"
-
-    def _get_or_create_bucket(
-        self, url: str, limit: int, window: timedelta
-    ) -> TokenBucket:
-        """Get or create token bucket for URL."""
-        key = self._get_bucket_key(url)
-        bucket = self._storage.get_token_bucket(key)
-
-        if bucket is None:
-            capacity = float(limit)
-            refill_rate = capacity / window.total_seconds()
-            bucket = TokenBucket(
-                capacity=capacity,
-                tokens=capacity,
-                refill_rate=refill_rate,
+        return self._sync_limiter._request_context(url).bucket_key(limit_type)
+
+    def _algorithm_for(self, endpoint: str) -> str:
+        """Get the limiting algorithm configured for an endpoint."""
+        return self._endpoint_algorithms.get(endpoint, self._algorithm)
+
+    def _bucket_limits(
+        self, endpoint: str, rate_limit: RateLimit
+    ) -> List[Tuple[str, int, timedelta]]:
+        """Get the ``(key, limit, window)`` triples a request must fit."""
+        return self._sync_limiter._bucket_limits(endpoint, rate_limit)
+
+    async def _lookup_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get the stored rate limit for an endpoint, remembering when there is none."""
+        expires_at = self._no_limits.get(endpoint)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                return None
+            self._no_limits.pop(endpoint, None)
+
+        rate_limit = await self._async_storage.get_rate_limit(endpoint)
+        if rate_limit is None and not self._default_limits and self._sync_limiter._no_limit_ttl > 0:
+            self._no_limits[endpoint] = time.monotonic() + self._sync_limiter._no_limit_ttl
+        return rate_limit
+
+    async def _limit_for(self, endpoint: str) -> Optional[RateLimit]:
+        """Get the rate limit a request must fit, applying default limits if none is stored."""
+        rate_limit = await self._lookup_rate_limit(endpoint)
+        if rate_limit is None and self._default_limits:
+            rate_limit = self._sync_limiter._default_rate_limit(endpoint)
+            if rate_limit is not None:
+                await self._async_storage.set_rate_limit(endpoint, rate_limit)
+        return rate_limit
+
+    async def _take(
+        self, endpoint: str, rate_limit: RateLimit, tokens: float, max_wait: Optional[float]
+    ) -> Tuple[bool, float]:
+        """Take a request's tokens from every bucket of an endpoint (see ``RateLimiter._take``)."""
+        if endpoint in self._sync_limiter._lease_policies:
+            # Leased tokens are spent in process, but a refill calls storage
+            return await self._async_storage.run_sync(
+                self._sync_limiter._take, endpoint, rate_limit, tokens, max_wait
             )
-            self._storage.set_token_bucket(key, bucket)
-        else:
-            window_seconds = window.total_seconds()
-            if window_seconds > 0:
-                bucket.refill_rate = float(limit) / window_seconds
-                bucket.capacity = float(limit)
-
-        return bucket
-
-    async def _wait_for_token(self, bucket: TokenBucket, url: str) -> None:
-        """Wait until token is available (async)."""
-        wait_time = bucket.wait_time()
-        if wait_time > 0:
-            if self._raise_on_limit:
-                from smartratelimit.core import RateLimitExceeded
 
-                raise RateLimitExceeded(
-                    f"Rate limit exceeded for {url}. Wait {wait_time:.2f} seconds."
-                )
+        algorithm = self._algorithm_for(endpoint)
+        limits = self._bucket_limits(endpoint, rate_limit)
+        if endpoint not in self._token_limits:
+            return await self._async_storage.acquire_many(
+                limits, tokens, max_wait=max_wait, algorithm=algorithm
+            )
+
+        granted, wait = await self._async_storage.acquire_many(
+            limits, 1, max_wait=max_wait, algorithm=algorithm
+        )
+        if not granted:
+            return False, wait
+        granted, token_wait = await self._async_storage.acquire_many(
+            self._sync_limiter._cost_limits(endpoint, rate_limit),
+            tokens,
+            max_wait=max_wait,
+            algorithm=algorithm,
+        )
+        if not granted:
+            await self._async_storage.refund(limits, 1, algorithm=algorithm)
+            return False, token_wait
+        return True, max(wait, token_wait)
+
+    async def _refund(self, endpoint: str, rate_limit: RateLimit, tokens: float) -> None:
+        """Give back the tokens ``_take`` took for a request that never went out."""
+        if endpoint in self._sync_limiter._lease_policies:
+            await self._async_storage.run_sync(
+                self._sync_limiter._refund, endpoint, rate_limit, tokens
+            )
+            return
+        algorithm = self._algorithm_for(endpoint)
+        limits = self._bucket_limits(endpoint, rate_limit)
+        if endpoint not in self._token_limits:
+            await self._async_storage.refund(limits, tokens, algorithm=algorithm)
+            return
+        await self._async_storage.refund(limits, 1, algorithm=algorithm)
+        await self._async_storage.refund(
+            self._sync_limiter._cost_limits(endpoint, rate_limit), tokens, algorithm=algorithm
+        )
+
+    async def _reconcile_cost(
+        self,
+        endpoint: str,
+        rate_limit: RateLimit,
+        charged: float,
+        actual_cost: Optional["ResponseCost"],
+        response,
+    ) -> None:
+        """Debit or refund the difference between the charged and the actual cost."""
+        if endpoint in self._sync_limiter._lease_policies:
+            # Settled with the local lease the tokens came from
+            await self._async_storage.run_sync(
+                self._sync_limiter._reconcile_cost,
+                endpoint,
+                rate_limit,
+                charged,
+                actual_cost,
+                response,
+            )
+            return
+        actual_cost = actual_cost or self._sync_limiter._actual_cost
+        if actual_cost is None:
+            return
+        actual = actual_cost(response)
+        if actual is None:
+            return
+
+        difference = float(actual) - charged
+        limits = self._sync_limiter._cost_limits(endpoint, rate_limit)
+        algorithm = self._algorithm_for(endpoint)
+        if difference > 0:
+            # The request already went out, so book the extra for later requests
+            await self._async_storage.acquire_many(
+                limits, difference, max_wait=None, algorithm=algorithm
+            )
+        elif difference < 0:
+            await self._async_storage.refund(limits, -difference, algorithm=algorithm)
+        logger.debug(f"Reconciled cost for {endpoint}: charged {charged}, actual {actual}")
+
+    def _wait_queue(self, endpoint: str) -> AsyncWaitQueue:
+        """Get the queue of coroutines waiting on an endpoint."""
+        queue = self._wait_queues.get(endpoint)
+        if queue is None:
+            queue = self._wait_queues.setdefault(
+                endpoint, AsyncWaitQueue(self._sync_limiter._scheduling)
+            )
+        return queue
+
+    async def _acquire(
+        self,
+        endpoint: str,
+        rate_limit: RateLimit,
+        url: str,
+        tokens: float = 1.0,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+    ) -> None:
+        """Take tokens for the endpoint, sleeping until they are usable (async)."""
+        if max_wait is None and self._raise_on_limit:
+            max_wait = 0.0
 
+        async def sleep(wait_time: float) -> None:
             logger.info(
                 f"Rate limit reached for {url}, waiting {wait_time:.2f} seconds"
             )
             await asyncio.sleep(wait_time)
 
-        bucket.refill()
-        if not bucket.consume():
-            await asyncio.sleep(0.1)
-            bucket.refill()
-            bucket.consume()
+        granted, wait_time = await self._wait_queue(endpoint).admit(
+            lambda max_wait: self._take(endpoint, rate_limit, tokens, max_wait),
+            max_wait,
+            sleep,
+            priority=priority,
+            weight=weight,
+            tokens=tokens,
+            refund=lambda: self._refund(endpoint, rate_limit, tokens),
+        )
+        if not granted:
+            from smartratelimit.core import RateLimitExceeded
+
+            raise RateLimitExceeded(f"Rate limit exceeded for {url}. Wait {wait_time:.2f} seconds.")
+
+    @asynccontextmanager
+    async def _in_flight(
+        self,
+        endpoint: str,
+        url: str,
+        deadline: Optional[float],
+        rate_limit: Optional[RateLimit] = None,
+        tokens: float = 0.0,
+    ) -> AsyncIterator[None]:
+        """Hold one of the endpoint's concurrency slots, if it has a limit (async)."""
+        release = await self._hold_slot(endpoint, url, deadline, rate_limit, tokens)
+        try:
+            yield
+        finally:
+            if release is not None:
+                await release()
+
+    async def _hold_slot(
+        self,
+        endpoint: str,
+        url: str,
+        deadline: Optional[float],
+        rate_limit: Optional[RateLimit] = None,
+        tokens: float = 0.0,
+    ) -> Optional[Callable[[], Awaitable[None]]]:
+        """Take one of the endpoint's concurrency slots (see ``RateLimiter._hold_slot``)."""
+        limit = self._concurrency.get(endpoint)
+        if limit is None:
+            return None
+
+        if deadline is not None:
+            timeout: Optional[float] = max(0.0, deadline - asyncio.get_running_loop().time())
+        else:
+            timeout = 0.0 if self._raise_on_limit else None
+        try:
+            slot = await limit.acquire_async(timeout, self._async_storage)
+            if slot is None:
+                from smartratelimit.core import RateLimitExceeded
 
-    def _update_from_response(self, response) -> None:
-        """Update rate limit info from response headers."""
+                raise RateLimitExceeded(f"Concurrency limit of {limit.limit} reached for {url}.")
+        except BaseException:
+            if rate_limit:
+                # The request is never sent, so its tokens are not spent
+                await self._refund(endpoint, rate_limit, tokens)
+            raise
+        return lambda: limit.release_async(slot, self._async_storage)
+
+    async def _update_from_response(self, response) -> bool:
+        """
+        Update rate limit info from response headers.
+
+        Returns:
+            True if the limiter state was resynchronised with the server
+        """
         # Create a mock response-like object for detector
         class MockResponse:
             def __init__(self, response):
                 self.url = str(response.url) if hasattr(response, "url") else response.url
                 self.status_code = response.status_code if hasattr(response, "status_code") else getattr(response, "status", 200)
-                self.headers = dict(response.headers) if hasattr(response, "headers") else {}
+                # Keep the client's case-insensitive mapping; a dict copy of
+                # httpx headers has lower-cased names the detector won't find
+                self.headers = response.headers if hasattr(response, "headers") else {}
 
         mock_response = MockResponse(response)
-        detected = self._detector.detect_from_response(mock_response)
+        context = self._sync_limiter._request_context(mock_response.url)
+        detected = self._detector.detect_from_response(mock_response, domain=context.host)
         if not detected:
-            return
+            await self._adapt(context.endpoint, mock_response.status_code)
+            return False
 
-        endpoint = self._get_endpoint_key(mock_response.url)
+        endpoint = context.endpoint
         limit = detected.get("limit")
         remaining = detected.get("remaining")
         reset_time = detected.get("reset_time")
@@ -147,49 +394,64 @@ class AsyncRateLimiter:
                 reset_time=reset_time,
                 window=window,
             )
-            self._storage.set_rate_limit(endpoint, rate_limit)
+            await self._async_storage.set_rate_limit(endpoint, rate_limit)
+            self._no_limits.pop(endpoint, None)
 
-            bucket = self._get_or_create_bucket(endpoint, limit, window)
             if remaining is not None:
-                bucket.tokens = min(bucket.capacity, float(remaining))
-                bucket.last_update = datetime.utcnow()
+                self._leases.discard(f"{endpoint}:")
+                await self._async_storage.set_remaining(
+                    *self._sync_limiter._remaining_args(endpoint, remaining, limit, window)
+                )
 
             logger.debug(
                 f"Rate limit updated for {endpoint}: {remaining}/{limit} remaining"
             )
+            token_limit = self._sync_limiter._record_token_limit(endpoint, detected.get("tokens"))
+            if token_limit is not None:
+                await self._async_storage.set_remaining(
+                    *self._sync_limiter._token_remaining_args(endpoint, token_limit)
+                )
+            return remaining is not None
 
-    def _apply_default_limits(self, url: str) -> None:
-        """Apply default limits if no rate limit info exists."""
-        if not self._default_limits:
-            return
+        await self._adapt(endpoint, mock_response.status_code)
+        return False
 
-        endpoint = self._get_endpoint_key(url)
-        if self._storage.get_rate_limit(endpoint):
+    async def _adapt(self, endpoint: str, status_code: int) -> None:
+        """Feed a response without limit headers to the endpoint's adaptive rate."""
+        adaptive = self._sync_limiter._adaptive.get(endpoint)
+        if adaptive is None:
             return
-
-        if "requests_per_second" in self._default_limits:
-            limit = self._default_limits["requests_per_second"]
-            window = timedelta(seconds=1)
-        elif "requests_per_minute" in self._default_limits:
-            limit = self._default_limits["requests_per_minute"]
-            window = timedelta(minutes=1)
-        elif "requests_per_hour" in self._default_limits:
-            limit = self._default_limits["requests_per_hour"]
-            window = timedelta(hours=1)
-        else:
+        step = adaptive.adjustment(status_code)
+        if step is None:
             return
 
-        rate_limit = RateLimit(
-            endpoint=endpoint,
-            limit=limit,
-            remaining=limit,
-            reset_time=datetime.utcnow() + window,
-            window=window,
+        increase, factor = step
+        limit = adaptive.learn(
+            await self._async_storage.adapt_rate(
+                adaptive.key,
+                adaptive.rate,
+                increase,
+                factor,
+                adaptive.min_limit,
+                adaptive.max_limit,
+                adaptive.hold,
+            )
         )
-        self._storage.set_rate_limit(endpoint, rate_limit)
+        if limit is not None:
+            await self._async_storage.set_rate_limit(endpoint, adaptive.to_rate_limit(endpoint))
+            logger.debug(f"Adaptive limit for {endpoint} is now {limit} per {adaptive.window}")
 
     async def arequest_httpx(
-        self, client, method: str, url: str, **kwargs
+        self,
+        client,
+        method: str,
+        url: str,
+        cost: Optional["CostEstimate"] = None,
+        actual_cost: Optional["ResponseCost"] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **kwargs,
     ):
         """
         Make a rate-limited async HTTP request using httpx.
@@ -198,58 +460,59 @@ class AsyncRateLimiter:
             client: httpx.AsyncClient instance
             method: HTTP method (GET, POST, PUT, DELETE, PATCH)
             url: Request URL
+            cost: Tokens to charge up front, or a function of (method, url,
+                kwargs) estimating them
+            actual_cost: Function reading the true cost from the response
+            priority: Class of the request when tokens are scarce; higher
+                classes are admitted first
+            weight: Share of this request's class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit,
+                including a 429 retry; fails fast if the projected wait is
+                longer
             **kwargs: Additional arguments passed to client.request()
 
         Returns:
             httpx.Response object
         """
+        loop = asyncio.get_running_loop()
+        deadline = None if max_wait is None else loop.time() + max_wait
         endpoint = self._get_endpoint_key(url)
-        self._apply_default_limits(url)
-
-        rate_limit = self._storage.get_rate_limit(endpoint)
+        charged = self._sync_limiter._estimate_cost(cost, method, url, kwargs)
 
+        rate_limit = await self._limit_for(endpoint)
         if rate_limit:
-            bucket = self._get_or_create_bucket(
-                endpoint, rate_limit.limit, rate_limit.window
-            )
-            await self._wait_for_token(bucket, url)
-        elif self._default_limits:
-            self._apply_default_limits(url)
-            rate_limit = self._storage.get_rate_limit(endpoint)
-            if rate_limit:
-                bucket = self._get_or_create_bucket(
-                    endpoint, rate_limit.limit, rate_limit.window
-                )
-                await self._wait_for_token(bucket, url)
+            await self._acquire(endpoint, rate_limit, url, charged, priority, weight, max_wait)
 
-        response = await client.request(method, url, **kwargs)
-        self._update_from_response(response)
+        async with self._in_flight(endpoint, url, deadline, rate_limit, charged):
+            response = await client.request(method, url, **kwargs)
+        if not await self._update_from_response(response) and rate_limit:
+            await self._reconcile_cost(endpoint, rate_limit, charged, actual_cost, response)
 
         if response.status_code == 429:
-            retry_after = response.headers.get("Retry-After")
-            if retry_after:
-                try:
-                    wait_time = int(retry_after)
-                    logger.warning(
-                        f"Received 429 for {url}, waiting {wait_time} seconds"
-                    )
-                    if not self._raise_on_limit:
-                        await asyncio.sleep(wait_time)
+            wait_time = self._detector.get_retry_after(response.headers)
+            if wait_time is not None:
+                logger.warning(f"Received 429 for {url}, waiting {wait_time:g} seconds")
+                if not self._raise_on_limit and (
+                    deadline is None or loop.time() + wait_time <= deadline
+                ):
+                    await asyncio.sleep(wait_time)
+                    async with self._in_flight(endpoint, url, deadline):
                         response = await client.request(method, url, **kwargs)
-                        self._update_from_response(response)
-                except (ValueError, TypeError):
-                    pass
-
-        if rate_limit:
-            bucket = self._get_or_create_bucket(
-                endpoint, rate_limit.limit, rate_limit.window
-            )
-            self._storage.set_token_bucket(self._get_bucket_key(endpoint), bucket)
+                    await self._update_from_response(response)
 
         return response
 
     async def arequest_aiohttp(
-        self, session, method: str, url: str, **kwargs
+        self,
+        session,
+        method: str,
+        url: str,
+        cost: Optional["CostEstimate"] = None,
+        actual_cost: Optional["ResponseCost"] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **kwargs,
     ):
         """
         Make a rate-limited async HTTP request using aiohttp.
@@ -258,81 +521,145 @@ class AsyncRateLimiter:
             session: aiohttp.ClientSession instance
             method: HTTP method (GET, POST, PUT, DELETE, PATCH)
             url: Request URL
+            cost: Tokens to charge up front, or a function of (method, url,
+                kwargs) estimating them
+            actual_cost: Function reading the true cost from the response
+                wrapper (its ``body`` attribute holds the raw body)
+            priority: Class of the request when tokens are scarce; higher
+                classes are admitted first
+            weight: Share of this request's class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit,
+                including a 429 retry; fails fast if the projected wait is
+                longer
             **kwargs: Additional arguments passed to session.request()
 
         Returns:
             aiohttp.ClientResponse object
         """
+        loop = asyncio.get_running_loop()
+        deadline = None if max_wait is None else loop.time() + max_wait
         endpoint = self._get_endpoint_key(url)
-        self._apply_default_limits(url)
-
-        rate_limit = self._storage.get_rate_limit(endpoint)
+        charged = self._sync_limiter._estimate_cost(cost, method, url, kwargs)
 
+        rate_limit = await self._limit_for(endpoint)
         if rate_limit:
-            bucket = self._get_or_create_bucket(
-                endpoint, rate_limit.limit, rate_limit.window
-            )
-            await self._wait_for_token(bucket, url)
-        elif self._default_limits:
-            self._apply_default_limits(url)
-            rate_limit = self._storage.get_rate_limit(endpoint)
-            if rate_limit:
-                bucket = self._get_or_create_bucket(
-                    endpoint, rate_limit.limit, rate_limit.window
-                )
-                await self._wait_for_token(bucket, url)
-
-        async with session.request(method, url, **kwargs) as response:
-            # Read response body before updating
-            body = await response.read()
-            self._update_from_response(response)
-
-            if response.status == 429:
-                retry_after = response.headers.get("Retry-After")
-                if retry_after:
-                    try:
-                        wait_time = int(retry_after)
-                        logger.warning(
-                            f"Received 429 for {url}, waiting {wait_time} seconds"
-                        )
-                        if not self._raise_on_limit:
+            await self._acquire(endpoint, rate_limit, url, charged, priority, weight, max_wait)
+
+        # Hold a concurrency slot until the body is read, through any 429 retry
+        async with self._in_flight(endpoint, url, deadline, rate_limit, charged):
+            async with session.request(method, url, **kwargs) as response:
+                # Read response body before updating
+                body = await response.read()
+                resynced = await self._update_from_response(response)
+
+                if response.status == 429:
+                    wait_time = self._detector.get_retry_after(response.headers)
+                    if wait_time is not None:
+                        logger.warning(f"Received 429 for {url}, waiting {wait_time:g} seconds")
+                        if not self._raise_on_limit and (
+                            deadline is None or loop.time() + wait_time <= deadline
+                        ):
                             await asyncio.sleep(wait_time)
                             async with session.request(method, url, **kwargs) as retry_response:
                                 body = await retry_response.read()
-                                self._update_from_response(retry_response)
+                                await self._update_from_response(retry_response)
                                 return retry_response
-                    except (ValueError, TypeError):
-                        pass
 
-            if rate_limit:
-                bucket = self._get_or_create_bucket(
-                    endpoint, rate_limit.limit, rate_limit.window
-                )
-                self._storage.set_token_bucket(
-                    self._get_bucket_key(endpoint), bucket
-                )
+                # Create a response-like object that preserves the body
+                class ResponseWrapper:
+                    def __init__(self, response, body):
+                        self._response = response
+                        self._body = body
+                        self.body = body
+                        self.url = str(response.url)
+                        self.status_code = response.status
+                        self.status = response.status
+                        self.headers = response.headers
+
+                    async def read(self):
+                        return self._body
+
+                    async def json(self):
+                        import json
+                        return json.loads(self._body.decode())
+
+                    async def text(self):
+                        return self._body.decode()
+
+                wrapped = ResponseWrapper(response, body)
+                if not resynced and rate_limit:
+                    await self._reconcile_cost(endpoint, rate_limit, charged, actual_cost, wrapped)
+                return wrapped
+
+    async def try_acquire(self, url: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Take tokens for a request to a URL if they are available now.
 
-            # Create a response-like object that preserves the body
-            class ResponseWrapper:
-                def __init__(self, response, body):
-                    self._response = response
-                    self._body = body
-                    self.url = str(response.url)
-                    self.status_code = response.status
-                    self.status = response.status
-                    self.headers = response.headers
+        Never waits for tokens; see ``RateLimiter.try_acquire``.
 
-                async def read(self):
-                    return self._body
+        Returns:
+            Tuple of (granted, wait_seconds)
+        """
+        if cost < 0:
+            raise ValueError(f"Request cost must not be negative: {cost}")
+        endpoint = self._get_endpoint_key(url)
+        rate_limit = await self._limit_for(endpoint)
+        if not rate_limit:
+            return True, 0.0
+        return await self._wait_queue(endpoint).admit(
+            lambda max_wait: self._take(endpoint, rate_limit, cost, max_wait), 0.0
+        )
+
+    def set_lease(
+        self,
+        endpoint: str,
+        lease_seconds: Optional[float] = 1.0,
+        max_share: float = 0.1,
+    ) -> None:
+        """Spend an endpoint's tokens from local leases instead of storage."""
+        self._sync_limiter.set_lease(endpoint, lease_seconds, max_share)
+
+    def set_concurrency(
+        self,
+        endpoint: str,
+        max_concurrency: Optional[int],
+        lease_seconds: float = 60.0,
+    ) -> None:
+        """Cap the requests in flight to an endpoint at once."""
+        self._sync_limiter.set_concurrency(endpoint, max_concurrency, lease_seconds)
+
+    def set_pacing(self, endpoint: str, burst: Optional[int] = 1) -> None:
+        """Spread an endpoint's requests evenly instead of in bursts."""
+        self._sync_limiter.set_pacing(endpoint, burst)
+
+    def set_adaptive(
+        self,
+        endpoint: str,
+        limit: Optional[int],
+        window: str = "1m",
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ) -> None:
+        """Learn an endpoint's rate limit from its responses."""
+        self._sync_limiter.set_adaptive(
+            endpoint, limit, window, min_limit, max_limit, increase, decrease
+        )
 
-                async def json(self):
-                    import json
-                    return json.loads(self._body.decode())
+    def close(self) -> None:
+        """Give back unused leased tokens and write pending storage changes."""
+        self._sync_limiter.close()
 
-                async def text(self):
-                    return self._body.decode()
+    async def aclose(self) -> None:
+        """Close the limiter and release the awaitable storage's connections."""
+        # Lease refunds and write-behind flushes call the blocking backend
+        await self._async_storage.run_sync(self._sync_limiter.close)
+        await self._async_storage.close()
 
-            return ResponseWrapper(response, body)
+    def add_route(self, host: str, template: str) -> None:
+        """Register a route template so matching requests get their own limits."""
+        self._sync_limiter.add_route(host, template)
 
     def get_status(self, endpoint: str) -> Optional[RateLimitStatus]:
         """Get current rate limit status for an endpoint."""
@@ -349,30 +676,23 @@ class AsyncRateLimiter:
         return None
 
     def set_limit(
-        self, endpoint: str, limit: int, window: str = "1h"
+        self,
+        endpoint: str,
+        limit: int,
+        window: str = "1h",
+        algorithm: Optional[str] = None,
     ) -> None:
-        """Manually set rate limit for an endpoint."""
-        # Normalize endpoint
-        if not endpoint.startswith(("http://", "https://")):
-            endpoint = f"https://{endpoint}"
+        """Manually set rate limit for an endpoint (see ``RateLimiter.set_limit``)."""
+        self._sync_limiter.set_limit(endpoint, limit, window, algorithm)
 
-        endpoint_key = self._get_endpoint_key(endpoint)
-        
-        # Parse window
-        from smartratelimit.core import RateLimiter
-        sync_limiter = RateLimiter()
-        window_td = sync_limiter._parse_window(window)
-
-        from datetime import datetime, timedelta
-        rate_limit = RateLimit(
-            endpoint=endpoint_key,
-            limit=limit,
-            remaining=limit,
-            reset_time=datetime.utcnow() + window_td,
-            window=window_td,
-        )
-
-        self._storage.set_rate_limit(endpoint_key, rate_limit)
+    def set_limits(
+        self,
+        endpoint: str,
+        limits: Dict[str, int],
+        algorithm: Optional[str] = None,
+    ) -> None:
+        """Manually set several limits enforced together (see ``RateLimiter.set_limits``)."""
+        self._sync_limiter.set_limits(endpoint, limits, algorithm)
 
     def clear(self, endpoint: Optional[str] = None) -> None:
         """Clear stored rate limit data."""
@@ -381,7 +701,15 @@ class AsyncRateLimiter:
             if not endpoint.startswith(("http://", "https://")):
                 endpoint = f"https://{endpoint}"
             endpoint_key = self._get_endpoint_key(endpoint)
+            self._leases.discard(f"{endpoint_key}:")
             self._storage.clear(endpoint_key)
+            self._composite_limits.pop(endpoint_key, None)
+            self._token_limits.pop(endpoint_key, None)
+            self._no_limits.pop(endpoint_key, None)
         else:
+            self._leases.discard()
             self._storage.clear(None)
+            self._composite_limits.clear()
+            self._token_limits.clear()
+            self._no_limits.clear()
 
@@ -0,0 +1,424 @@
+"""Awaitable storage backends for the asyncio rate limiter."""
+
+import asyncio
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from smartratelimit import redis_scripts
+from smartratelimit.algorithms import TOKEN_BUCKET
+from smartratelimit.models import RateLimit, TokenBucket
+from smartratelimit.storage import (
+    RedisStorage,
+    SQLiteStorage,
+    StorageBackend,
+    _RedisLayout,
+)
+
+
+class AsyncStorageBackend(ABC):
+    """
+    Awaitable counterpart of ``StorageBackend`` for the request path.
+
+    ``AsyncRateLimiter`` awaits these operations while requests are in
+    flight, so a slow store never stalls the event loop. Configuration calls
+    such as ``set_limit`` stay synchronous and go to ``sync_backend``, which
+    must see the same data.
+    """
+
+    @property
+    @abstractmethod
+    def sync_backend(self) -> StorageBackend:
+        """A blocking backend over the same data, for calls outside the request path."""
+        pass
+
+    @abstractmethod
+    async def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get rate limit for an endpoint."""
+        pass
+
+    @abstractmethod
+    async def set_rate_limit(self, endpoint: str, rate_limit: RateLimit) -> None:
+        """Store rate limit for an endpoint."""
+        pass
+
+    @abstractmethod
+    async def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from every limit or none (see ``StorageBackend.acquire_many``)."""
+        pass
+
+    @abstractmethod
+    async def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used."""
+        pass
+
+    @abstractmethod
+    async def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        pass
+
+    @abstractmethod
+    async def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` slots for a key (see ``StorageBackend.acquire_slot``)."""
+        pass
+
+    @abstractmethod
+    async def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot taken with ``acquire_slot``."""
+        pass
+
+    @abstractmethod
+    async def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate atomically (see ``StorageBackend.adapt_rate``)."""
+        pass
+
+    async def run_sync(self, operation: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking call on ``sync_backend`` without stalling the event loop.
+
+        For work outside the awaitable operations, such as the limiter
+        refilling a token lease. Runs on the loop's default executor unless
+        the backend has threads of its own.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: operation(*args))
+
+    async def close(self) -> None:
+        """Release connections and threads held by the backend."""
+        pass
+
+
+class ThreadedStorage(AsyncStorageBackend):
+    """
+    Runs a blocking backend's operations on worker threads.
+
+    Makes any ``StorageBackend`` safe to await: the event loop hands each
+    call to a thread pool and keeps serving other coroutines while it runs.
+    One worker keeps calls in order; more overlap round trips to a server.
+    """
+
+    def __init__(self, backend: StorageBackend, max_workers: int = 1):
+        self.backend = backend
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="smartratelimit-storage"
+        )
+
+    @property
+    def sync_backend(self) -> StorageBackend:
+        """The wrapped backend."""
+        return self.backend
+
+    async def run_sync(self, operation: Callable[..., Any], *args: Any) -> Any:
+        """Run one backend operation off the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: operation(*args))
+
+    async def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get rate limit for an endpoint."""
+        return await self.run_sync(self.backend.get_rate_limit, endpoint)
+
+    async def set_rate_limit(self, endpoint: str, rate_limit: RateLimit) -> None:
+        """Store rate limit for an endpoint."""
+        await self.run_sync(self.backend.set_rate_limit, endpoint, rate_limit)
+
+    async def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from every limit or none."""
+        return await self.run_sync(self.backend.acquire_many, limits, tokens, max_wait, algorithm)
+
+    async def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used."""
+        await self.run_sync(self.backend.refund, limits, tokens, algorithm)
+
+    async def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        await self.run_sync(self.backend.set_remaining, key, remaining, limit, window, algorithm)
+
+    async def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` concurrency slots for a key."""
+        return await self.run_sync(self.backend.acquire_slot, key, limit, ttl)
+
+    async def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot."""
+        await self.run_sync(self.backend.release_slot, key, slot)
+
+    async def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate in one atomic step."""
+        return await self.run_sync(
+            self.backend.adapt_rate, key, initial, increase, factor, minimum, maximum, hold
+        )
+
+    async def close(self) -> None:
+        """Stop the worker threads once queued calls are done."""
+        self._executor.shutdown(wait=False)
+
+
+class InlineStorage(ThreadedStorage):
+    """
+    Awaitable view of a backend whose operations never block.
+
+    For in-process stores such as ``MemoryStorage``, where handing each call
+    to a thread would cost more than the call itself.
+    """
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+
+    async def run_sync(self, operation: Callable[..., Any], *args: Any) -> Any:
+        """Run one backend operation directly."""
+        return operation(*args)
+
+    async def close(self) -> None:
+        """Nothing to release."""
+        pass
+
+
+class AsyncSQLiteStorage(ThreadedStorage):
+    """SQLite storage whose queries run on a worker thread."""
+
+    def __init__(self, db_path: str = ":memory:"):
+        """
+        Initialize async SQLite storage.
+
+        Args:
+            db_path: Path to SQLite database file, or ":memory:" for in-memory DB
+        """
+        # SQLite serialises writers, so more threads would only queue on its lock
+        super().__init__(SQLiteStorage(db_path), max_workers=1)
+
+
+class AsyncRedisStorage(_RedisLayout, AsyncStorageBackend):
+    """
+    Redis storage on ``redis.asyncio``.
+
+    Uses the same keys and Lua scripts as ``RedisStorage``, so async and
+    sync workers share limiter state.
+    """
+
+    def __init__(self, redis_url: str = "redis://localhost:6379/0", key_prefix: str = "ratelimit:"):
+        """
+        Initialize async Redis storage.
+
+        Args:
+            redis_url: Redis connection URL
+            key_prefix: Prefix for all keys stored in Redis
+        """
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise ImportError(
+                "Async Redis support requires the 'redis' package (4.2 or later). "
+                "Install it with: pip install redis"
+            )
+
+        self.redis_client = aioredis.from_url(redis_url, decode_responses=False)
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self._script_shas: Dict[str, str] = {}
+        self._sync_backend: Optional[RedisStorage] = None
+
+    @property
+    def sync_backend(self) -> StorageBackend:
+        """A ``RedisStorage`` on the same server and key prefix."""
+        if self._sync_backend is None:
+            self._sync_backend = RedisStorage(self.redis_url, key_prefix=self.key_prefix)
+        return self._sync_backend
+
+    async def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get rate limit for an endpoint."""
+        try:
+            data = await self.redis_client.hgetall(self._make_key(f"rate_limit:{endpoint}"))
+            if not data:
+                return None
+            return self._hash_to_rate_limit(endpoint, data)
+        except Exception:
+            return None
+
+    async def set_rate_limit(self, endpoint: str, rate_limit: RateLimit) -> None:
+        """Store rate limit for an endpoint."""
+        key = self._make_key(f"rate_limit:{endpoint}")
+        data, ttl = self._rate_limit_to_hash(rate_limit)
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=data)
+                pipe.expire(key, ttl)
+                await pipe.execute()
+        except Exception:
+            pass  # Graceful degradation
+
+    async def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from several limits in a single script call."""
+        call = self._acquire_call(limits, tokens, max_wait, algorithm)
+        if call is None:
+            return False, float("inf")
+        try:
+            granted, wait = await self._run_script(*call)
+            return bool(granted), float(wait)
+        except Exception:
+            return True, 0.0  # Graceful degradation
+
+    async def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used, in one script call."""
+        call = self._refund_call(limits, tokens, algorithm)
+        if call is None:
+            return
+        try:
+            await self._run_script(*call)
+        except Exception:
+            pass  # Graceful degradation
+
+    async def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        try:
+            if algorithm != TOKEN_BUCKET:
+                call = self._remaining_call(key, remaining, limit, window, algorithm)
+                if call is not None:
+                    await self._run_script(*call)
+            else:
+                redis_key = self._make_key(f"token_bucket:{key}")
+                bucket = TokenBucket.for_limit(limit, window, tokens=remaining)
+                async with self.redis_client.pipeline(transaction=False) as pipe:
+                    pipe.hset(redis_key, mapping=self._bucket_to_hash(bucket))
+                    pipe.expire(redis_key, 86400)
+                    await pipe.execute()
+        except Exception:
+            pass  # Graceful degradation
+
+    async def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` concurrency slots for a key."""
+        slot = uuid.uuid4().hex
+        try:
+            taken = await self._run_script(
+                "CONCURRENCY_ACQUIRE", [self._make_key(f"slots:{key}")], [slot, limit, ttl]
+            )
+        except Exception:
+            return slot  # Graceful degradation
+        return slot if taken else None
+
+    async def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot."""
+        try:
+            await self.redis_client.zrem(self._make_key(f"slots:{key}"), slot)
+        except Exception:
+            pass  # Graceful degradation
+
+    async def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate shared by every process."""
+        try:
+            rate = await self._run_script(
+                *self._adapt_call(key, initial, increase, factor, minimum, maximum, hold)
+            )
+        except Exception:
+            return initial  # Graceful degradation
+        return float(rate)
+
+    async def _run_script(self, name: str, keys: list, args: list):
+        """Run a Lua script by cached SHA, reloading it if Redis lost it."""
+        from redis.exceptions import NoScriptError
+
+        sha = self._script_shas.get(name)
+        if sha is None:
+            sha = await self._load_script(name)
+        try:
+            return await self.redis_client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # Script cache was flushed or we failed over to a fresh server
+            sha = await self._load_script(name)
+            return await self.redis_client.evalsha(sha, len(keys), *keys, *args)
+
+    async def _load_script(self, name: str) -> str:
+        """Load a script into the Redis script cache and remember its SHA."""
+        sha = await self.redis_client.script_load(getattr(redis_scripts, name))
+        if isinstance(sha, bytes):
+            sha = sha.decode("utf-8")
+        self._script_shas[name] = sha
+        return sha
+
+    async def close(self) -> None:
+        """Close the connection pool."""
+        close = getattr(self.redis_client, "aclose", None) or self.redis_client.close
+        await close()
+        if self._sync_backend is not None:
+            self._sync_backend.close()
@@ -0,0 +1,137 @@
+"""Caps on the number of requests in flight to an endpoint."""
+
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from smartratelimit.storage import StorageBackend
+
+if TYPE_CHECKING:
+    from smartratelimit.async_storage import AsyncStorageBackend
+
+# Seconds between storage checks while other processes hold every slot
+SLOT_POLL_INTERVAL = 0.05
+
+
+class ConcurrencyLimit:
+    """
+    Caps the requests in flight to one endpoint.
+
+    A semaphore bounds this process's requests without touching storage; a
+    slot taken from storage bounds them across processes. Storage slots
+    expire ``lease_seconds`` after they are taken, so a worker that dies
+    holding one only blocks it that long.
+    """
+
+    def __init__(
+        self,
+        storage: StorageBackend,
+        key: str,
+        limit: int,
+        lease_seconds: float = 60.0,
+    ):
+        if limit < 1:
+            raise ValueError(f"max_concurrency must be at least 1: {limit}")
+        if lease_seconds <= 0:
+            raise ValueError(f"lease_seconds must be positive: {lease_seconds}")
+        self.storage = storage
+        self.key = key
+        self.limit = limit
+        self.lease_seconds = lease_seconds
+        self._semaphore = threading.BoundedSemaphore(limit)
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Wait for a free slot.
+
+        Args:
+            timeout: Longest time to wait in seconds (None for no bound)
+
+        Returns:
+            The slot to pass to ``release``, or None if none freed up in time
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not self._semaphore.acquire(timeout=timeout):
+            return None
+        try:
+            while True:
+                slot = self.storage.acquire_slot(self.key, self.limit, self.lease_seconds)
+                if slot is not None:
+                    return slot
+                pause = SLOT_POLL_INTERVAL
+                if deadline is not None:
+                    pause = min(pause, deadline - time.monotonic())
+                    if pause <= 0:
+                        break
+                time.sleep(pause)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        self._semaphore.release()
+        return None
+
+    def release(self, slot: str) -> None:
+        """Give back a slot taken with ``acquire``."""
+        try:
+            self.storage.release_slot(self.key, slot)
+        finally:
+            self._semaphore.release()
+
+    async def acquire_async(
+        self, timeout: Optional[float] = None, storage: Optional["AsyncStorageBackend"] = None
+    ) -> Optional[str]:
+        """
+        Wait for a free slot without blocking the event loop (see ``acquire``).
+
+        Args:
+            timeout: Longest time to wait in seconds (None for no bound)
+            storage: Awaitable backend over the same data to take the slot
+                from, instead of calling the blocking one
+        """
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.limit)
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        if timeout is not None and timeout <= 0:
+            # wait_for with no time left gives up before the semaphore is tried
+            if self._async_semaphore.locked():
+                return None
+            await self._async_semaphore.acquire()
+        else:
+            try:
+                await asyncio.wait_for(self._async_semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        try:
+            while True:
+                if storage is None:
+                    slot = self.storage.acquire_slot(self.key, self.limit, self.lease_seconds)
+                else:
+                    slot = await storage.acquire_slot(self.key, self.limit, self.lease_seconds)
+                if slot is not None:
+                    return slot
+                pause = SLOT_POLL_INTERVAL
+                if deadline is not None:
+                    pause = min(pause, deadline - loop.time())
+                    if pause <= 0:
+                        break
+                await asyncio.sleep(pause)
+        except BaseException:
+            self._async_semaphore.release()
+            raise
+        self._async_semaphore.release()
+        return None
+
+    async def release_async(
+        self, slot: str, storage: Optional["AsyncStorageBackend"] = None
+    ) -> None:
+        """Give back a slot taken with ``acquire_async``."""
+        try:
+            if storage is None:
+                self.storage.release_slot(self.key, slot)
+            else:
+                await storage.release_slot(self.key, slot)
+        finally:
+            self._async_semaphore.release()
@@ -1,15 +1,30 @@
 """Core RateLimiter class."""
 
 import logging
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 from urllib.parse import urlparse
 
 import requests
 
+from smartratelimit.adaptive import AdaptiveRate
+from smartratelimit.algorithms import validate_algorithm
+from smartratelimit.concurrency import ConcurrencyLimit
 from smartratelimit.detector import RateLimitDetector
-from smartratelimit.models import RateLimit, RateLimitStatus, TokenBucket
+from smartratelimit.leasing import LeaseManager, LeasePolicy
+from smartratelimit.models import (
+    CompositeLimit,
+    RateLimit,
+    RateLimitStatus,
+    RequestContext,
+    paced_limit,
+)
+from smartratelimit.routes import RouteTable
+from smartratelimit.scheduling import WaitQueue, validate_scheduling
 from smartratelimit.storage import (
     MemoryStorage,
     RedisStorage,
@@ -19,6 +34,23 @@ from smartratelimit.storage import (
 
 logger = logging.getLogger(__name__)
 
+# Request cost: a number, or a function of (method, url, kwargs) estimating it
+CostEstimate = Union[float, Callable[[str, str, Dict[str, Any]], float]]
+
+# Actual request cost read from the response, or None if it is not known
+ResponseCost = Callable[[Any], Optional[float]]
+
+# Origins (scheme://host) whose endpoint resolution is memoised per limiter
+ENDPOINT_CACHE_SIZE = 1024
+
+# default_limits keys and the window each one limits
+DEFAULT_LIMIT_WINDOWS = {
+    "requests_per_second": timedelta(seconds=1),
+    "requests_per_minute": timedelta(minutes=1),
+    "requests_per_hour": timedelta(hours=1),
+    "requests_per_day": timedelta(days=1),
+}
+
 
 class RateLimitExceeded(Exception):
     """Exception raised when rate limit is exceeded and raise_on_limit=True."""
@@ -30,6 +62,10 @@ class RateLimiter:
     """
     Main rate limiter class that automatically manages API rate limits.
 
+    One limiter can be shared by many threads: tokens are taken atomically
+    per endpoint, waiting threads are admitted in turn, and each thread
+    sends its requests through its own ``requests.Session``.
+
     Example:
         >>> limiter = RateLimiter()
         >>> response = limiter.request('GET', 'https://api.github.com/users')
@@ -39,28 +75,101 @@ class RateLimiter:
 
     def __init__(
         self,
-        storage: str = "memory",
+        storage: Union[str, StorageBackend] = "memory",
         default_limits: Optional[Dict[str, int]] = None,
         headers_map: Optional[Dict[str, str]] = None,
         raise_on_limit: bool = False,
+        algorithm: str = "token_bucket",
+        routes: Optional[Dict[str, List[str]]] = None,
+        cost: CostEstimate = 1,
+        actual_cost: Optional[ResponseCost] = None,
+        no_limit_ttl: float = 10.0,
+        scheduling: str = "priority",
     ):
         """
         Initialize rate limiter.
 
         Args:
             storage: Storage backend ('memory', 'sqlite:///path', 'redis://host:port')
-            default_limits: Default limits like {'requests_per_second': 10}
+                or a StorageBackend instance, e.g. a CachedStorage
+            default_limits: Default limits like {'requests_per_second': 10}; every
+                window given is enforced, optionally with an 'algorithm' key for
+                the endpoints they apply to
             headers_map: Custom header name mapping
             raise_on_limit: If True, raise exception instead of waiting
+            algorithm: Default limiting algorithm ('token_bucket', 'gcra',
+                'sliding_log' or 'sliding_window')
+            routes: Route templates per host, e.g.
+                {'api.github.com': ['/search', '/repos/{owner}/{repo}/issues']};
+                requests matching a route get their own limits
+            cost: Tokens each request is charged up front, or a function of
+                (method, url, kwargs) estimating them
+            actual_cost: Function reading a request's true cost from its
+                response (e.g. LLM token usage); the difference from the
+                charged cost is debited or refunded
+            no_limit_ttl: Seconds to remember that an endpoint has no known
+                limits, skipping storage lookups for it (0 to always look up)
+            scheduling: How requests waiting on an endpoint are ordered:
+                'priority' admits higher priorities first, 'fair' shares
+                admissions between priorities by their weights
         """
         self._storage = self._create_storage(storage)
         self._detector = RateLimitDetector(headers_map)
         self._default_limits = default_limits or {}
         self._raise_on_limit = raise_on_limit
-        self._session = requests.Session()
-
-    def _create_storage(self, storage: str) -> StorageBackend:
+        self._algorithm = validate_algorithm(algorithm)
+        if "algorithm" in self._default_limits:
+            validate_algorithm(self._default_limits["algorithm"])
+        self._endpoint_algorithms: Dict[str, str] = {}
+        self._composite_limits: Dict[str, CompositeLimit] = {}
+        # Token budgets reported alongside request limits (e.g. OpenAI TPM)
+        self._token_limits: Dict[str, RateLimit] = {}
+        # Endpoints known to have no limits -> when to look again (monotonic)
+        self._no_limits: Dict[str, float] = {}
+        self._no_limit_ttl = no_limit_ttl
+        # Requests waiting on each endpoint, admitted by priority and arrival
+        self._scheduling = validate_scheduling(scheduling)
+        self._wait_queues: Dict[str, WaitQueue] = {}
+        self._routes = RouteTable()
+        self._resolve_origin = lru_cache(maxsize=ENDPOINT_CACHE_SIZE)(self._parse_endpoint)
+        self._cost = cost
+        self._actual_cost = actual_cost
+        for host, templates in (routes or {}).items():
+            for template in templates:
+                self.add_route(host, template)
+        self._leases = LeaseManager(self._storage)
+        self._lease_policies: Dict[str, LeasePolicy] = {}
+        self._concurrency: Dict[str, ConcurrencyLimit] = {}
+        self._adaptive: Dict[str, AdaptiveRate] = {}
+        self._pacing: Dict[str, int] = {}  # Endpoint -> burst size
+        self._sessions = threading.local()
+
+    @property
+    def _session(self) -> requests.Session:
+        """This thread's HTTP session, as requests.Session is not thread-safe."""
+        session = getattr(self._sessions, "session", None)
+        if session is None:
+            session = self._sessions.session = requests.Session()
+        return session
+
+    def __enter__(self):
+        """Context manager entry."""
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit; gives back unused leased tokens."""
+        self.close()
+
+    def close(self) -> None:
+        """Give back unused leased tokens and write pending storage changes."""
+        self._leases.release()
+        self._storage.close()
+
+    def _create_storage(self, storage: Union[str, StorageBackend]) -> StorageBackend:
         """Create storage backend from string specification."""
+        if isinstance(storage, StorageBackend):
+            return storage
+
         if storage == "memory":
             return MemoryStorage()
 
@@ -106,72 +215,334 @@ class RateLimiter:
 
         raise ValueError(f"Unknown storage backend: {storage}")
 
-    @staticmethod
-    def _get_endpoint_key(url: str) -> str:
-        """Extract endpoint key from URL."""
+    def _request_context(self, url: str) -> RequestContext:
+        """Resolve a URL to its endpoint, memoised per origin (scheme://host)."""
+        scheme, separator, rest = url.partition("://")
+        if not separator:
+            return self._parse_endpoint(url)
+        # The host ends where the path, query or fragment starts, as for urlparse
+        end = len(rest)
+        for delimiter in "/?#":
+            index = rest.find(delimiter, 0, end)
+            if index != -1:
+                end = index
+        context = self._resolve_origin(url[: len(scheme) + 3 + end])
+        if self._routes:
+            # Paths carry IDs, so routes are matched per request, not cached
+            path = rest[end:].partition("?")[0].partition("#")[0]
+            route = self._routes.match(context.host, path)
+            if route is not None:
+                return RequestContext(context.host, context.endpoint + route)
+        return context
+
+    def _parse_endpoint(self, url: str) -> RequestContext:
+        """Resolve a URL to its host and endpoint key (uncached)."""
         parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}"
+        endpoint = f"{parsed.scheme}://{parsed.netloc}"
+        if self._routes:
+            route = self._routes.match(parsed.netloc, parsed.path)
+            if route is not None:
+                endpoint += route
+        return RequestContext(parsed.netloc.lower(), endpoint)
+
+    def _get_endpoint_key(self, url: str) -> str:
+        """Extract endpoint key from URL, including the route if one matches."""
+        return self._request_context(url).endpoint
 
     def _get_bucket_key(self, url: str, limit_type: str = "default") -> str:
         """Get token bucket key for URL."""
-        endpoint = self._get_endpoint_key(url)
+        return self._request_context(url).bucket_key(limit_type)
+
+    @staticmethod
+    def _endpoint_bucket_key(endpoint: str, limit_type: str = "default") -> str:
+        """Get token bucket key for an already resolved endpoint key."""
         return f"{endpoint}:{limit_type}"
 
-    def _get_or_create_bucket(
-        self, url: str, limit: int, window: timedelta
-    ) -> TokenBucket:
-        """Get or create token bucket for URL."""
-        key = self._get_bucket_key(url)
-        bucket = self._storage.get_token_bucket(key)
-
-        if bucket is None:
-            # Create new bucket
-            capacity = float(limit)
-            refill_rate = capacity / window.total_seconds()
-            bucket = TokenBucket(
-                capacity=capacity,
-                tokens=capacity,
-                refill_rate=refill_rate,
+    def _algorithm_for(self, endpoint: str) -> str:
+        """Get the limiting algorithm configured for an endpoint."""
+        return self._endpoint_algorithms.get(endpoint, self._algorithm)
+
+    def _bucket_limits(
+        self, endpoint: str, rate_limit: RateLimit
+    ) -> List[Tuple[str, int, timedelta]]:
+        """Get the ``(key, limit, window)`` triples a request must fit."""
+        bucket_key = self._endpoint_bucket_key(endpoint)
+        limits = [(bucket_key, rate_limit.limit, rate_limit.window)]
+        composite = self._composite_limits.get(endpoint)
+        if composite is not None:
+            # Detected limits stay primary; configured windows apply alongside
+            limits.extend(
+                item
+                for item in composite.bucket_limits(bucket_key)
+                if item[1:] != (rate_limit.limit, rate_limit.window)
+            )
+        burst = self._pacing.get(endpoint)
+        if burst is not None:
+            limits = [(key, *paced_limit(limit, window, burst)) for key, limit, window in limits]
+        return limits
+
+    def _remaining_args(
+        self, endpoint: str, remaining: int, limit: int, window: timedelta
+    ) -> Tuple[str, int, int, timedelta, str]:
+        """Get ``StorageBackend.set_remaining`` arguments for an endpoint's request bucket."""
+        burst = self._pacing.get(endpoint)
+        if burst is not None:
+            # A paced bucket holds at most a burst of the remaining quota
+            limit, window = paced_limit(limit, window, burst)
+            remaining = min(remaining, limit)
+        return (
+            self._endpoint_bucket_key(endpoint),
+            remaining,
+            limit,
+            window,
+            self._algorithm_for(endpoint),
+        )
+
+    def _set_remaining(self, endpoint: str, remaining: int, limit: int, window: timedelta) -> None:
+        """Overwrite an endpoint's request bucket with the quota the server reports."""
+        self._storage.set_remaining(*self._remaining_args(endpoint, remaining, limit, window))
+
+    def _lookup_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get the stored rate limit for an endpoint, remembering when there is none."""
+        expires_at = self._no_limits.get(endpoint)
+        if expires_at is not None:
+            if expires_at > time.monotonic():
+                return None
+            self._no_limits.pop(endpoint, None)
+
+        rate_limit = self._storage.get_rate_limit(endpoint)
+        if rate_limit is None and not self._default_limits and self._no_limit_ttl > 0:
+            self._no_limits[endpoint] = time.monotonic() + self._no_limit_ttl
+        return rate_limit
+
+    def _cost_limits(
+        self, endpoint: str, rate_limit: RateLimit
+    ) -> List[Tuple[str, int, timedelta]]:
+        """Get the ``(key, limit, window)`` triples a request's cost is charged to."""
+        token_limit = self._token_limits.get(endpoint)
+        if token_limit is None:
+            return self._bucket_limits(endpoint, rate_limit)
+        return [
+            (self._endpoint_bucket_key(endpoint, "tokens"), token_limit.limit, token_limit.window)
+        ]
+
+    def _take(
+        self, endpoint: str, rate_limit: RateLimit, tokens: float, max_wait: Optional[float]
+    ) -> Tuple[bool, float]:
+        """
+        Take a request's tokens from every bucket of an endpoint.
+
+        With a separate token budget, the request counts once against the
+        request limits and its cost against the budget, and waits for
+        whichever bucket binds.
+
+        Returns:
+            Tuple of (granted, wait_seconds), as for ``StorageBackend.acquire``
+        """
+        algorithm = self._algorithm_for(endpoint)
+        limits = self._bucket_limits(endpoint, rate_limit)
+        if endpoint not in self._token_limits:
+            return self._acquire_limits(endpoint, limits, tokens, max_wait, algorithm)
+
+        granted, wait = self._acquire_limits(endpoint, limits, 1, max_wait, algorithm)
+        if not granted:
+            return False, wait
+        granted, token_wait = self._acquire_limits(
+            endpoint, self._cost_limits(endpoint, rate_limit), tokens, max_wait, algorithm
+        )
+        if not granted:
+            self._refund_limits(endpoint, limits, 1, algorithm)
+            return False, token_wait
+        return True, max(wait, token_wait)
+
+    def _acquire_limits(
+        self,
+        endpoint: str,
+        limits: List[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float],
+        algorithm: str,
+    ) -> Tuple[bool, float]:
+        """Take tokens from storage, or from a local lease if the endpoint has one."""
+        policy = self._lease_policies.get(endpoint)
+        if policy is None:
+            return self._storage.acquire_many(
+                limits, tokens, max_wait=max_wait, algorithm=algorithm
             )
-            self._storage.set_token_bucket(key, bucket)
+        return self._leases.acquire(limits, tokens, policy, max_wait=max_wait, algorithm=algorithm)
+
+    def _refund_limits(
+        self, endpoint: str, limits: List[Tuple[str, int, timedelta]], tokens: float, algorithm: str
+    ) -> None:
+        """Give back tokens to storage, or to the local lease they came from."""
+        if endpoint in self._lease_policies:
+            self._leases.refund(limits, tokens, algorithm=algorithm)
         else:
-            # Update refill rate if limit changed
-            window_seconds = window.total_seconds()
-            if window_seconds > 0:
-                bucket.refill_rate = float(limit) / window_seconds
-                bucket.capacity = float(limit)
-
-        return bucket
-
-    def _wait_for_token(self, bucket: TokenBucket, url: str) -> None:
-        """Wait until token is available."""
-        wait_time = bucket.wait_time()
-        if wait_time > 0:
-            if self._raise_on_limit:
-                raise RateLimitExceeded(
-                    f"Rate limit exceeded for {url}. Wait {wait_time:.2f} seconds."
-                )
+            self._storage.refund(limits, tokens, algorithm=algorithm)
+
+    def _refund(self, endpoint: str, rate_limit: RateLimit, tokens: float) -> None:
+        """Give back the tokens ``_take`` took for a request that never went out."""
+        algorithm = self._algorithm_for(endpoint)
+        limits = self._bucket_limits(endpoint, rate_limit)
+        if endpoint not in self._token_limits:
+            self._refund_limits(endpoint, limits, tokens, algorithm)
+            return
+        self._refund_limits(endpoint, limits, 1, algorithm)
+        self._refund_limits(endpoint, self._cost_limits(endpoint, rate_limit), tokens, algorithm)
+
+    def _estimate_cost(
+        self, cost: Optional[CostEstimate], method: str, url: str, kwargs: Dict[str, Any]
+    ) -> float:
+        """Get the number of tokens to charge a request up front."""
+        if cost is None:
+            cost = self._cost
+        if callable(cost):
+            cost = cost(method, url, kwargs)
+        cost = float(cost)
+        if cost < 0:
+            raise ValueError(f"Request cost must not be negative: {cost}")
+        return cost
+
+    def _reconcile_cost(
+        self,
+        endpoint: str,
+        rate_limit: RateLimit,
+        charged: float,
+        actual_cost: Optional[ResponseCost],
+        response: Any,
+    ) -> None:
+        """Debit or refund the difference between the charged and the actual cost."""
+        actual_cost = actual_cost or self._actual_cost
+        if actual_cost is None:
+            return
+        actual = actual_cost(response)
+        if actual is None:
+            return
+
+        difference = float(actual) - charged
+        limits = self._cost_limits(endpoint, rate_limit)
+        algorithm = self._algorithm_for(endpoint)
+        if difference > 0:
+            # The request already went out, so book the extra for later requests
+            self._acquire_limits(endpoint, limits, difference, None, algorithm)
+        elif difference < 0:
+            self._refund_limits(endpoint, limits, -difference, algorithm)
+        logger.debug(f"Reconciled cost for {endpoint}: charged {charged}, actual {actual}")
+
+    def _wait_queue(self, endpoint: str) -> WaitQueue:
+        """Get the queue of requests waiting on an endpoint."""
+        queue = self._wait_queues.get(endpoint)
+        if queue is None:
+            queue = self._wait_queues.setdefault(endpoint, WaitQueue(self._scheduling))
+        return queue
+
+    def _limit_for(self, url: str, endpoint: str) -> Optional[RateLimit]:
+        """Get the rate limit a request must fit, applying default limits if none is stored."""
+        rate_limit = self._lookup_rate_limit(endpoint)
+        if rate_limit is None and self._default_limits:
+            self._apply_default_limits(url)
+            rate_limit = self._storage.get_rate_limit(endpoint)
+        return rate_limit
 
+    def _acquire(
+        self,
+        endpoint: str,
+        rate_limit: RateLimit,
+        url: str,
+        tokens: float = 1.0,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+    ) -> None:
+        """Take tokens for the endpoint, sleeping until they are usable."""
+        if max_wait is None and self._raise_on_limit:
+            max_wait = 0.0
+
+        def sleep(wait_time: float) -> None:
             logger.info(
                 f"Rate limit reached for {url}, waiting {wait_time:.2f} seconds"
             )
             time.sleep(wait_time)
 
-        # Consume token
-        bucket.refill()
-        if not bucket.consume():
-            # Should not happen after wait, but handle edge case
-            time.sleep(0.1)
-            bucket.refill()
-            bucket.consume()
-
-    def _update_from_response(self, response: requests.Response) -> None:
-        """Update rate limit info from response headers."""
-        detected = self._detector.detect_from_response(response)
+        granted, wait_time = self._wait_queue(endpoint).admit(
+            lambda max_wait: self._take(endpoint, rate_limit, tokens, max_wait),
+            max_wait,
+            sleep,
+            priority=priority,
+            weight=weight,
+            tokens=tokens,
+        )
+        if not granted:
+            raise RateLimitExceeded(f"Rate limit exceeded for {url}. Wait {wait_time:.2f} seconds.")
+
+    @contextmanager
+    def _in_flight(
+        self,
+        endpoint: str,
+        url: str,
+        deadline: Optional[float],
+        rate_limit: Optional[RateLimit] = None,
+        tokens: float = 0.0,
+    ) -> Iterator[None]:
+        """Hold one of the endpoint's concurrency slots, if it has a limit."""
+        release = self._hold_slot(endpoint, url, deadline, rate_limit, tokens)
+        try:
+            yield
+        finally:
+            if release is not None:
+                release()
+
+    def _hold_slot(
+        self,
+        endpoint: str,
+        url: str,
+        deadline: Optional[float],
+        rate_limit: Optional[RateLimit] = None,
+        tokens: float = 0.0,
+    ) -> Optional[Callable[[], None]]:
+        """
+        Take one of the endpoint's concurrency slots.
+
+        Args:
+            rate_limit: Limit the request's ``tokens`` were taken under, to
+                refund them if no slot frees up in time
+
+        Returns:
+            What gives the slot back, or None if the endpoint is uncapped
+        """
+        limit = self._concurrency.get(endpoint)
+        if limit is None:
+            return None
+
+        if deadline is not None:
+            timeout: Optional[float] = max(0.0, deadline - time.monotonic())
+        else:
+            timeout = 0.0 if self._raise_on_limit else None
+        try:
+            slot = limit.acquire(timeout)
+            if slot is None:
+                raise RateLimitExceeded(f"Concurrency limit of {limit.limit} reached for {url}.")
+        except BaseException:
+            if rate_limit:
+                # The request is never sent, so its tokens are not spent
+                self._refund(endpoint, rate_limit, tokens)
+            raise
+        return lambda: limit.release(slot)
+
+    def _update_from_response(self, response: requests.Response) -> bool:
+        """
+        Update rate limit info from response headers.
+
+        Returns:
+            True if the limiter state was resynchronised with the server
+        """
+        context = self._request_context(str(response.url))
+        detected = self._detector.detect_from_response(response, domain=context.host)
         if not detected:
-            return
+            self._adapt(context.endpoint, response.status_code)
+            return False
 
-        endpoint = self._get_endpoint_key(response.url)
+        endpoint = context.endpoint
         limit = detected.get("limit")
         remaining = detected.get("remaining")
         reset_time = detected.get("reset_time")
@@ -186,17 +557,74 @@ class RateLimiter:
                 window=window,
             )
             self._storage.set_rate_limit(endpoint, rate_limit)
+            self._no_limits.pop(endpoint, None)
 
-            # Update or create token bucket
-            bucket = self._get_or_create_bucket(endpoint, limit, window)
-            # Adjust tokens based on remaining
+            # Server-reported remaining is authoritative, overwrite the bucket
+            # and forget leased tokens it no longer accounts for
             if remaining is not None:
-                bucket.tokens = min(bucket.capacity, float(remaining))
-                bucket.last_update = datetime.utcnow()
+                self._leases.discard(f"{endpoint}:")
+                self._set_remaining(endpoint, remaining, limit, window)
 
             logger.debug(
                 f"Rate limit updated for {endpoint}: {remaining}/{limit} remaining"
             )
+            self._update_token_limit(endpoint, detected.get("tokens"))
+            return remaining is not None
+
+        self._adapt(endpoint, response.status_code)
+        return False
+
+    def _adapt(self, endpoint: str, status_code: int) -> None:
+        """Feed a response without limit headers to the endpoint's adaptive rate."""
+        adaptive = self._adaptive.get(endpoint)
+        if adaptive is None:
+            return
+        limit = adaptive.update(status_code)
+        if limit is None:
+            return
+
+        self._storage.set_rate_limit(endpoint, adaptive.to_rate_limit(endpoint))
+        logger.debug(f"Adaptive limit for {endpoint} is now {limit} per {adaptive.window}")
+
+    def _update_token_limit(self, endpoint: str, detected: Optional[Dict[str, Any]]) -> None:
+        """Track the token budget an API reports next to its request limit."""
+        token_limit = self._record_token_limit(endpoint, detected)
+        if token_limit is not None:
+            self._storage.set_remaining(*self._token_remaining_args(endpoint, token_limit))
+
+    def _record_token_limit(
+        self, endpoint: str, detected: Optional[Dict[str, Any]]
+    ) -> Optional[RateLimit]:
+        """Remember a detected token budget, returning it if its bucket should be resynced."""
+        if not detected:
+            return None
+        limit = detected.get("limit")
+        remaining = detected.get("remaining")
+        reset_time = detected.get("reset_time")
+        window = detected.get("window")
+        if not (limit and reset_time and window):
+            return None
+
+        token_limit = self._token_limits[endpoint] = RateLimit(
+            endpoint=endpoint,
+            limit=limit,
+            remaining=limit if remaining is None else remaining,
+            reset_time=reset_time,
+            window=window,
+        )
+        return token_limit if remaining is not None else None
+
+    def _token_remaining_args(
+        self, endpoint: str, token_limit: RateLimit
+    ) -> Tuple[str, int, int, timedelta, str]:
+        """Get ``StorageBackend.set_remaining`` arguments for an endpoint's token bucket."""
+        return (
+            self._endpoint_bucket_key(endpoint, "tokens"),
+            token_limit.remaining,
+            token_limit.limit,
+            token_limit.window,
+            self._algorithm_for(endpoint),
+        )
 
     def _apply_default_limits(self, url: str) -> None:
         """Apply default limits if no rate limit info exists."""
@@ -209,122 +637,335 @@ class RateLimiter:
         if self._storage.get_rate_limit(endpoint):
             return
 
-        # Apply defaults
-        if "requests_per_second" in self._default_limits:
-            limit = self._default_limits["requests_per_second"]
-            window = timedelta(seconds=1)
-        elif "requests_per_minute" in self._default_limits:
-            limit = self._default_limits["requests_per_minute"]
-            window = timedelta(minutes=1)
-        elif "requests_per_hour" in self._default_limits:
-            limit = self._default_limits["requests_per_hour"]
-            window = timedelta(hours=1)
-        else:
-            return
-
-        # Create default rate limit
-        rate_limit = RateLimit(
-            endpoint=endpoint,
-            limit=limit,
-            remaining=limit,
-            reset_time=datetime.utcnow() + window,
-            window=window,
-        )
-        self._storage.set_rate_limit(endpoint, rate_limit)
+        rate_limit = self._default_rate_limit(endpoint)
+        if rate_limit is not None:
+            self._storage.set_rate_limit(endpoint, rate_limit)
 
-    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+    def _default_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Set an endpoint up with the default limits, returning the rate limit to store."""
+        # Apply defaults, enforcing every configured window together
+        windows = [
+            (self._default_limits[name], window)
+            for name, window in DEFAULT_LIMIT_WINDOWS.items()
+            if name in self._default_limits
+        ]
+        if not windows:
+            return None
+
+        composite = CompositeLimit(windows)
+        if len(windows) > 1:
+            self._composite_limits.setdefault(endpoint, composite)
+        if "algorithm" in self._default_limits:
+            self._endpoint_algorithms.setdefault(endpoint, self._default_limits["algorithm"])
+        return composite.to_rate_limit(endpoint)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        cost: Optional[CostEstimate] = None,
+        actual_cost: Optional[ResponseCost] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **kwargs,
+    ) -> requests.Response:
         """
         Make a rate-limited HTTP request.
 
         Args:
             method: HTTP method (GET, POST, PUT, DELETE, PATCH)
             url: Request URL
+            cost: Tokens to charge up front, or a function of (method, url,
+                kwargs) estimating them (defaults to the limiter's cost)
+            actual_cost: Function reading the true cost from the response;
+                the difference is debited or refunded (defaults to the
+                limiter's actual_cost)
+            priority: Class of the request when tokens are scarce; higher
+                classes are admitted first
+            weight: Share of this request's class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit,
+                including a 429 retry; fails fast if the projected wait is
+                longer (defaults to no bound, or 0 with raise_on_limit)
             **kwargs: Additional arguments passed to requests.request()
 
         Returns:
             requests.Response object
 
         Raises:
-            RateLimitExceeded: If raise_on_limit=True and limit is exceeded
+            RateLimitExceeded: If the limit is exceeded and raise_on_limit=True,
+                or the wait would exceed max_wait
         """
-        endpoint = self._get_endpoint_key(url)
-
-        # Apply default limits if configured
-        self._apply_default_limits(url)
-
-        # Get rate limit info
-        rate_limit = self._storage.get_rate_limit(endpoint)
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        endpoint = self._request_context(url).endpoint
+        charged = self._estimate_cost(cost, method, url, kwargs)
 
+        # Get rate limit info, falling back to default limits if configured
+        rate_limit = self._limit_for(url, endpoint)
         if rate_limit:
-            # Use detected rate limits
-            bucket = self._get_or_create_bucket(
-                endpoint, rate_limit.limit, rate_limit.window
-            )
-            self._wait_for_token(bucket, url)
-        elif self._default_limits:
-            # Use default limits
-            self._apply_default_limits(url)
-            rate_limit = self._storage.get_rate_limit(endpoint)
-            if rate_limit:
-                bucket = self._get_or_create_bucket(
-                    endpoint, rate_limit.limit, rate_limit.window
-                )
-                self._wait_for_token(bucket, url)
+            self._acquire(endpoint, rate_limit, url, charged, priority, weight, max_wait)
 
         # Make the request
-        response = self._session.request(method, url, **kwargs)
+        with self._in_flight(endpoint, url, deadline, rate_limit, charged):
+            response = self._session.request(method, url, **kwargs)
 
-        # Update rate limit info from response
-        self._update_from_response(response)
+        # Update rate limit info from response; server-reported state wins
+        # over our own cost accounting
+        if not self._update_from_response(response) and rate_limit:
+            self._reconcile_cost(endpoint, rate_limit, charged, actual_cost, response)
 
         # Handle 429 responses
         if response.status_code == 429:
-            retry_after = response.headers.get("Retry-After")
-            if retry_after:
-                try:
-                    wait_time = int(retry_after)
-                    logger.warning(
-                        f"Received 429 for {url}, waiting {wait_time} seconds"
-                    )
-                    if not self._raise_on_limit:
-                        time.sleep(wait_time)
-                        # Retry once
+            wait_time = self._detector.get_retry_after(response.headers)
+            if wait_time is not None:
+                logger.warning(f"Received 429 for {url}, waiting {wait_time:g} seconds")
+                if not self._raise_on_limit and (
+                    deadline is None or time.monotonic() + wait_time <= deadline
+                ):
+                    time.sleep(wait_time)
+                    # Retry once
+                    with self._in_flight(endpoint, url, deadline):
                         response = self._session.request(method, url, **kwargs)
-                        self._update_from_response(response)
-                except (ValueError, TypeError):
-                    pass
-
-        # Save bucket state
-        if rate_limit:
-            bucket = self._get_or_create_bucket(
-                endpoint, rate_limit.limit, rate_limit.window
-            )
-            self._storage.set_token_bucket(self._get_bucket_key(endpoint), bucket)
+                    self._update_from_response(response)
 
         return response
 
-    def wrap_session(self, session: requests.Session) -> None:
+    def try_acquire(self, url: str, cost: float = 1.0) -> Tuple[bool, float]:
+        """
+        Take tokens for a request to a URL if they are available now.
+
+        Never blocks. Use it to send the request some other way, or to
+        decide to skip or defer it.
+
+        Args:
+            url: Request URL
+            cost: Tokens to take
+
+        Returns:
+            Tuple of (granted, wait_seconds): whether the tokens were taken,
+            and if not, how long until they are expected to be available
+        """
+        if cost < 0:
+            raise ValueError(f"Request cost must not be negative: {cost}")
+        endpoint = self._request_context(url).endpoint
+        rate_limit = self._limit_for(url, endpoint)
+        if not rate_limit:
+            return True, 0.0
+        return self._wait_queue(endpoint).admit(
+            lambda max_wait: self._take(endpoint, rate_limit, cost, max_wait), 0.0
+        )
+
+    def wrap_session(self, session: requests.Session) -> requests.Session:
         """
         Wrap an existing requests.Session with rate limiting.
 
-        This modifies the session object in-place by wrapping its request method.
+        Mounts a ``RateLimitedAdapter`` for HTTP and HTTPS in place of the
+        session's adapters, keeping their pool and retry settings. Requests
+        still go through the session, with its headers, auth, cookies and
+        connection pool.
 
         Args:
             session: requests.Session object to wrap
+
+        Returns:
+            The same session, for chaining
+        """
+        from smartratelimit.requests_adapter import RateLimitedAdapter
+
+        for prefix in ("https://", "http://"):
+            current = session.get_adapter(prefix)
+            adapter_kwargs: Dict[str, Any] = {}
+            if isinstance(current, requests.adapters.HTTPAdapter):
+                adapter_kwargs = {
+                    "pool_connections": current._pool_connections,
+                    "pool_maxsize": current._pool_maxsize,
+                    "max_retries": current.max_retries,
+                    "pool_block": current._pool_block,
+                }
+            session.mount(prefix, RateLimitedAdapter(self, **adapter_kwargs))
+        return session
+
+    def add_route(self, host: str, template: str) -> None:
+        """
+        Register a route template so matching requests get their own limits.
+
+        Once registered, URLs under the route are keyed per route for
+        limiting, storage, ``get_status`` and ``set_limit``.
+
+        Args:
+            host: Domain or URL of the API, e.g. 'api.github.com'
+            template: Path template with ``{name}`` placeholders, e.g.
+                '/repos/{owner}/{repo}/issues'
+        """
+        if not host.startswith(("http://", "https://")):
+            host = f"https://{host}"
+        self._routes.add(urlparse(host).netloc, template)
+        self._resolve_origin.cache_clear()
+
+    def set_lease(
+        self,
+        endpoint: str,
+        lease_seconds: Optional[float] = 1.0,
+        max_share: float = 0.1,
+    ) -> None:
+        """
+        Spend an endpoint's tokens from local leases instead of storage.
+
+        The limiter reserves a block of tokens from storage in one call and
+        spends it in process, so most requests need no storage round trip.
+        Lease sizes follow the local request rate. Unused tokens are given
+        back when a lease expires, on ``close()`` and on exit from a ``with``
+        block. Other processes cannot use tokens leased here, so larger
+        leases trade accuracy for fewer round trips.
+
+        Args:
+            endpoint: Endpoint URL or domain
+            lease_seconds: Lease enough tokens for this many seconds of local
+                requests; None turns leasing off for the endpoint
+            max_share: Largest share of the endpoint's smallest limit one
+                lease may hold
         """
-        original_request = session.request
+        # Normalize endpoint
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = f"https://{endpoint}"
 
-        def rate_limited_request(method, url, **kwargs):
-            return self.request(method, url, **kwargs)
+        endpoint_key = self._get_endpoint_key(endpoint)
+        if lease_seconds is None:
+            self._lease_policies.pop(endpoint_key, None)
+            self._leases.release(f"{endpoint_key}:")
+        else:
+            self._lease_policies[endpoint_key] = LeasePolicy(lease_seconds, max_share)
+
+    def set_concurrency(
+        self,
+        endpoint: str,
+        max_concurrency: Optional[int],
+        lease_seconds: float = 60.0,
+    ) -> None:
+        """
+        Cap the requests in flight to an endpoint at once.
 
-        session.request = rate_limited_request
+        Rate limits bound how fast requests start; this bounds how many are
+        outstanding, for APIs that limit concurrent connections or slow down
+        under load. Slots are shared through storage, so the cap holds across
+        processes sharing SQLite or Redis storage. A request waits for a free
+        slot like it waits for tokens, and raises ``RateLimitExceeded`` where
+        it would not wait for tokens.
+
+        Args:
+            endpoint: Endpoint URL or domain
+            max_concurrency: Most requests in flight at once; None removes
+                the cap
+            lease_seconds: A slot held longer than this is freed, so a
+                process that dies mid-request cannot hold it for good; keep
+                it above the longest request
+        """
+        # Normalize endpoint
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = f"https://{endpoint}"
+
+        endpoint_key = self._get_endpoint_key(endpoint)
+        if max_concurrency is None:
+            self._concurrency.pop(endpoint_key, None)
+        else:
+            self._concurrency[endpoint_key] = ConcurrencyLimit(
+                self._storage,
+                self._endpoint_bucket_key(endpoint_key, "concurrency"),
+                max_concurrency,
+                lease_seconds,
+            )
+
+    def set_pacing(self, endpoint: str, burst: Optional[int] = 1) -> None:
+        """
+        Spread an endpoint's requests evenly instead of in bursts.
+
+        A bucket normally starts full, so with a 5000 per hour limit a batch
+        job can send thousands of requests at once, which can trip an API's
+        abuse detection, and then stall. Paced, the endpoint's request limits
+        hold at most ``burst`` tokens and refill at the same average rate,
+        so requests go out at an even interval (0.72 seconds for 5000 per
+        hour with a burst of 1). Server-reported ``remaining`` values still
+        resynchronise the bucket, capped at the burst.
+
+        Args:
+            endpoint: Endpoint URL or domain
+            burst: Most requests sent back to back; None turns pacing off
+        """
+        if burst is not None and burst < 1:
+            raise ValueError(f"burst must be at least 1: {burst}")
+
+        # Normalize endpoint
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = f"https://{endpoint}"
+
+        endpoint_key = self._get_endpoint_key(endpoint)
+        if burst is None:
+            self._pacing.pop(endpoint_key, None)
+        else:
+            self._pacing[endpoint_key] = burst
+        # Leased tokens were sized for the old capacity
+        self._leases.release(f"{endpoint_key}:")
+
+    def set_adaptive(
+        self,
+        endpoint: str,
+        limit: Optional[int],
+        window: str = "1m",
+        min_limit: int = 1,
+        max_limit: Optional[int] = None,
+        increase: float = 1.0,
+        decrease: float = 0.5,
+    ) -> None:
+        """
+        Learn an endpoint's rate limit from its responses.
+
+        For APIs that send no rate limit headers. Starting from ``limit``
+        requests per ``window``, the limit grows by ``increase`` for every
+        window's worth of successful responses and is multiplied by
+        ``decrease`` on a 429 or 503, at most once per window. The learned
+        rate is kept in storage, so processes sharing SQLite or Redis
+        storage converge on the server's real limit together, and a limiter
+        set up later starts from it instead of ``limit``.
+
+        Args:
+            endpoint: Endpoint URL or domain
+            limit: Requests per window to start from; None stops adapting
+                and keeps the current limit
+            window: Time window (e.g., '1s', '1m')
+            min_limit: Never go below this many requests per window
+            max_limit: Never go above this many requests per window
+            increase: Requests per window added per window of successes
+            decrease: Factor the limit is multiplied by on backoff
+        """
+        # Normalize endpoint
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = f"https://{endpoint}"
+
+        endpoint_key = self._get_endpoint_key(endpoint)
+        if limit is None:
+            self._adaptive.pop(endpoint_key, None)
+            return
+
+        adaptive = AdaptiveRate(
+            self._storage,
+            self._endpoint_bucket_key(endpoint_key, "adaptive"),
+            limit,
+            self._parse_window(window),
+            min_limit,
+            max_limit,
+            increase,
+            decrease,
+        )
+        self._adaptive[endpoint_key] = adaptive
+        self.set_limit(endpoint, adaptive.limit, window)
 
     def get_status(self, endpoint: str) -> Optional[RateLimitStatus]:
         """
         Get current rate limit status for an endpoint.
 
         Args:
-            endpoint: Endpoint URL or domain
+            endpoint: Endpoint URL or domain; URLs under a registered route
+                report that route's limit
 
         Returns:
             RateLimitStatus object or None if no info available
@@ -342,7 +983,11 @@ class RateLimiter:
         return None
 
     def set_limit(
-        self, endpoint: str, limit: int, window: str = "1h"
+        self,
+        endpoint: str,
+        limit: int,
+        window: str = "1h",
+        algorithm: Optional[str] = None,
     ) -> None:
         """
         Manually set rate limit for an endpoint.
@@ -351,6 +996,8 @@ class RateLimiter:
             endpoint: Endpoint URL or domain
             limit: Maximum number of requests
             window: Time window (e.g., '1h', '1m', '30s', '1d')
+            algorithm: Limiting algorithm for this endpoint (defaults to the
+                limiter's algorithm)
         """
         # Normalize endpoint
         if not endpoint.startswith(("http://", "https://")):
@@ -370,6 +1017,46 @@ class RateLimiter:
         )
 
         self._storage.set_rate_limit(endpoint_key, rate_limit)
+        self._composite_limits.pop(endpoint_key, None)
+        self._no_limits.pop(endpoint_key, None)
+        if algorithm is not None:
+            self._endpoint_algorithms[endpoint_key] = validate_algorithm(algorithm)
+
+    def set_limits(
+        self,
+        endpoint: str,
+        limits: Dict[str, int],
+        algorithm: Optional[str] = None,
+    ) -> None:
+        """
+        Manually set several rate limits enforced together on an endpoint.
+
+        Every window is checked in a single storage operation and a request
+        waits for the slowest one.
+
+        Args:
+            endpoint: Endpoint URL or domain
+            limits: Maximum requests per time window, e.g. {'1s': 10, '1d': 5000}
+            algorithm: Limiting algorithm for this endpoint (defaults to the
+                limiter's algorithm)
+        """
+        if not limits:
+            raise ValueError("At least one limit is required")
+
+        # Normalize endpoint
+        if not endpoint.startswith(("http://", "https://")):
+            endpoint = f"https://{endpoint}"
+
+        endpoint_key = self._get_endpoint_key(endpoint)
+        composite = CompositeLimit(
+            [(limit, self._parse_window(window)) for window, limit in limits.items()]
+        )
+
+        self._storage.set_rate_limit(endpoint_key, composite.to_rate_limit(endpoint_key))
+        self._composite_limits[endpoint_key] = composite
+        self._no_limits.pop(endpoint_key, None)
+        if algorithm is not None:
+            self._endpoint_algorithms[endpoint_key] = validate_algorithm(algorithm)
 
     def _parse_window(self, window: str) -> timedelta:
         """Parse window string to timedelta."""
@@ -406,7 +1093,15 @@ class RateLimiter:
             if not endpoint.startswith(("http://", "https://")):
                 endpoint = f"https://{endpoint}"
             endpoint_key = self._get_endpoint_key(endpoint)
+            self._leases.discard(f"{endpoint_key}:")
             self._storage.clear(endpoint_key)
+            self._composite_limits.pop(endpoint_key, None)
+            self._token_limits.pop(endpoint_key, None)
+            self._no_limits.pop(endpoint_key, None)
         else:
+            self._leases.discard()
             self._storage.clear()
+            self._composite_limits.clear()
+            self._token_limits.clear()
+            self._no_limits.clear()
 
@@ -7,6 +7,33 @@ from urllib.parse import urlparse
 
 import requests
 
+# Go-style duration components, e.g. "6m0s", "1.5s" or "20ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d*)?)(h|ms|m|s|us|µs|ns)")
+_DURATION_UNITS = {
+    "h": 3600.0,
+    "m": 60.0,
+    "s": 1.0,
+    "ms": 1e-3,
+    "us": 1e-6,
+    "µs": 1e-6,
+    "ns": 1e-9,
+}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """Parse a Go-style duration string such as '6m0s' or '20ms' to seconds."""
+    value = value.strip()
+    position = 0
+    seconds = 0.0
+    for match in _DURATION_PART.finditer(value):
+        if match.start() != position:
+            return None
+        seconds += float(match.group(1)) * _DURATION_UNITS[match.group(2)]
+        position = match.end()
+    if position == 0 or position != len(value):
+        return None
+    return seconds
+
 
 class RateLimitDetector:
     """Detects rate limits from HTTP response headers."""
@@ -36,6 +63,9 @@ class RateLimitDetector:
             "Retry-After",
             "X-Retry-After",
         ],
+        "retry_after_ms": [
+            "retry-after-ms",
+        ],
     }
 
     # API-specific patterns
@@ -58,7 +88,15 @@ class RateLimitDetector:
         "api.openai.com": {
             "limit": "x-ratelimit-limit-requests",
             "remaining": "x-ratelimit-remaining-requests",
-            "reset": "x-ratelimit-reset-requests",
+            "reset": "x-ratelimit-reset-requests",  # Duration until full, e.g. "6m0s"
+            "refill": True,
+            # Second bucket on the same endpoint, charged the request's cost
+            "tokens": {
+                "limit": "x-ratelimit-limit-tokens",
+                "remaining": "x-ratelimit-remaining-tokens",
+                "reset": "x-ratelimit-reset-tokens",
+                "refill": True,
+            },
         },
     }
 
@@ -72,20 +110,26 @@ class RateLimitDetector:
         self.custom_headers_map = custom_headers_map or {}
 
     def detect_from_response(
-        self, response: requests.Response
+        self, response: requests.Response, domain: Optional[str] = None
     ) -> Optional[Dict[str, any]]:
         """
         Detect rate limit information from HTTP response.
 
+        Args:
+            response: Response whose headers to read
+            domain: Lower-cased host of ``response.url`` if the caller has
+                already parsed it
+
         Returns:
-            Dict with keys: limit, remaining, reset_time, window
-            or None if no rate limit info found
+            Dict with keys: limit, remaining, reset_time, window, plus
+            ``tokens`` (a dict with the same keys) when the API also reports
+            a token budget, or None if no rate limit info found
         """
         headers = response.headers
-        url = response.url
 
         # Get domain for API-specific patterns
-        domain = urlparse(url).netloc.lower()
+        if domain is None:
+            domain = urlparse(response.url).netloc.lower()
 
         # Try API-specific pattern first
         if domain in self.API_PATTERNS:
@@ -119,18 +163,34 @@ class RateLimitDetector:
 
         # Try to extract from Retry-After on 429
         if response.status_code == 429:
-            retry_after = self._find_header(headers, self.HEADER_PATTERNS["retry_after"])
-            if retry_after:
-                retry_seconds = self._parse_retry_after(headers[retry_after])
-                if retry_seconds:
-                    return {
-                        "limit": None,
-                        "remaining": 0,
-                        "reset_time": datetime.utcnow()
-                        + timedelta(seconds=retry_seconds),
-                        "window": timedelta(seconds=retry_seconds),
-                    }
+            retry_seconds = self.get_retry_after(headers)
+            if retry_seconds:
+                return {
+                    "limit": None,
+                    "remaining": 0,
+                    "reset_time": datetime.utcnow() + timedelta(seconds=retry_seconds),
+                    "window": timedelta(seconds=retry_seconds),
+                }
+
+        return None
 
+    def get_retry_after(self, headers: Dict[str, str]) -> Optional[float]:
+        """
+        Get how long the server asked us to wait, in seconds.
+
+        ``retry-after-ms`` is preferred over ``Retry-After`` since it is more
+        precise.
+        """
+        retry_after_ms = self._find_header(headers, self.HEADER_PATTERNS["retry_after_ms"])
+        if retry_after_ms:
+            try:
+                return max(0.0, float(headers[retry_after_ms]) / 1000)
+            except (ValueError, TypeError):
+                pass
+
+        retry_after = self._find_header(headers, self.HEADER_PATTERNS["retry_after"])
+        if retry_after:
+            return self._parse_retry_after(headers[retry_after])
         return None
 
     def _find_header(self, headers: Dict[str, str], candidates: list) -> Optional[str]:
@@ -174,6 +234,15 @@ class RateLimitDetector:
         if remaining is None:
             remaining = limit
 
+        # A refill-style reset is the time until the bucket is full again, so
+        # the whole window is that time scaled up to the full limit; a full
+        # bucket has nothing to scale, so its reset is kept as the window
+        if pattern.get("refill") and window is not None:
+            if not window:
+                reset_time = window = None
+            elif 0 <= remaining < limit:
+                window = window * limit / (limit - remaining)
+
         # If we have remaining but no reset time, estimate window
         if reset_time is None and limit and remaining is not None:
             # Default to 1 hour window if we can't determine
@@ -191,12 +260,17 @@ class RateLimitDetector:
                     window = timedelta(hours=1)
                     reset_time = datetime.utcnow() + window
 
-            return {
+            result = {
                 "limit": limit,
                 "remaining": remaining if remaining is not None else limit,
                 "reset_time": reset_time,
                 "window": window,
             }
+            if isinstance(pattern.get("tokens"), dict):
+                tokens = self._extract_with_pattern(headers, pattern["tokens"], domain)
+                if tokens:
+                    result["tokens"] = tokens
+            return result
 
         return None
 
@@ -225,6 +299,11 @@ class RateLimitDetector:
         except (ValueError, TypeError, OSError):
             pass
 
+        # Try a Go-style duration such as "6m0s" or "20ms"
+        seconds = parse_duration(reset_value)
+        if seconds is not None:
+            return datetime.utcnow() + timedelta(seconds=seconds), timedelta(seconds=seconds)
+
         try:
             # Try ISO 8601 format
             reset_time = datetime.fromisoformat(reset_value.replace("Z", "+00:00"))
@@ -0,0 +1,326 @@
+"""httpx transports that rate limit every request a client sends."""
+
+import asyncio
+import threading
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import httpx
+except ImportError:
+    raise ImportError(
+        "httpx support requires the 'httpx' package. "
+        "Install it with: pip install smartratelimit[httpx]"
+    )
+
+from smartratelimit.async_client import AsyncRateLimiter
+from smartratelimit.core import CostEstimate, RateLimiter, ResponseCost
+
+# Request extension holding per-request overrides of the transport's settings,
+# e.g. client.get(url, extensions={"smartratelimit": {"priority": 10}})
+EXTENSION = "smartratelimit"
+
+
+class _Settings:
+    """How one request is limited: transport defaults overridden by its extension."""
+
+    __slots__ = ("cost", "actual_cost", "priority", "weight", "max_wait")
+
+    def __init__(
+        self,
+        cost: Optional[CostEstimate],
+        actual_cost: Optional[ResponseCost],
+        priority: int,
+        weight: float,
+        max_wait: Optional[float],
+    ):
+        self.cost = cost
+        self.actual_cost = actual_cost
+        self.priority = priority
+        self.weight = weight
+        self.max_wait = max_wait
+
+    def for_request(self, request: httpx.Request) -> "_Settings":
+        """Apply the request's ``smartratelimit`` extension, if it has one."""
+        overrides = request.extensions.get(EXTENSION)
+        if not overrides:
+            return self
+        return _Settings(
+            overrides.get("cost", self.cost),
+            overrides.get("actual_cost", self.actual_cost),
+            overrides.get("priority", self.priority),
+            overrides.get("weight", self.weight),
+            overrides.get("max_wait", self.max_wait),
+        )
+
+
+class _SlotStream(httpx.SyncByteStream):
+    """Response body that gives back its concurrency slot when closed."""
+
+    def __init__(self, stream: httpx.SyncByteStream, release: Callable[[], None]):
+        self._stream = stream
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                release()
+
+
+class _AsyncSlotStream(httpx.AsyncByteStream):
+    """Async response body that gives back its concurrency slot when closed."""
+
+    def __init__(self, stream: httpx.AsyncByteStream, release: Callable[[], Awaitable[None]]):
+        self._stream = stream
+        self._release: Optional[Callable[[], Awaitable[None]]] = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            release, self._release = self._release, None
+            if release is not None:
+                await release()
+
+
+class _Pools:
+    """
+    Connection pools sized to per-endpoint concurrency caps.
+
+    Endpoints without a cap share one default transport. Each capped endpoint
+    gets its own, holding at most as many connections as it may have
+    requests in flight, so the pool neither opens connections the limiter
+    would leave idle nor queues requests the limiter has already admitted.
+    """
+
+    def __init__(self, make: Callable[..., Any], transport: Any, kwargs: Dict[str, Any]):
+        self._make = make
+        self._kwargs = kwargs
+        self._shared = transport
+        self._owned = transport is None
+        if transport is None:
+            self._shared = make(**kwargs)
+        self._pools: Dict[str, Tuple[int, Any]] = {}
+        self._retired: List[Any] = []
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, concurrency: Optional[int]) -> Any:
+        """Get the transport to send an endpoint's requests through."""
+        if concurrency is None or not self._owned:
+            # A caller-supplied transport is used as is; its pool is its own
+            return self._shared
+        pool = self._pools.get(endpoint)
+        if pool is not None and pool[0] == concurrency:
+            return pool[1]
+        with self._lock:
+            pool = self._pools.get(endpoint)
+            if pool is None or pool[0] != concurrency:
+                if pool is not None:
+                    # Requests may still be streaming through the old pool
+                    self._retired.append(pool[1])
+                limits = httpx.Limits(
+                    max_connections=concurrency, max_keepalive_connections=concurrency
+                )
+                pool = self._pools[endpoint] = (
+                    concurrency,
+                    self._make(**{**self._kwargs, "limits": limits}),
+                )
+            return pool[1]
+
+    def all(self) -> List[Any]:
+        """Every transport made or wrapped, for closing."""
+        with self._lock:
+            return [self._shared] + [pool for _, pool in self._pools.values()] + self._retired
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """
+    httpx transport that rate limits every request a client sends.
+
+    Mount it on an ``httpx.Client`` to limit all of its traffic, including
+    redirect hops, without routing calls through ``RateLimiter.request()``:
+
+        >>> limiter = RateLimiter()
+        >>> client = httpx.Client(transport=RateLimitedTransport(limiter))
+        >>> response = client.get("https://api.github.com/users/octocat")
+
+    Each request waits for tokens before it is sent, and limits detected in
+    the response headers update the limiter. A concurrency slot is held
+    until the response is closed, so streamed bodies count as in flight.
+    429 responses are returned to the caller rather than retried, since a
+    streamed request body cannot be sent twice.
+
+    Per-request settings go in the ``"smartratelimit"`` request extension,
+    a dict with any of ``cost``, ``actual_cost``, ``priority``, ``weight``
+    and ``max_wait``.
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        transport: Optional[httpx.BaseTransport] = None,
+        cost: Optional[CostEstimate] = None,
+        actual_cost: Optional[ResponseCost] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **transport_kwargs: Any,
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            limiter: Rate limiter whose limits and storage to use
+            transport: Transport to send requests through (default: an
+                ``httpx.HTTPTransport`` per concurrency-capped endpoint, sized
+                to its cap, and one shared by the rest). A transport given
+                here is used for every endpoint as is: concurrency caps still
+                bound the requests in flight, but do not size its pool
+            cost: Tokens to charge each request up front, or a function of
+                (method, url, {"request": request}) estimating them
+            actual_cost: Function reading the true cost from the response,
+                e.g. from a usage header; the difference from ``cost`` is
+                debited or refunded. It is called before the body is read
+                (default: the limiter's ``actual_cost``)
+            priority: Class of requests when tokens are scarce
+            weight: Share of the class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit
+            **transport_kwargs: Arguments for the ``httpx.HTTPTransport``s
+                made when ``transport`` is not given, e.g. ``http2=True``
+        """
+        self._limiter = limiter
+        self._settings = _Settings(cost, actual_cost, priority, weight, max_wait)
+        self._pools = _Pools(httpx.HTTPTransport, transport, transport_kwargs)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request once the rate limit allows it."""
+        limiter = self._limiter
+        settings = self._settings.for_request(request)
+        url = str(request.url)
+        endpoint = limiter._request_context(url).endpoint
+        deadline = None if settings.max_wait is None else time.monotonic() + settings.max_wait
+        charged = limiter._estimate_cost(settings.cost, request.method, url, {"request": request})
+
+        rate_limit = limiter._limit_for(url, endpoint)
+        if rate_limit:
+            limiter._acquire(
+                endpoint,
+                rate_limit,
+                url,
+                charged,
+                settings.priority,
+                settings.weight,
+                settings.max_wait,
+            )
+
+        concurrency = limiter._concurrency.get(endpoint)
+        transport = self._pools.get(endpoint, concurrency and concurrency.limit)
+        release = limiter._hold_slot(endpoint, url, deadline, rate_limit, charged)
+        try:
+            response = transport.handle_request(request)
+        except BaseException:
+            if release is not None:
+                release()
+            raise
+        if release is not None:
+            response.stream = _SlotStream(response.stream, release)
+
+        # The client links the request only after the transport returns
+        response.request = request
+
+        if not limiter._update_from_response(response) and rate_limit:
+            limiter._reconcile_cost(endpoint, rate_limit, charged, settings.actual_cost, response)
+        return response
+
+    def close(self) -> None:
+        """Close every connection pool."""
+        for transport in self._pools.all():
+            transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that rate limits every request an ``httpx.AsyncClient`` sends.
+
+    The async counterpart of ``RateLimitedTransport``:
+
+        >>> limiter = AsyncRateLimiter()
+        >>> async with httpx.AsyncClient(transport=AsyncRateLimitedTransport(limiter)) as client:
+        ...     response = await client.get("https://api.github.com/users/octocat")
+    """
+
+    def __init__(
+        self,
+        limiter: AsyncRateLimiter,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cost: Optional[CostEstimate] = None,
+        actual_cost: Optional[ResponseCost] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **transport_kwargs: Any,
+    ):
+        """Initialize the transport (see ``RateLimitedTransport.__init__``)."""
+        self._limiter = limiter
+        self._settings = _Settings(cost, actual_cost, priority, weight, max_wait)
+        self._pools = _Pools(httpx.AsyncHTTPTransport, transport, transport_kwargs)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request once the rate limit allows it."""
+        limiter = self._limiter
+        settings = self._settings.for_request(request)
+        url = str(request.url)
+        endpoint = limiter._get_endpoint_key(url)
+        loop = asyncio.get_running_loop()
+        deadline = None if settings.max_wait is None else loop.time() + settings.max_wait
+        charged = limiter._sync_limiter._estimate_cost(
+            settings.cost, request.method, url, {"request": request}
+        )
+
+        rate_limit = await limiter._limit_for(endpoint)
+        if rate_limit:
+            await limiter._acquire(
+                endpoint,
+                rate_limit,
+                url,
+                charged,
+                settings.priority,
+                settings.weight,
+                settings.max_wait,
+            )
+
+        concurrency = limiter._concurrency.get(endpoint)
+        transport = self._pools.get(endpoint, concurrency and concurrency.limit)
+        release = await limiter._hold_slot(endpoint, url, deadline, rate_limit, charged)
+        try:
+            response = await transport.handle_async_request(request)
+        except BaseException:
+            if release is not None:
+                await release()
+            raise
+        if release is not None:
+            response.stream = _AsyncSlotStream(response.stream, release)
+
+        # The client links the request only after the transport returns
+        response.request = request
+
+        if not await limiter._update_from_response(response) and rate_limit:
+            await limiter._reconcile_cost(
+                endpoint, rate_limit, charged, settings.actual_cost, response
+            )
+        return response
+
+    async def aclose(self) -> None:
+        """Close every connection pool."""
+        for transport in self._pools.all():
+            await transport.aclose()
@@ -0,0 +1,294 @@
+"""Local token leases reserved in blocks from shared storage."""
+
+import math
+import threading
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from smartratelimit.storage import StorageBackend
+
+# How much each new consumption-rate measurement moves the estimate
+_RATE_SMOOTHING = 0.5
+
+# (limits, tokens, algorithm) to give back to storage
+_Refund = Tuple[List[Tuple[str, int, timedelta]], float, str]
+
+
+@dataclass
+class LeasePolicy:
+    """
+    How many tokens an endpoint reserves from shared storage at a time.
+
+    Larger leases save more storage round trips; smaller ones keep the
+    shared state closer to what has really been spent.
+    """
+
+    lease_seconds: float = 1.0  # Lease enough tokens for this long at the local rate
+    max_share: float = 0.1  # Never hold more than this share of the smallest limit
+
+    def __post_init__(self) -> None:
+        if self.lease_seconds <= 0:
+            raise ValueError(f"lease_seconds must be positive: {self.lease_seconds}")
+        if not 0 < self.max_share <= 1:
+            raise ValueError(f"max_share must be in (0, 1]: {self.max_share}")
+
+    def lease_size(self, rate: float, limits: Sequence[Tuple[str, int, timedelta]]) -> float:
+        """Get the number of tokens to lease at ``rate`` tokens per second."""
+        smallest = min(limit for _, limit, _ in limits)
+        # Whole tokens, so sliding logs can record every leased request
+        return float(max(1, math.floor(min(rate * self.lease_seconds, smallest * self.max_share))))
+
+
+class _Lease:
+    """Tokens reserved for one set of limits and the consumption seen on them."""
+
+    __slots__ = (
+        "limits",
+        "algorithm",
+        "size",
+        "tokens",
+        "used",
+        "granted_at",
+        "expires_at",
+        "rate",
+    )
+
+    def __init__(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        algorithm: str,
+        rate: float,
+    ):
+        self.limits = list(limits)
+        self.algorithm = algorithm
+        self.size = 0.0
+        self.tokens = 0.0
+        self.used = 0.0
+        self.granted_at = 0.0
+        self.expires_at = 0.0
+        self.rate = rate
+
+
+class LeaseManager:
+    """
+    Spends tokens from leases held in process, refilling them from storage.
+
+    Each lease is taken from the backend with one ``acquire_many`` call and
+    then spent without I/O. Its size follows the local consumption rate, and
+    tokens left when it expires or is released are refunded to the backend;
+    a background thread returns expired leases nobody is spending from.
+    Every lease has its own lock, and none is held over storage calls.
+    """
+
+    def __init__(self, storage: StorageBackend):
+        self._storage = storage
+        self._leases: Dict[Tuple[str, ...], _Lease] = {}
+        self._locks: Dict[Tuple[str, ...], threading.Lock] = {}
+        # Guards the two maps and the reaper; never held over storage calls
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+
+    def acquire(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        policy: LeasePolicy,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = "token_bucket",
+    ) -> Tuple[bool, float]:
+        """
+        Take tokens from the local lease, refilling it from storage when needed.
+
+        Returns:
+            Tuple of (granted, wait_seconds), as for ``StorageBackend.acquire_many``
+        """
+        key = tuple(item[0] for item in limits)
+        lock = self._lock_for(key)
+        returns: List[_Refund] = []
+        with lock:
+            now = time.monotonic()
+            lease = self._leases.get(key)
+            if lease is not None and lease.algorithm == algorithm and now < lease.expires_at:
+                if lease.tokens >= tokens:
+                    lease.tokens -= tokens
+                    lease.used += tokens
+                    return True, 0.0
+
+            if lease is not None and lease.algorithm != algorithm:
+                self._take_back(lease, returns)
+                lease = None
+            if lease is None:
+                lease = _Lease(limits, algorithm, rate=0.0)
+                with self._lock:
+                    self._leases[key] = lease
+            else:
+                self._measure(lease, now)
+                self._take_back(lease, returns)
+            lease.limits = list(limits)
+            size = max(tokens, policy.lease_size(lease.rate, limits))
+            granted_at = lease.granted_at
+
+        self._refund_all(returns)
+        returns.clear()
+        granted = False
+        if size > tokens:
+            # Only lease what is available now; never book tokens ahead
+            granted, wait = self._storage.acquire_many(
+                limits, size, max_wait=0.0, algorithm=algorithm
+            )
+        if not granted:
+            size = tokens
+            granted, wait = self._storage.acquire_many(
+                limits, tokens, max_wait=max_wait, algorithm=algorithm
+            )
+
+        with lock:
+            current = self._leases.get(key) is lease
+            if not granted:
+                if current and lease.granted_at == granted_at and lease.tokens == 0:
+                    with self._lock:
+                        del self._leases[key]
+                return False, wait
+            if not current:
+                # Released or discarded meanwhile; keep only this request's tokens
+                if size > tokens:
+                    returns.append((lease.limits, size - tokens, algorithm))
+            elif lease.granted_at == granted_at:
+                lease.size = size
+                lease.tokens += size - tokens
+                lease.used = tokens
+                lease.granted_at = now
+                lease.expires_at = now + policy.lease_seconds
+            else:
+                # Another thread refilled meanwhile; pool the tokens in its lease
+                lease.size += size
+                lease.tokens += size - tokens
+                lease.used += tokens
+        if returns:
+            self._refund_all(returns)
+        elif lease.tokens > 0:
+            self._start_reaper()
+        return True, wait
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = "token_bucket",
+    ) -> None:
+        """Give back tokens taken with ``acquire``, to the lease while it is live."""
+        key = tuple(item[0] for item in limits)
+        with self._lock_for(key):
+            lease = self._leases.get(key)
+            if (
+                lease is not None
+                and lease.algorithm == algorithm
+                and time.monotonic() < lease.expires_at
+            ):
+                lease.tokens += tokens
+                lease.used = max(0.0, lease.used - tokens)
+                return
+        self._storage.refund(limits, tokens, algorithm=algorithm)
+
+    def release(self, prefix: Optional[str] = None) -> None:
+        """Refund unused leased tokens, for keys starting with ``prefix`` or all."""
+        returns: List[_Refund] = []
+        for lease in self._drop(prefix):
+            self._take_back(lease, returns)
+        self._refund_all(returns)
+
+    def discard(self, prefix: Optional[str] = None) -> None:
+        """Drop leases without refunding them, e.g. after resyncing with the server."""
+        for lease in self._drop(prefix):
+            lease.tokens = 0.0
+
+    def _lock_for(self, key: Tuple[str, ...]) -> threading.Lock:
+        """Get the lock guarding the lease for a set of limits."""
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._lock:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def _drop(self, prefix: Optional[str]) -> List[_Lease]:
+        """Remove the leases covering keys starting with ``prefix`` (or all)."""
+        with self._lock:
+            keys = [key for key in self._leases if self._matches(key, prefix)]
+        dropped = []
+        for key in keys:
+            with self._lock_for(key), self._lock:
+                lease = self._leases.pop(key, None)
+            if lease is not None:
+                dropped.append(lease)
+        self._wake.set()
+        return dropped
+
+    @staticmethod
+    def _matches(key: Tuple[str, ...], prefix: Optional[str]) -> bool:
+        """Check whether a lease covers a key starting with ``prefix``."""
+        return prefix is None or any(item.startswith(prefix) for item in key)
+
+    @staticmethod
+    def _measure(lease: _Lease, now: float) -> None:
+        """Fold the consumption rate seen over a lease into its estimate."""
+        elapsed = min(now, lease.expires_at) - lease.granted_at
+        if elapsed <= 0:
+            return
+        rate = lease.used / elapsed
+        lease.rate = (
+            rate
+            if lease.rate == 0
+            else (_RATE_SMOOTHING * rate + (1 - _RATE_SMOOTHING) * lease.rate)
+        )
+
+    @staticmethod
+    def _take_back(lease: _Lease, returns: List[_Refund]) -> None:
+        """Empty a lease (its lock held), noting the tokens to refund."""
+        if lease.tokens > 0:
+            returns.append((lease.limits, lease.tokens, lease.algorithm))
+        lease.tokens = 0.0
+
+    def _refund_all(self, returns: List[_Refund]) -> None:
+        """Refund tokens taken back from leases to storage."""
+        for limits, tokens, algorithm in returns:
+            self._storage.refund(limits, tokens, algorithm=algorithm)
+
+    def _return_expired(self, now: float) -> None:
+        """Refund unused tokens of every expired lease."""
+        with self._lock:
+            leases = list(self._leases.items())
+        returns: List[_Refund] = []
+        for key, lease in leases:
+            if lease.tokens > 0 and now >= lease.expires_at:
+                with self._lock_for(key):
+                    if now >= lease.expires_at:
+                        self._take_back(lease, returns)
+        self._refund_all(returns)
+
+    def _start_reaper(self) -> None:
+        """Start the thread returning expired leases if it is not running."""
+        with self._lock:
+            self._wake.set()
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(
+                target=self._run_reaper, name="smartratelimit-leases", daemon=True
+            )
+            self._reaper.start()
+
+    def _run_reaper(self) -> None:
+        """Return leases as they expire until none holds tokens."""
+        while True:
+            with self._lock:
+                self._wake.clear()
+                pending = [lease.expires_at for lease in self._leases.values() if lease.tokens > 0]
+                if not pending:
+                    # The next lease starts a new reaper
+                    self._reaper = None
+                    return
+            # Woken early when a lease is taken or dropped, to recheck expiries
+            self._wake.wait(max(0.0, min(pending) - time.monotonic()))
+            self._return_expired(time.monotonic())
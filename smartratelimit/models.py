@@ -1,8 +1,9 @@
 """Data models for rate limit tracking."""
 
+import time
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional, Tuple
 
 
 @dataclass
@@ -36,6 +37,20 @@ class RateLimitStatus:
         return 1.0 - (self.remaining / self.limit)
 
 
+class RequestContext:
+    """A request URL resolved once for the limiter's hot path."""
+
+    __slots__ = ("host", "endpoint")
+
+    def __init__(self, host: str, endpoint: str):
+        self.host = host  # Lower-cased netloc, as API patterns are keyed
+        self.endpoint = endpoint  # Endpoint key, including a matched route
+
+    def bucket_key(self, limit_type: str = "default") -> str:
+        """Get the token bucket key for this request's endpoint."""
+        return f"{self.endpoint}:{limit_type}"
+
+
 @dataclass
 class RateLimit:
     """Internal rate limit tracking data."""
@@ -59,20 +74,125 @@ class RateLimit:
 
 
 @dataclass
+class CompositeLimit:
+    """
+    Several rate limits enforced together on one endpoint.
+
+    APIs commonly limit per second, per minute and per day at the same time.
+    A request must fit every window and waits for the slowest one; each
+    window keeps its own limiter state under a per-window key.
+    """
+
+    windows: List[Tuple[int, timedelta]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self.windows = sorted(self.windows, key=lambda item: item[1])
+
+    @staticmethod
+    def key_for(key: str, window: timedelta) -> str:
+        """Get the limiter state key for one window."""
+        return f"{key}:{window.total_seconds():g}s"
+
+    def bucket_limits(self, key: str) -> List[Tuple[str, int, timedelta]]:
+        """Get ``(key, limit, window)`` for each window, for ``StorageBackend.acquire_many``."""
+        return [(self.key_for(key, window), limit, window) for limit, window in self.windows]
+
+    def to_rate_limit(self, endpoint: str) -> RateLimit:
+        """Describe the shortest window as the endpoint's rate limit."""
+        limit, window = self.windows[0]
+        return RateLimit(
+            endpoint=endpoint,
+            limit=limit,
+            remaining=limit,
+            reset_time=datetime.utcnow() + window,
+            window=window,
+        )
+
+
+def paced_limit(limit: int, window: timedelta, burst: int) -> Tuple[int, timedelta]:
+    """
+    Get a limit of at most ``burst`` requests with the same average rate.
+
+    ``limit`` per ``window`` becomes ``burst`` per ``window * burst / limit``,
+    so a full bucket holds ``burst`` tokens and refills at the original rate.
+    """
+    if burst >= limit:
+        return limit, window
+    return burst, window * burst / limit
+
+
+def monotonic_to_timestamp(monotonic: float) -> float:
+    """Convert a ``time.monotonic()`` reading to a Unix timestamp."""
+    return time.time() - (time.monotonic() - monotonic)
+
+
+def timestamp_to_monotonic(timestamp: float) -> float:
+    """Convert a Unix timestamp to the ``time.monotonic()`` timeline."""
+    return time.monotonic() - (time.time() - timestamp)
+
+
 class TokenBucket:
-    """Token bucket for rate limiting."""
+    """
+    Token bucket for rate limiting.
+
+    ``last_update`` is a ``time.monotonic()`` reading, so refills are immune to
+    wall-clock steps. Storage backends convert it to wall-clock time when the
+    bucket is persisted.
+    """
 
-    capacity: float
-    tokens: float
-    refill_rate: float  # tokens per second
-    last_update: datetime = field(default_factory=datetime.utcnow)
+    __slots__ = ("capacity", "tokens", "refill_rate", "last_update")
 
-    def refill(self, now: Optional[datetime] = None) -> None:
+    def __init__(
+        self,
+        capacity: float,
+        tokens: float,
+        refill_rate: float,
+        last_update: Optional[float] = None,
+    ):
+        self.capacity = capacity
+        self.tokens = tokens
+        self.refill_rate = refill_rate  # tokens per second
+        self.last_update = time.monotonic() if last_update is None else last_update
+
+    def __repr__(self) -> str:
+        return (
+            f"TokenBucket(capacity={self.capacity!r}, tokens={self.tokens!r}, "
+            f"refill_rate={self.refill_rate!r}, last_update={self.last_update!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, TokenBucket):
+            return NotImplemented
+        return (
+            self.capacity == other.capacity
+            and self.tokens == other.tokens
+            and self.refill_rate == other.refill_rate
+            and self.last_update == other.last_update
+        )
+
+    def copy(self) -> "TokenBucket":
+        """Get an independent copy of this bucket."""
+        return TokenBucket(self.capacity, self.tokens, self.refill_rate, self.last_update)
+
+    @classmethod
+    def for_limit(
+        cls, limit: int, window: timedelta, tokens: Optional[float] = None
+    ) -> "TokenBucket":
+        """Create a bucket allowing ``limit`` requests per ``window``."""
+        capacity = float(limit)
+        window_seconds = window.total_seconds()
+        return cls(
+            capacity=capacity,
+            tokens=capacity if tokens is None else min(capacity, float(tokens)),
+            refill_rate=capacity / window_seconds if window_seconds > 0 else 0.0,
+        )
+
+    def refill(self, now: Optional[float] = None) -> None:
         """Refill tokens based on elapsed time."""
         if now is None:
-            now = datetime.utcnow()
+            now = time.monotonic()
 
-        elapsed = (now - self.last_update).total_seconds()
+        elapsed = now - self.last_update
         if elapsed <= 0:
             return
 
@@ -80,7 +200,7 @@ class TokenBucket:
         self.tokens = min(self.capacity, self.tokens + (elapsed * self.refill_rate))
         self.last_update = now
 
-    def consume(self, tokens: float = 1.0, now: Optional[datetime] = None) -> bool:
+    def consume(self, tokens: float = 1.0, now: Optional[float] = None) -> bool:
         """Try to consume tokens. Returns True if successful."""
         self.refill(now)
         if self.tokens >= tokens:
@@ -88,11 +208,8 @@ class TokenBucket:
             return True
         return False
 
-    def wait_time(self, tokens: float = 1.0, now: Optional[datetime] = None) -> float:
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
         """Calculate how long to wait before tokens are available."""
-        if now is None:
-            now = datetime.utcnow()
-
         self.refill(now)
         if self.tokens >= tokens:
             return 0.0
@@ -103,8 +220,42 @@ class TokenBucket:
 
         return needed / self.refill_rate
 
+    def reserve(
+        self,
+        tokens: float = 1.0,
+        max_wait: Optional[float] = 0.0,
+        now: Optional[float] = None,
+    ) -> Tuple[bool, float]:
+        """
+        Consume tokens now, or book them ahead of time.
+
+        If the bucket is short but the tokens will be available within
+        ``max_wait`` seconds (``None`` means no bound), they are debited anyway
+        and the bucket goes negative; the caller must wait the returned time
+        before using them. Otherwise the bucket is left untouched.
+
+        Returns:
+            Tuple of (granted, wait_seconds)
+        """
+        self.refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True, 0.0
+
+        if self.refill_rate <= 0:
+            return False, float("inf")
+
+        wait = (tokens - self.tokens) / self.refill_rate
+        if max_wait is None or wait <= max_wait:
+            self.tokens -= tokens
+            return True, wait
+        return False, wait
+
+    def refund(self, tokens: float) -> None:
+        """Give back tokens that were taken but not used."""
+        self.tokens = min(self.capacity, self.tokens + tokens)
+
     def reset(self) -> None:
         """Reset bucket to full capacity."""
         self.tokens = self.capacity
-        self.last_update = datetime.utcnow()
-
+        self.last_update = time.monotonic()
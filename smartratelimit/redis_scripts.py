@@ -0,0 +1,360 @@
+"""Lua scripts executed server-side by RedisStorage.
+
+Every script reads the clock with Redis ``TIME`` so that all workers share a
+single clock, and returns floats as strings because Redis truncates Lua
+numbers to integers in replies.
+
+The acquire scripts take one key (or key pair) per window of a composite
+limit. They check every window first and then book all of them for the
+slowest window's wait, so a refused request changes nothing.
+"""
+
+# KEYS[i]: token bucket hash for window i
+# ARGV: tokens, max_wait (negative means unbounded), ttl, then capacity and
+#       refill_rate for each window
+# Returns: {granted (0/1), wait_seconds (string, "inf" if never)}
+TOKEN_BUCKET_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local max_wait = tonumber(ARGV[2])
+
+local buckets = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local capacity = tonumber(ARGV[2 + 2 * i])
+    local rate = tonumber(ARGV[3 + 2 * i])
+    local state = redis.call('HMGET', key, 'tokens', 'last_update')
+    local tokens = tonumber(state[1]) or capacity
+    local last = tonumber(state[2]) or now
+    if now > last then
+        tokens = math.min(capacity, tokens + (now - last) * rate)
+        last = now
+    end
+    if tokens < requested then
+        if rate <= 0 then
+            return {0, 'inf'}
+        end
+        wait = math.max(wait, (requested - tokens) / rate)
+    end
+    buckets[i] = {capacity, rate, tokens, last}
+end
+
+if max_wait >= 0 and wait > max_wait then
+    return {0, string.format('%.17g', wait)}
+end
+
+for i, key in ipairs(KEYS) do
+    local capacity, rate, tokens, last = unpack(buckets[i])
+    -- Tokens refilled while another window holds the request are capped
+    tokens = math.min(tokens, capacity - wait * rate) - requested
+    redis.call('HSET', key,
+        'capacity', string.format('%.17g', capacity),
+        'tokens', string.format('%.17g', tokens),
+        'refill_rate', string.format('%.17g', rate),
+        'last_update', string.format('%.6f', last))
+    redis.call('EXPIRE', key, tonumber(ARGV[3]))
+end
+return {1, string.format('%.17g', wait)}
+"""
+
+# KEYS[i]: GCRA theoretical arrival time for window i (string, Unix seconds)
+# ARGV: tokens, max_wait (negative means unbounded), then emission_interval
+#       and limit for each window
+# Returns: {granted (0/1), wait_seconds (string)}
+GCRA_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local max_wait = tonumber(ARGV[2])
+
+local tats = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[1 + 2 * i])
+    local limit = tonumber(ARGV[2 + 2 * i])
+    local tat = tonumber(redis.call('GET', key))
+    if tat == nil or tat < now then
+        tat = now
+    end
+    local key_wait = tat + (requested - limit) * interval - now
+    -- Waits this short are float rounding in the TAT arithmetic
+    if key_wait > 1e-9 then
+        wait = math.max(wait, key_wait)
+    end
+    tats[i] = tat
+end
+
+if max_wait >= 0 and wait > max_wait then
+    return {0, string.format('%.17g', wait)}
+end
+
+for i, key in ipairs(KEYS) do
+    local new_tat = math.max(tats[i], now + wait) + requested * tonumber(ARGV[1 + 2 * i])
+    -- The state is meaningless once the TAT has passed, so let it expire then
+    redis.call('SET', key, string.format('%.6f', new_tat),
+        'PX', math.max(1, math.ceil((new_tat - now) * 1000)))
+end
+return {1, string.format('%.17g', wait)}
+"""
+
+# KEYS[1]: GCRA theoretical arrival time (string, Unix seconds)
+# ARGV: used (limit - remaining), emission_interval
+GCRA_SET_REMAINING = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local used = tonumber(ARGV[1])
+if used <= 0 then
+    redis.call('DEL', KEYS[1])
+    return 0
+end
+local tat = now + used * tonumber(ARGV[2])
+redis.call('SET', KEYS[1], string.format('%.6f', tat),
+    'PX', math.max(1, math.ceil((tat - now) * 1000)))
+return 1
+"""
+
+# KEYS[1]: sorted set of request timestamps, KEYS[2]: its member sequence counter
+# ARGV: used (limit - remaining, at most limit), window_seconds
+SLIDING_LOG_SET_REMAINING = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local used = tonumber(ARGV[1])
+redis.call('DEL', KEYS[1])
+if used <= 0 then
+    return 0
+end
+local at = string.format('%.6f', now)
+local seq = redis.call('INCRBY', KEYS[2], used)
+for n = 1, used do
+    redis.call('ZADD', KEYS[1], at, seq - used + n)
+end
+local ttl = math.ceil(tonumber(ARGV[2]) * 1000)
+redis.call('PEXPIRE', KEYS[1], ttl)
+redis.call('PEXPIRE', KEYS[2], ttl)
+return 1
+"""
+
+# KEYS[1]: hash {window, previous, current}
+# ARGV: used (limit - remaining), window_seconds
+SLIDING_WINDOW_SET_REMAINING = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = tonumber(ARGV[2])
+redis.call('HSET', KEYS[1],
+    'window', string.format('%d', math.floor(now / window)),
+    'previous', '0',
+    'current', string.format('%.17g', tonumber(ARGV[1])))
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+return 1
+"""
+
+# KEYS[2i-1]: sorted set of request timestamps for window i,
+# KEYS[2i]: its member sequence counter
+# ARGV: count, max_wait (negative means unbounded), then limit and
+#       window_seconds for each window
+# Returns: {granted (0/1), wait_seconds (string)}
+SLIDING_LOG_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local count = tonumber(ARGV[1])
+local max_wait = tonumber(ARGV[2])
+
+local wait = 0
+for i = 1, #KEYS / 2 do
+    local log = KEYS[2 * i - 1]
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local window = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZREMRANGEBYSCORE', log, '-inf', now - window)
+    local excess = redis.call('ZCARD', log) + count - limit
+    if excess > 0 then
+        -- The request fits once the excess-th oldest entry leaves the window
+        local entry = redis.call('ZRANGE', log, excess - 1, excess - 1, 'WITHSCORES')
+        wait = math.max(wait, tonumber(entry[2]) + window - now)
+    end
+end
+
+if max_wait >= 0 and wait > max_wait then
+    return {0, string.format('%.17g', wait)}
+end
+
+local at = string.format('%.6f', now + wait)
+for i = 1, #KEYS / 2 do
+    local log = KEYS[2 * i - 1]
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local window = tonumber(ARGV[2 + 2 * i])
+    local seq = redis.call('INCRBY', KEYS[2 * i], count)
+    for n = 1, count do
+        redis.call('ZADD', log, at, seq - count + n)
+    end
+    -- Only the newest `limit` entries can ever decide a wait
+    redis.call('ZREMRANGEBYRANK', log, 0, -(limit + 1))
+
+    local ttl = math.ceil((window + wait) * 1000)
+    redis.call('PEXPIRE', log, ttl)
+    redis.call('PEXPIRE', KEYS[2 * i], ttl)
+end
+return {1, string.format('%.17g', wait)}
+"""
+
+# KEYS[i]: hash {window, previous, current} for window i
+# ARGV: tokens, max_wait (negative means unbounded), then limit and
+#       window_seconds for each window
+# Returns: {granted (0/1), wait_seconds (string)}
+SLIDING_WINDOW_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local max_wait = tonumber(ARGV[2])
+
+local counters = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[1 + 2 * i])
+    local window = tonumber(ARGV[2 + 2 * i])
+    local index = math.floor(now / window)
+    local state = redis.call('HMGET', key, 'window', 'previous', 'current')
+    local stored = tonumber(state[1])
+    local previous = 0
+    local current = 0
+    if stored == index then
+        previous = tonumber(state[2]) or 0
+        current = tonumber(state[3]) or 0
+    elseif stored == index - 1 then
+        previous = tonumber(state[3]) or 0
+    end
+
+    local elapsed = now - index * window
+    if previous * (1 - elapsed / window) + current + requested > limit then
+        local key_wait
+        if current + requested <= limit then
+            key_wait = window * (1 - (limit - current - requested) / previous) - elapsed
+        else
+            key_wait = window - elapsed + math.max(0, window * (1 - (limit - requested) / current))
+        end
+        wait = math.max(wait, key_wait)
+    end
+    counters[i] = {index, previous, current}
+end
+
+if max_wait >= 0 and wait > max_wait then
+    return {0, string.format('%.17g', wait)}
+end
+
+-- The counter cannot record future windows, so it books into the current one
+for i, key in ipairs(KEYS) do
+    local index, previous, current = unpack(counters[i])
+    redis.call('HSET', key,
+        'window', string.format('%d', index),
+        'previous', string.format('%.17g', previous),
+        'current', string.format('%.17g', current + requested))
+    redis.call('PEXPIRE', key, math.ceil(tonumber(ARGV[2 + 2 * i]) * 2000))
+end
+return {1, string.format('%.17g', wait)}
+"""
+
+# KEYS[i]: token bucket hash for each window charged
+# ARGV: tokens to give back
+TOKEN_BUCKET_REFUND = """
+local refund = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'capacity')
+    local tokens = tonumber(state[1])
+    local capacity = tonumber(state[2])
+    if tokens ~= nil and capacity ~= nil then
+        local refilled = math.min(capacity, tokens + refund)
+        redis.call('HSET', key, 'tokens', string.format('%.17g', refilled))
+    end
+end
+return 1
+"""
+
+# KEYS[i]: GCRA theoretical arrival time for each window charged
+# ARGV: tokens to give back, then emission_interval for each window
+GCRA_REFUND = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local refund = tonumber(ARGV[1])
+for i, key in ipairs(KEYS) do
+    local tat = tonumber(redis.call('GET', key))
+    if tat ~= nil then
+        tat = tat - refund * tonumber(ARGV[1 + i])
+        if tat > now then
+            redis.call('SET', key, string.format('%.6f', tat),
+                'PX', math.max(1, math.ceil((tat - now) * 1000)))
+        else
+            redis.call('DEL', key)
+        end
+    end
+end
+return 1
+"""
+
+# KEYS[i]: sorted set of request timestamps for each window charged
+# ARGV: number of log entries to give back
+SLIDING_LOG_REFUND = """
+local count = tonumber(ARGV[1])
+if count > 0 then
+    for _, key in ipairs(KEYS) do
+        redis.call('ZPOPMAX', key, count)
+    end
+end
+return 1
+"""
+
+# KEYS[i]: hash {window, previous, current} for each window charged
+# ARGV: tokens to give back
+SLIDING_WINDOW_REFUND = """
+local refund = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    local current = tonumber(redis.call('HGET', key, 'current'))
+    if current ~= nil then
+        redis.call('HSET', key, 'current', string.format('%.17g', math.max(0, current - refund)))
+    end
+end
+return 1
+"""
+
+# KEYS[1]: sorted set of concurrency slot ids scored by expiry (Unix seconds)
+# ARGV: slot id, limit, ttl
+# Returns: 1 if the slot was taken, 0 if every slot is in use
+CONCURRENCY_ACQUIRE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+local ttl = tonumber(ARGV[3])
+redis.call('ZADD', KEYS[1], string.format('%.6f', now + ttl), ARGV[1])
+redis.call('PEXPIRE', KEYS[1], math.ceil(ttl * 1000))
+return 1
+"""
+
+# KEYS[1]: hash of an adaptive rate: rate, cut_at (Unix seconds of the last cut)
+# ARGV: initial, increase, factor, minimum, maximum ('' for none), hold
+# Returns: the rate after the update, as a string
+ADAPT_RATE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'rate', 'cut_at')
+local rate = tonumber(state[1]) or tonumber(ARGV[1])
+local cut_at = tonumber(state[2])
+local factor = tonumber(ARGV[3])
+if factor < 1 then
+    if cut_at and now - cut_at < tonumber(ARGV[6]) then
+        return tostring(rate)
+    end
+    rate = rate * factor
+    cut_at = now
+end
+rate = math.max(tonumber(ARGV[4]), rate + tonumber(ARGV[2]))
+if ARGV[5] ~= '' then
+    rate = math.min(tonumber(ARGV[5]), rate)
+end
+redis.call('HSET', KEYS[1], 'rate', string.format('%.17g', rate))
+if cut_at then
+    redis.call('HSET', KEYS[1], 'cut_at', string.format('%.6f', cut_at))
+end
+return tostring(rate)
+"""
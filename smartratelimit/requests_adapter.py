@@ -0,0 +1,182 @@
+"""requests transport adapter that rate limits every request a session sends."""
+
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from smartratelimit.core import CostEstimate, RateLimiter, ResponseCost
+from smartratelimit.models import RateLimit
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitedAdapter(HTTPAdapter):
+    """
+    ``HTTPAdapter`` that rate limits every request sent through it.
+
+    Mount it on a session, for all traffic or per URL prefix; the session
+    keeps its own headers, auth, cookies and connection pool:
+
+        >>> limiter = RateLimiter()
+        >>> session = requests.Session()
+        >>> session.mount("https://api.github.com/", RateLimitedAdapter(limiter))
+        >>> response = session.get("https://api.github.com/users/octocat")
+
+    Each request waits for tokens before it is sent, and limits detected in
+    the response headers update the limiter. A streamed response holds its
+    concurrency slot until it is closed. A 429 with a Retry-After header is
+    retried once, as by ``RateLimiter.request()``, unless the request body
+    is a stream that cannot be sent twice.
+
+    Endpoints with a ``set_concurrency()`` cap get urllib3 pools of that many
+    connections, so the pool keeps one connection per request in flight
+    (requests 2.32 or later; older versions use ``pool_maxsize`` throughout).
+    """
+
+    def __init__(
+        self,
+        limiter: RateLimiter,
+        cost: Optional[CostEstimate] = None,
+        actual_cost: Optional[ResponseCost] = None,
+        priority: int = 0,
+        weight: float = 1.0,
+        max_wait: Optional[float] = None,
+        **adapter_kwargs: Any,
+    ):
+        """
+        Initialize the adapter.
+
+        Args:
+            limiter: Rate limiter whose limits and storage to use
+            cost: Tokens to charge each request up front, or a function of
+                (method, url, {"request": request}) estimating them
+            actual_cost: Function reading the true cost from the response;
+                called only for responses that are not streamed
+            priority: Class of requests when tokens are scarce
+            weight: Share of the class with scheduling='fair'
+            max_wait: Longest time in seconds to wait for the rate limit,
+                including a 429 retry
+            **adapter_kwargs: Arguments for ``HTTPAdapter``, e.g.
+                ``pool_maxsize`` or ``max_retries``
+        """
+        self._limiter = limiter
+        self._cost = cost
+        self._actual_cost = actual_cost
+        self._priority = priority
+        self._weight = weight
+        self._max_wait = max_wait
+        super().__init__(**adapter_kwargs)
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream: bool = False,
+        timeout: Any = None,
+        verify: Any = True,
+        cert: Any = None,
+        proxies: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        """Send a request once the rate limit allows it."""
+        limiter = self._limiter
+        url = request.url
+        endpoint = limiter._request_context(url).endpoint
+        deadline = None if self._max_wait is None else time.monotonic() + self._max_wait
+        charged = limiter._estimate_cost(self._cost, request.method, url, {"request": request})
+
+        rate_limit = limiter._limit_for(url, endpoint)
+        if rate_limit:
+            limiter._acquire(
+                endpoint, rate_limit, url, charged, self._priority, self._weight, self._max_wait
+            )
+
+        def send_once(booked: Optional[RateLimit]) -> requests.Response:
+            # Tokens booked for the request are refunded if no slot frees up
+            release = limiter._hold_slot(endpoint, url, deadline, booked, charged)
+            try:
+                response = super(RateLimitedAdapter, self).send(
+                    request,
+                    stream=stream,
+                    timeout=timeout,
+                    verify=verify,
+                    cert=cert,
+                    proxies=proxies,
+                )
+                if not stream:
+                    # Session.send reads the body next anyway; read it while
+                    # the slot is held so it covers the whole transfer
+                    response.content
+            except BaseException:
+                if release is not None:
+                    release()
+                raise
+            if release is not None:
+                if stream:
+                    _release_on_close(response, release)
+                else:
+                    release()
+            return response
+
+        response = send_once(rate_limit)
+        resynced = limiter._update_from_response(response)
+        if not resynced and rate_limit and not stream:
+            limiter._reconcile_cost(endpoint, rate_limit, charged, self._actual_cost, response)
+
+        if response.status_code == 429 and _replayable(request):
+            wait_time = limiter._detector.get_retry_after(response.headers)
+            if wait_time is not None:
+                logger.warning(f"Received 429 for {url}, waiting {wait_time:g} seconds")
+                if not limiter._raise_on_limit and (
+                    deadline is None or time.monotonic() + wait_time <= deadline
+                ):
+                    time.sleep(wait_time)
+                    response.close()
+                    response = send_once(None)
+                    limiter._update_from_response(response)
+        return response
+
+    def build_connection_pool_key_attributes(
+        self, request: requests.PreparedRequest, verify: Any, cert: Any = None
+    ) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Size the connection pool of a concurrency-capped endpoint to its cap."""
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(
+            request, verify, cert
+        )
+        limit = self._limiter._concurrency.get(self._limiter._request_context(request.url).endpoint)
+        if limit is not None:
+            pool_kwargs["maxsize"] = limit.limit
+        return host_params, pool_kwargs
+
+
+def _replayable(request: requests.PreparedRequest) -> bool:
+    """Check whether a request's body can be sent again."""
+    return request.body is None or isinstance(request.body, (bytes, str))
+
+
+def _release_on_close(response: requests.Response, release: Callable[[], None]) -> None:
+    """Give back a streamed response's concurrency slot when it is closed or collected."""
+    lock = threading.Lock()
+    pending = [release]
+
+    def release_once() -> None:
+        with lock:
+            if not pending:
+                return
+            callback = pending.pop()
+        callback()
+
+    close = response.close
+
+    def close_and_release() -> None:
+        try:
+            close()
+        finally:
+            release_once()
+
+    response.close = close_and_release
+    # A response dropped without being closed must not hold its slot for good
+    weakref.finalize(response, release_once)
@@ -0,0 +1,114 @@
+"""Route templates for per-route rate limit keys."""
+
+import threading
+from typing import Dict, List, Optional
+
+
+class _RouteNode:
+    """One path segment in a route trie."""
+
+    __slots__ = ("children", "wildcard", "route")
+
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        self.wildcard: Optional["_RouteNode"] = None
+        self.route: Optional[str] = None
+
+
+def _split_path(path: str) -> List[str]:
+    """Split a URL path into its non-empty segments."""
+    return [segment for segment in path.split("/") if segment]
+
+
+def _is_placeholder(segment: str) -> bool:
+    """Check whether a template segment is a ``{name}`` placeholder."""
+    return len(segment) > 2 and segment[0] == "{" and segment[-1] == "}"
+
+
+class RouteTable:
+    """
+    Route templates per host, compiled into one trie per host.
+
+    Templates look like ``/repos/{owner}/{repo}/issues``: literal segments must
+    match exactly and ``{name}`` placeholders match any single segment. A
+    lookup walks the trie one segment at a time, so it costs O(path segments)
+    however many routes are registered. The deepest matching template wins,
+    and literal segments are preferred over placeholders.
+
+    Example:
+        >>> routes = RouteTable()
+        >>> routes.add("api.github.com", "/repos/{owner}/{repo}/issues")
+        >>> routes.match("api.github.com", "/repos/psf/requests/issues")
+        '/repos/{owner}/{repo}/issues'
+    """
+
+    def __init__(self):
+        self._roots: Dict[str, _RouteNode] = {}
+        self._lock = threading.Lock()
+
+    def __bool__(self) -> bool:
+        return bool(self._roots)
+
+    def add(self, host: str, template: str) -> str:
+        """
+        Register a route template for a host.
+
+        Args:
+            host: Host (``netloc``) the template applies to, e.g. 'api.github.com'
+            template: Path template, e.g. '/repos/{owner}/{repo}/issues'
+
+        Returns:
+            The template as used in endpoint keys. If an equivalent template
+            (differing only in placeholder names) was registered first, that
+            one is returned.
+        """
+        segments = _split_path(template)
+        if not segments:
+            raise ValueError(f"Route template must have at least one segment: {template!r}")
+
+        with self._lock:
+            node = self._roots.setdefault(host.lower(), _RouteNode())
+            for segment in segments:
+                if _is_placeholder(segment):
+                    if node.wildcard is None:
+                        node.wildcard = _RouteNode()
+                    node = node.wildcard
+                else:
+                    node = node.children.setdefault(segment, _RouteNode())
+            if node.route is None:
+                node.route = "/" + "/".join(segments)
+            return node.route
+
+    def match(self, host: str, path: str) -> Optional[str]:
+        """
+        Find the route template for a request path.
+
+        Args:
+            host: Request host (``netloc``)
+            path: Request path, e.g. '/repos/psf/requests/issues'
+
+        Returns:
+            The matching template, or None if no route covers the path
+        """
+        root = self._roots.get(host.lower())
+        if root is None:
+            return None
+        return self._match(root, _split_path(path), 0)
+
+    def _match(self, node: _RouteNode, segments: List[str], index: int) -> Optional[str]:
+        """Deepest route under ``node`` matching ``segments[index:]``."""
+        if index == len(segments):
+            return node.route
+
+        found = None
+        child = node.children.get(segments[index])
+        if child is not None:
+            found = self._match(child, segments, index + 1)
+        if found is None and node.wildcard is not None:
+            found = self._match(node.wildcard, segments, index + 1)
+        return found if found is not None else node.route
+
+    def clear(self) -> None:
+        """Remove all routes."""
+        with self._lock:
+            self._roots.clear()
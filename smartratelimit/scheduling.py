@@ -0,0 +1,318 @@
+"""Admission order for requests waiting on the same endpoint."""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+PRIORITY = "priority"
+FAIR = "fair"
+
+SCHEDULING_MODES = (PRIORITY, FAIR)
+
+# Takes a request's tokens, allowed to book them this many seconds ahead
+TakeTokens = Callable[[Optional[float]], Tuple[bool, float]]
+AsyncTakeTokens = Callable[[Optional[float]], Awaitable[Tuple[bool, float]]]
+# Gives back the tokens taken for a request that was cancelled
+AsyncRefundTokens = Callable[[], Awaitable[None]]
+
+
+def validate_scheduling(scheduling: str) -> str:
+    """Return the scheduling mode, raising ValueError if it is unknown."""
+    if scheduling not in SCHEDULING_MODES:
+        raise ValueError(
+            f"Unknown scheduling mode: {scheduling}. "
+            f"Choose one of: {', '.join(SCHEDULING_MODES)}"
+        )
+    return scheduling
+
+
+class _Schedule:
+    """
+    Tickets waiting on one endpoint, in the order they are to be admitted.
+
+    Requests are grouped into classes by priority. In ``"priority"`` mode a
+    higher class is always admitted first; in ``"fair"`` mode classes share
+    admissions in proportion to their weights (weighted fair queueing on the
+    tokens each request costs). Within a class, tickets keep arrival order.
+    """
+
+    def __init__(self, scheduling: str = PRIORITY):
+        self.fair = validate_scheduling(scheduling) == FAIR
+        self.head: Any = None  # Ticket allowed to book tokens
+        self._waiting: List[Tuple[float, int, float, Any]] = []  # (key, seq, start, ticket)
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._finish: Dict[int, float] = {}  # Class -> virtual finish of its last ticket
+        self._dropped: Set[Any] = set()  # Tickets removed but still in the heap
+
+    def __len__(self) -> int:
+        return len(self._waiting) - len(self._dropped) + (self.head is not None)
+
+    def push(self, ticket: Any, priority: int, weight: float, tokens: float) -> bool:
+        """Queue a ticket; returns True if it became the head."""
+        start = max(self._virtual_time, self._finish.get(priority, 0.0))
+        finish = start + max(tokens, 1.0) / weight
+        self._finish[priority] = finish
+        if self.head is None and not self._waiting:
+            self.head = ticket
+            self._virtual_time = start
+            return True
+        key = finish if self.fair else -priority
+        heapq.heappush(self._waiting, (key, next(self._sequence), start, ticket))
+        return False
+
+    def advance(self) -> Any:
+        """Hand the head to the next ticket, returning it (None if idle)."""
+        while self._waiting:
+            _, _, start, ticket = heapq.heappop(self._waiting)
+            if ticket in self._dropped:
+                self._dropped.discard(ticket)
+                continue
+            self.head = ticket
+            self._virtual_time = start
+            return ticket
+
+        # Idle: nothing earlier can be owed a share
+        self.head = None
+        self._virtual_time = 0.0
+        self._finish.clear()
+        return None
+
+    def remove(self, ticket: Any) -> None:
+        """Drop a ticket that gave up before reaching the head."""
+        # Left in the heap and skipped when it surfaces, so giving up is O(1)
+        self._dropped.add(ticket)
+
+
+def _check_weight(weight: float) -> None:
+    if weight <= 0:
+        raise ValueError(f"Request weight must be positive: {weight}")
+
+
+class WaitQueue:
+    """
+    Admits one endpoint's waiting requests in turn.
+
+    A request that cannot go out at once takes a ticket. Only the ticket at
+    the head of the queue books tokens from storage; it sleeps until they are
+    usable and then hands the head to the next ticket. Later arrivals queue
+    behind instead of competing for the same tokens, so nobody is overtaken
+    by an equal or lower class and waiters are not woken just to lose a race.
+    """
+
+    def __init__(self, scheduling: str = PRIORITY):
+        self._lock = threading.Lock()
+        self._schedule = _Schedule(scheduling)
+        self._ready_at = 0.0  # When the head's booked tokens are usable (monotonic)
+
+    def __len__(self) -> int:
+        return len(self._schedule)
+
+    def admit(
+        self,
+        take: TakeTokens,
+        max_wait: Optional[float],
+        sleep: Callable[[float], None] = time.sleep,
+        priority: int = 0,
+        weight: float = 1.0,
+        tokens: float = 1.0,
+    ) -> Tuple[bool, float]:
+        """
+        Take tokens once every request ahead has been admitted.
+
+        Args:
+            take: Takes the tokens, booking them up to the given number of
+                seconds ahead (None for no bound)
+            max_wait: Longest time to queue and wait in total (None for no bound)
+            sleep: Called with the time to wait for booked tokens
+            priority: Class of the request; higher classes go first
+            weight: Share of the class in ``"fair"`` mode
+            tokens: Tokens the request costs, for fair shares
+
+        Returns:
+            Tuple of (granted, wait_seconds): the time spent queued and
+            sleeping, or on refusal the least time the request would have
+            had to wait
+        """
+        _check_weight(weight)
+        if not len(self._schedule):
+            granted, wait = take(0.0)
+            if granted or (max_wait is not None and wait > max_wait):
+                return granted, wait
+
+        started = time.monotonic()
+        deadline = None if max_wait is None else started + max_wait
+        ticket = threading.Event()
+        with self._lock:
+            if self._schedule.push(ticket, priority, weight, tokens):
+                ticket.set()
+
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not ticket.wait(timeout):
+            with self._lock:
+                if not ticket.is_set():
+                    self._schedule.remove(ticket)
+                    return False, max(self._ready_at - time.monotonic(), 0.0)
+
+        try:
+            now = time.monotonic()
+            granted, wait = take(None if deadline is None else max(0.0, deadline - now))
+            if not granted:
+                return False, now - started + wait
+            if wait > 0:
+                self._ready_at = now + wait
+                sleep(wait)
+            return True, time.monotonic() - started
+        finally:
+            with self._lock:
+                following = self._schedule.advance()
+                if following is not None:
+                    following.set()
+
+
+class AsyncWaitQueue:
+    """
+    Admits one endpoint's waiting coroutines in turn.
+
+    The asyncio counterpart of ``WaitQueue``: only the head coroutine books
+    tokens and sleeps, and the ``max_wait`` deadlines of the others are kept
+    in a heap served by one timer, so an endpoint has at most two timers
+    running however many coroutines are waiting. Tokens booked by a head
+    that is cancelled before its request goes out are refunded. Must be
+    used from a single event loop.
+    """
+
+    def __init__(self, scheduling: str = PRIORITY):
+        self._schedule = _Schedule(scheduling)
+        self._ready_at = 0.0
+        self._deadlines: List[Tuple[float, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._skipped: Set[asyncio.Future] = set()  # Cancelled tickets passed over at the head
+
+    def __len__(self) -> int:
+        return len(self._schedule)
+
+    async def admit(
+        self,
+        take: AsyncTakeTokens,
+        max_wait: Optional[float],
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        priority: int = 0,
+        weight: float = 1.0,
+        tokens: float = 1.0,
+        refund: Optional[AsyncRefundTokens] = None,
+    ) -> Tuple[bool, float]:
+        """
+        Take tokens once every request ahead has been admitted (see ``WaitQueue.admit``).
+
+        Args:
+            refund: Gives back the tokens ``take`` booked, called if the
+                coroutine is cancelled after booking them
+        """
+        _check_weight(weight)
+        if not len(self._schedule):
+            granted, wait = await take(0.0)
+            if granted or (max_wait is not None and wait > max_wait):
+                return granted, wait
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline = None if max_wait is None else started + max_wait
+        # Resolves to True when the ticket reaches the head, False at its deadline
+        ticket = loop.create_future()
+        if self._schedule.push(ticket, priority, weight, tokens):
+            ticket.set_result(True)
+        elif deadline is not None:
+            self._expire_at(loop, deadline, ticket)
+
+        try:
+            admitted = await ticket
+        except asyncio.CancelledError:
+            if ticket in self._skipped:
+                self._skipped.discard(ticket)
+            elif ticket.cancelled():
+                self._schedule.remove(ticket)
+            elif ticket.result():
+                self._advance()
+            raise
+        if not admitted:
+            return False, max(self._ready_at - loop.time(), 0.0)
+
+        try:
+            now = loop.time()
+            granted, wait = await self._book(
+                take, None if deadline is None else max(0.0, deadline - now), refund
+            )
+            if not granted:
+                return False, now - started + wait
+            if wait > 0:
+                self._ready_at = now + wait
+                try:
+                    await sleep(wait)
+                except asyncio.CancelledError:
+                    if refund is not None:
+                        await refund()
+                    raise
+            return True, loop.time() - started
+        finally:
+            self._advance()
+
+    @staticmethod
+    async def _book(
+        take: AsyncTakeTokens, max_wait: Optional[float], refund: Optional[AsyncRefundTokens]
+    ) -> Tuple[bool, float]:
+        """Take the head's tokens, refunding them if cancelled while storage is busy."""
+        if refund is None:
+            return await take(max_wait)
+        booking = asyncio.ensure_future(take(max_wait))
+        try:
+            return await asyncio.shield(booking)
+        except asyncio.CancelledError:
+            granted, _ = await booking
+            if granted:
+                await refund()
+            raise
+
+    def _expire_at(
+        self, loop: asyncio.AbstractEventLoop, deadline: float, ticket: asyncio.Future
+    ) -> None:
+        """Give up on a ticket at its deadline unless it reaches the head first."""
+        heapq.heappush(self._deadlines, (deadline, next(self._sequence), ticket))
+        if self._timer is None or deadline < self._timer.when():
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = loop.call_at(deadline, self._expire, loop)
+
+    def _expire(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Time out every ticket whose deadline has passed, then rearm the timer."""
+        self._timer = None
+        now = loop.time()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, ticket = heapq.heappop(self._deadlines)
+            if not ticket.done():
+                self._schedule.remove(ticket)
+                ticket.set_result(False)
+        # Tickets admitted or cancelled since are dropped when they surface
+        while self._deadlines and self._deadlines[0][2].done():
+            heapq.heappop(self._deadlines)
+        if self._deadlines:
+            self._timer = loop.call_at(self._deadlines[0][0], self._expire, loop)
+
+    def _advance(self) -> None:
+        """Wake the next ticket, if any."""
+        following = self._schedule.advance()
+        while following is not None and following.done():
+            # Cancelled, but its coroutine has not run to leave the queue yet
+            self._skipped.add(following)
+            following = self._schedule.advance()
+        if following is not None:
+            following.set_result(True)
+        elif self._timer is not None:
+            # Idle: no deadline is left to serve
+            self._timer.cancel()
+            self._timer = None
+            self._deadlines.clear()
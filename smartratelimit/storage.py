@@ -1,17 +1,62 @@
 """Storage backends for rate limit state."""
 
+import json
+import logging
+import math
 import sqlite3
 import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Optional
-from urllib.parse import urlparse
+from typing import Any, Deque, Dict, Iterator, List, Optional, Sequence, Tuple
 
-from smartratelimit.models import RateLimit, TokenBucket
+from smartratelimit import redis_scripts
+from smartratelimit.algorithms import (
+    GCRA,
+    SLIDING_LOG,
+    SLIDING_WINDOW,
+    TOKEN_BUCKET,
+    WindowCounterState,
+    gcra_acquire,
+    gcra_refund,
+    gcra_tat_for_remaining,
+    sliding_log_acquire,
+    sliding_log_refund,
+    sliding_window_acquire,
+    sliding_window_refund,
+)
+from smartratelimit.models import (
+    RateLimit,
+    TokenBucket,
+    monotonic_to_timestamp,
+    timestamp_to_monotonic,
+)
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Locks guarding MemoryStorage limiter state; each key hashes onto one
+LOCK_STRIPES = 64
+
+# Makes the StorageBackend defaults' read-modify-write atomic in process
+_DEFAULT_LOCK = threading.RLock()
 
 
 class StorageBackend(ABC):
-    """Abstract base class for storage backends."""
+    """
+    Abstract base class for storage backends.
+
+    Subclasses must implement the rate limit and token bucket getters and
+    setters and ``clear``. The limiter primitives have defaults built on
+    those, for the token bucket algorithm only: they are atomic within one
+    process but not across processes sharing the backend, so shared
+    backends should override them. Concurrency slots and adaptive rates
+    are optional and raise ``NotImplementedError`` unless overridden.
+    """
 
     @abstractmethod
     def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
@@ -33,14 +78,348 @@ class StorageBackend(ABC):
         """Store token bucket for a key."""
         pass
 
+    def acquire(
+        self,
+        key: str,
+        tokens: float,
+        limit: int,
+        window: timedelta,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """
+        Atomically take tokens from the limiter state for a key.
+
+        The state is created (or retuned) for ``limit`` requests per ``window``.
+        Refill, consume and the wait computation happen as a single operation,
+        so concurrent callers sharing the backend can never spend the same token.
+
+        Args:
+            key: Token bucket key
+            tokens: Number of tokens to take
+            limit: Bucket capacity
+            window: Time to refill the bucket from empty
+            max_wait: Book the tokens in advance if they become available
+                within this many seconds (None for no bound, 0 to never wait)
+            algorithm: Limiting algorithm ('token_bucket', 'gcra',
+                'sliding_log' or 'sliding_window')
+
+        Returns:
+            Tuple of (granted, wait_seconds). When granted, the tokens are
+            debited and the caller must wait ``wait_seconds`` before sending.
+            When not granted, nothing is debited and ``wait_seconds`` is how
+            long until the tokens would be available.
+        """
+        return self.acquire_many([(key, limit, window)], tokens, max_wait, algorithm)
+
+    def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """
+        Atomically take tokens from several limits at once.
+
+        Every ``(key, limit, window)`` is checked in the same operation and the
+        request waits for the slowest one. Either all limits are debited, booked
+        for that common wait, or none are.
+
+        Args:
+            limits: ``(key, limit, window)`` for each window, e.g. from
+                ``CompositeLimit.bucket_limits()``
+            tokens: Number of tokens to take from each limit
+            max_wait: Book the tokens in advance if the slowest limit allows
+                them within this many seconds (None for no bound)
+            algorithm: Limiting algorithm used for every window
+
+        Returns:
+            Tuple of (granted, wait_seconds), as for ``acquire``
+        """
+        _check_default_algorithm(self, algorithm)
+        with _DEFAULT_LOCK:
+            buckets = [self.get_token_bucket(key) for key, _, _ in limits]
+            granted, wait, new_buckets = _acquire_many(
+                algorithm, buckets, limits, time.monotonic(), tokens, max_wait
+            )
+            for (key, _, _), bucket in zip(limits, new_buckets or ()):
+                self.set_token_bucket(key, bucket)
+            return granted, wait
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """
+        Give back tokens taken from each limit but not used.
+
+        Used when a response shows a request cost less than was charged.
+        Keys without state are left alone.
+
+        Args:
+            limits: ``(key, limit, window)`` for each window charged
+            tokens: Number of tokens to give back to each limit
+            algorithm: Limiting algorithm the tokens were taken with
+        """
+        _check_default_algorithm(self, algorithm)
+        with _DEFAULT_LOCK:
+            now = time.monotonic()
+            for key, limit, window in limits:
+                bucket = self.get_token_bucket(key)
+                bucket = _refund_step(algorithm, bucket, now, tokens, limit, window)
+                if bucket is not None:
+                    self.set_token_bucket(key, bucket)
+
+    def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """
+        Overwrite the limiter state for a key so ``remaining`` requests are available.
+
+        Used to resynchronise with the quota reported by the server.
+        """
+        _check_default_algorithm(self, algorithm)
+        self.set_token_bucket(key, TokenBucket.for_limit(limit, window, tokens=remaining))
+
+    def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """
+        Take one of ``limit`` concurrency slots for a key.
+
+        Slots expire ``ttl`` seconds after they are taken, so a process that
+        dies holding one does not block it for good. Expired slots are
+        reclaimed by the same operation.
+
+        Returns:
+            An id to pass to ``release_slot``, or None if every slot is taken
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support concurrency limits")
+
+    def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot taken with ``acquire_slot``."""
+        raise NotImplementedError(f"{type(self).__name__} does not support concurrency limits")
+
+    def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """
+        Adjust an adaptively learned rate in one atomic step.
+
+        Multiplies the stored rate (``initial`` if none is stored) by
+        ``factor``, adds ``increase`` and clamps it to ``[minimum, maximum]``.
+        A cut (``factor < 1``) within ``hold`` seconds of the previous cut
+        is skipped, so workers that see the same overload back off once.
+
+        Returns:
+            The rate after the update
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support adaptive limits")
+
     @abstractmethod
     def clear(self, endpoint: Optional[str] = None) -> None:
         """Clear stored data for endpoint or all data."""
         pass
 
+    def close(self) -> None:
+        """Write any pending changes and release resources held by the backend."""
+        pass
+
+
+def _check_default_algorithm(storage: StorageBackend, algorithm: str) -> None:
+    """Reject algorithms the ``StorageBackend`` defaults cannot store."""
+    if algorithm != TOKEN_BUCKET:
+        raise NotImplementedError(
+            f"{type(storage).__name__} does not support the {algorithm!r} algorithm"
+        )
+
+
+def _configure_bucket(bucket: Optional[TokenBucket], limit: int, window: timedelta) -> TokenBucket:
+    """Create a bucket for ``limit`` per ``window`` or retune an existing one."""
+    if bucket is None:
+        return TokenBucket.for_limit(limit, window)
+
+    window_seconds = window.total_seconds()
+    if window_seconds > 0:
+        bucket.capacity = float(limit)
+        bucket.refill_rate = float(limit) / window_seconds
+    return bucket
+
+
+def _adapted_rate(
+    rate: float,
+    cut_at: Optional[float],
+    now: float,
+    increase: float,
+    factor: float,
+    minimum: float,
+    maximum: Optional[float],
+    hold: float,
+) -> Tuple[float, Optional[float]]:
+    """Apply one ``adapt_rate`` step, returning the new rate and last cut time."""
+    if factor < 1:
+        if cut_at is not None and now - cut_at < hold:
+            return rate, cut_at
+        rate *= factor
+        cut_at = now
+    rate = max(minimum, rate + increase)
+    if maximum is not None:
+        rate = min(maximum, rate)
+    return rate, cut_at
+
+
+def _copy_state(algorithm: str, state: Any) -> Any:
+    """Copy limiter state that ``_step`` would otherwise update in place."""
+    if isinstance(state, TokenBucket):
+        return TokenBucket(state.capacity, state.tokens, state.refill_rate, state.last_update)
+    if isinstance(state, deque):
+        return deque(state, maxlen=state.maxlen)
+    return state
+
+
+def _step(
+    algorithm: str,
+    state: Any,
+    now: float,
+    tokens: float,
+    limit: int,
+    window: timedelta,
+    max_wait: Optional[float],
+    delay: float = 0.0,
+) -> Tuple[bool, float, Any]:
+    """
+    Run one limiter step on the state of a single key.
+
+    State is a ``TokenBucket``, a GCRA TAT, a request log or a window counter
+    depending on the algorithm; buckets and logs are updated in place.
+    ``delay`` books the request that much later because another window of a
+    composite limit is holding it back.
+
+    Returns:
+        Tuple of (granted, wait_seconds, new_state). ``new_state`` is None
+        when the request was refused.
+    """
+    window_seconds = window.total_seconds()
+    if algorithm == GCRA:
+        return gcra_acquire(state, now + delay, tokens, limit, window_seconds, max_wait)
+
+    if algorithm == SLIDING_LOG:
+        if not isinstance(state, deque) or state.maxlen != max(1, limit):
+            state = deque(state or (), maxlen=max(1, limit))
+        granted, wait = sliding_log_acquire(
+            state, now, tokens, limit, window_seconds, max_wait, not_before=now + delay
+        )
+        return granted, wait, state if granted else None
+
+    if algorithm == SLIDING_WINDOW:
+        # The counter cannot record future windows, so it books into the current one
+        return sliding_window_acquire(state, now, tokens, limit, window_seconds, max_wait)
+
+    bucket = _configure_bucket(state, limit, window)
+    granted, wait = bucket.reserve(tokens, max_wait, now)
+    if not granted:
+        return False, wait, None
+    if delay > 0:
+        # Tokens refilled while another window holds the request are capped
+        bucket.tokens = min(bucket.tokens, bucket.capacity - tokens - delay * bucket.refill_rate)
+    return True, wait, bucket
+
+
+def _acquire_many(
+    algorithm: str,
+    states: List[Any],
+    limits: Sequence[Tuple[str, int, timedelta]],
+    now: float,
+    tokens: float,
+    max_wait: Optional[float],
+) -> Tuple[bool, float, Optional[List[Any]]]:
+    """
+    Take tokens from every limit or none, waiting for the slowest.
+
+    Returns:
+        Tuple of (granted, wait_seconds, new_states). ``new_states`` is None
+        when the request was refused and nothing must be stored.
+    """
+    if len(limits) == 1:
+        _, limit, window = limits[0]
+        granted, wait, state = _step(algorithm, states[0], now, tokens, limit, window, max_wait)
+        return granted, wait, None if state is None else [state]
+
+    # Dry run on copies to find the slowest window
+    wait = 0.0
+    for state, (_, limit, window) in zip(states, limits):
+        granted, key_wait, _ = _step(
+            algorithm, _copy_state(algorithm, state), now, tokens, limit, window, None
+        )
+        if not granted:
+            return False, key_wait, None
+        wait = max(wait, key_wait)
+
+    if max_wait is not None and wait > max_wait:
+        return False, wait, None
+
+    new_states = [
+        _step(algorithm, state, now, tokens, limit, window, None, delay=wait)[2]
+        for state, (_, limit, window) in zip(states, limits)
+    ]
+    return True, wait, new_states
+
+
+def _refund_step(
+    algorithm: str, state: Any, now: float, tokens: float, limit: int, window: timedelta
+) -> Any:
+    """Give tokens back to the state of a single key; None means no state is left."""
+    if state is None:
+        return None
+    if algorithm == GCRA:
+        return gcra_refund(state, now, tokens, limit, window.total_seconds())
+    if algorithm == SLIDING_LOG:
+        if not isinstance(state, deque):
+            state = deque(state, maxlen=max(1, limit))
+        sliding_log_refund(state, tokens)
+        return state
+    if algorithm == SLIDING_WINDOW:
+        return sliding_window_refund(state, tokens)
+    state.refund(tokens)
+    return state
+
+
+def _state_for_remaining(
+    algorithm: str, now: float, remaining: int, limit: int, window: timedelta
+) -> Any:
+    """Limiter state leaving exactly ``remaining`` requests available at ``now``."""
+    window_seconds = window.total_seconds()
+    used = max(0, limit - remaining)
+    if algorithm == GCRA:
+        return gcra_tat_for_remaining(now, remaining, limit, window_seconds)
+    if algorithm == SLIDING_LOG:
+        return deque([now] * used, maxlen=max(1, limit))
+    if algorithm == SLIDING_WINDOW:
+        index = int(now // window_seconds) if window_seconds > 0 else 0
+        return (index, 0.0, float(used))
+    return TokenBucket.for_limit(limit, window, tokens=remaining)
+
 
 class MemoryStorage(StorageBackend):
-    """In-memory storage backend with automatic cleanup."""
+    """
+    In-memory storage backend with automatic cleanup.
+
+    Thread-safe: limiter state is guarded by striped locks, so acquiring
+    tokens is atomic per key while unrelated endpoints rarely contend.
+    """
 
     def __init__(self, cleanup_interval: int = 3600):
         """
@@ -51,57 +430,201 @@ class MemoryStorage(StorageBackend):
         """
         self._rate_limits: Dict[str, RateLimit] = {}
         self._token_buckets: Dict[str, TokenBucket] = {}
-        self._lock = threading.RLock()
+        self._gcra_tats: Dict[str, float] = {}
+        self._window_logs: Dict[str, Deque[float]] = {}
+        self._window_counters: Dict[str, WindowCounterState] = {}
+        # Concurrency slots: key -> slot id -> expiry (monotonic)
+        self._slots: Dict[str, Dict[str, float]] = {}
+        # Adaptive rates: key -> (rate, time of last cut (monotonic))
+        self._rates: Dict[str, Tuple[float, Optional[float]]] = {}
+        self._lock = threading.RLock()  # Cleanup and clear
+        self._stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
         self._cleanup_interval = cleanup_interval
         self._last_cleanup = datetime.utcnow()
 
-    def _get_endpoint_key(self, url: str) -> str:
-        """Extract endpoint key from URL."""
-        parsed = urlparse(url)
-        return f"{parsed.scheme}://{parsed.netloc}"
+    @contextmanager
+    def _locked(self, keys: Optional[Sequence[str]] = None) -> Iterator[None]:
+        """Hold the stripe locks of ``keys`` (all if None), taken in a fixed order."""
+        if keys is None:
+            locks = self._stripes
+        else:
+            locks = [self._stripes[i] for i in sorted({hash(key) % LOCK_STRIPES for key in keys})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
 
     def _cleanup_expired(self) -> None:
-        """Remove expired rate limit entries."""
+        """Remove expired rate limit entries, at most once per cleanup interval."""
         now = datetime.utcnow()
         if (now - self._last_cleanup).total_seconds() < self._cleanup_interval:
             return
 
-        # Use list comprehension for better performance
-        expired_keys = [
-            key for key, rate_limit in self._rate_limits.items()
-            if rate_limit.reset_time < now
-        ]
+        # Call with no stripe held: cleanup takes them all, as clear does
+        with self._lock, self._locked():
+            if (now - self._last_cleanup).total_seconds() < self._cleanup_interval:
+                return  # Another thread cleaned up first
+            # Use list comprehension for better performance
+            expired_keys = [
+                key for key, rate_limit in self._rate_limits.items()
+                if rate_limit.reset_time < now
+            ]
 
-        for key in expired_keys:
-            self._rate_limits.pop(key, None)
+            for key in expired_keys:
+                self._rate_limits.pop(key, None)
 
-        self._last_cleanup = now
+            self._last_cleanup = now
 
     def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
         """Get rate limit for an endpoint."""
-        with self._lock:
-            self._cleanup_expired()
+        self._cleanup_expired()
+        with self._locked((endpoint,)):
             return self._rate_limits.get(endpoint)
 
     def set_rate_limit(self, endpoint: str, rate_limit: RateLimit) -> None:
         """Store rate limit for an endpoint."""
-        with self._lock:
+        with self._locked((endpoint,)):
             self._rate_limits[endpoint] = rate_limit
-            self._cleanup_expired()
+        self._cleanup_expired()
 
     def get_token_bucket(self, key: str) -> Optional[TokenBucket]:
-        """Get token bucket for a key."""
-        with self._lock:
-            return self._token_buckets.get(key)
+        """Get a snapshot of the token bucket for a key."""
+        with self._locked((key,)):
+            bucket = self._token_buckets.get(key)
+            return bucket.copy() if bucket is not None else None
 
     def set_token_bucket(self, key: str, bucket: TokenBucket) -> None:
         """Store token bucket for a key."""
-        with self._lock:
-            self._token_buckets[key] = bucket
+        with self._locked((key,)):
+            self._token_buckets[key] = bucket.copy()
+
+    def acquire(
+        self,
+        key: str,
+        tokens: float,
+        limit: int,
+        window: timedelta,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from the limiter state for a key."""
+        return self.acquire_many([(key, limit, window)], tokens, max_wait, algorithm)
+
+    def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from several limits at once."""
+        with self._locked([key for key, _, _ in limits]):
+            store = self._states(algorithm)
+            granted, wait, states = _acquire_many(
+                algorithm,
+                [store.get(key) for key, _, _ in limits],
+                limits,
+                time.monotonic(),
+                tokens,
+                max_wait,
+            )
+            if states is not None:
+                for (key, _, _), state in zip(limits, states):
+                    store[key] = state
+            return granted, wait
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used."""
+        with self._locked([key for key, _, _ in limits]):
+            store = self._states(algorithm)
+            now = time.monotonic()
+            for key, limit, window in limits:
+                state = _refund_step(algorithm, store.get(key), now, tokens, limit, window)
+                if state is None:
+                    store.pop(key, None)
+                else:
+                    store[key] = state
+
+    def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        with self._locked((key,)):
+            self._states(algorithm)[key] = _state_for_remaining(
+                algorithm, time.monotonic(), remaining, limit, window
+            )
+
+    def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` concurrency slots for a key."""
+        with self._locked((key,)):
+            now = time.monotonic()
+            slots = {
+                slot: expires_at
+                for slot, expires_at in self._slots.get(key, {}).items()
+                if expires_at > now
+            }
+            if len(slots) >= limit:
+                self._slots[key] = slots
+                return None
+            slot = uuid.uuid4().hex
+            slots[slot] = now + ttl
+            self._slots[key] = slots
+            return slot
+
+    def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot."""
+        with self._locked((key,)):
+            slots = self._slots.get(key)
+            if slots is not None:
+                slots.pop(slot, None)
+                if not slots:
+                    del self._slots[key]
+
+    def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate in one atomic step."""
+        with self._locked((key,)):
+            rate, cut_at = self._rates.get(key, (initial, None))
+            rate, cut_at = _adapted_rate(
+                rate, cut_at, time.monotonic(), increase, factor, minimum, maximum, hold
+            )
+            self._rates[key] = (rate, cut_at)
+            return rate
+
+    def _states(self, algorithm: str) -> Dict[str, Any]:
+        """Get the per-key state dict for an algorithm."""
+        if algorithm == GCRA:
+            return self._gcra_tats
+        if algorithm == SLIDING_LOG:
+            return self._window_logs
+        if algorithm == SLIDING_WINDOW:
+            return self._window_counters
+        return self._token_buckets
 
     def clear(self, endpoint: Optional[str] = None) -> None:
         """Clear stored data for endpoint or all data."""
-        with self._lock:
+        with self._lock, self._locked():
             if endpoint:
                 self._rate_limits.pop(endpoint, None)
                 # Clear all token buckets for this endpoint
@@ -110,9 +633,23 @@ class MemoryStorage(StorageBackend):
                 ]
                 for key in keys_to_remove:
                     del self._token_buckets[key]
+                for state in (
+                    self._gcra_tats,
+                    self._window_logs,
+                    self._window_counters,
+                    self._slots,
+                    self._rates,
+                ):
+                    for key in [k for k in state if k.startswith(endpoint)]:
+                        del state[key]
             else:
                 self._rate_limits.clear()
                 self._token_buckets.clear()
+                self._gcra_tats.clear()
+                self._window_logs.clear()
+                self._window_counters.clear()
+                self._slots.clear()
+                self._rates.clear()
 
 
 class SQLiteStorage(StorageBackend):
@@ -167,6 +704,34 @@ class SQLiteStorage(StorageBackend):
                 )
             """
             )
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS gcra_state (
+                    key TEXT PRIMARY KEY,
+                    tat REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS window_state (
+                    key TEXT PRIMARY KEY,
+                    algorithm TEXT NOT NULL,
+                    state TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS concurrency_slots (
+                    key TEXT NOT NULL,
+                    slot TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (key, slot)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS adaptive_rates (
+                    key TEXT PRIMARY KEY,
+                    rate REAL NOT NULL,
+                    cut_at REAL
+                )
+            """)
             conn.commit()
         finally:
             if close_conn:
@@ -249,12 +814,7 @@ class SQLiteStorage(StorageBackend):
                 if row is None:
                     return None
 
-                return TokenBucket(
-                    capacity=row["capacity"],
-                    tokens=row["tokens"],
-                    refill_rate=row["refill_rate"],
-                    last_update=self._str_to_datetime(row["last_update"]),
-                )
+                return self._row_to_bucket(row)
             finally:
                 if self._conn is None:
                     conn.close()
@@ -264,25 +824,234 @@ class SQLiteStorage(StorageBackend):
         with self._lock:
             conn = self._get_connection()
             try:
-                conn.execute(
-                    """
-                    INSERT OR REPLACE INTO token_buckets
-                    (key, capacity, tokens, refill_rate, last_update)
-                    VALUES (?, ?, ?, ?, ?)
-                """,
-                    (
-                        key,
-                        bucket.capacity,
-                        bucket.tokens,
-                        bucket.refill_rate,
-                        self._datetime_to_str(bucket.last_update),
-                    ),
-                )
+                self._write_bucket(conn, key, bucket)
                 conn.commit()
             finally:
                 if self._conn is None:
                     conn.close()
 
+    def acquire(
+        self,
+        key: str,
+        tokens: float,
+        limit: int,
+        window: timedelta,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """
+        Atomically take tokens from the limiter state for a key.
+
+        Runs inside a ``BEGIN IMMEDIATE`` transaction, which holds the database
+        write lock and serialises processes sharing the same file.
+        """
+        return self.acquire_many([(key, limit, window)], tokens, max_wait, algorithm)
+
+    def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from several limits in one transaction."""
+        with self._transaction() as conn:
+            granted, wait, states = _acquire_many(
+                algorithm,
+                [self._read_state(conn, key, algorithm) for key, _, _ in limits],
+                limits,
+                self._now(algorithm),
+                tokens,
+                max_wait,
+            )
+            if states is not None:
+                for (key, _, _), state in zip(limits, states):
+                    self._write_state(conn, key, algorithm, state)
+            return granted, wait
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used."""
+        with self._transaction() as conn:
+            now = self._now(algorithm)
+            for key, limit, window in limits:
+                state = _refund_step(
+                    algorithm, self._read_state(conn, key, algorithm), now, tokens, limit, window
+                )
+                if state is None:
+                    self._delete_state(conn, key, algorithm)
+                else:
+                    self._write_state(conn, key, algorithm, state)
+
+    def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        with self._transaction() as conn:
+            self._write_state(
+                conn,
+                key,
+                algorithm,
+                _state_for_remaining(algorithm, self._now(algorithm), remaining, limit, window),
+            )
+
+    def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of ``limit`` concurrency slots for a key, shared by every process."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM concurrency_slots WHERE key = ? AND expires_at <= ?", (key, now)
+            )
+            (in_use,) = conn.execute(
+                "SELECT COUNT(*) FROM concurrency_slots WHERE key = ?", (key,)
+            ).fetchone()
+            if in_use >= limit:
+                return None
+            slot = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO concurrency_slots (key, slot, expires_at) VALUES (?, ?, ?)",
+                (key, slot, now + ttl),
+            )
+            return slot
+
+    def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM concurrency_slots WHERE key = ? AND slot = ?", (key, slot))
+
+    def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate shared by every process."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT rate, cut_at FROM adaptive_rates WHERE key = ?", (key,)
+            ).fetchone()
+            rate, cut_at = (initial, None) if row is None else (row[0], row[1])
+            rate, cut_at = _adapted_rate(
+                rate, cut_at, time.time(), increase, factor, minimum, maximum, hold
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO adaptive_rates (key, rate, cut_at) VALUES (?, ?, ?)",
+                (key, rate, cut_at),
+            )
+            return rate
+
+    @staticmethod
+    def _now(algorithm: str) -> float:
+        """Current time on the timeline the algorithm's state is kept in.
+
+        Token buckets are converted to ``time.monotonic()`` when read; every
+        other state is stored as Unix time so processes share one timeline.
+        """
+        return time.monotonic() if algorithm == TOKEN_BUCKET else time.time()
+
+    def _read_state(self, conn: sqlite3.Connection, key: str, algorithm: str) -> Any:
+        """Load the limiter state for a key (inside a transaction)."""
+        if algorithm == GCRA:
+            row = conn.execute("SELECT tat FROM gcra_state WHERE key = ?", (key,)).fetchone()
+            return row["tat"] if row else None
+
+        if algorithm in (SLIDING_LOG, SLIDING_WINDOW):
+            row = conn.execute(
+                "SELECT state FROM window_state WHERE key = ? AND algorithm = ?",
+                (key, algorithm),
+            ).fetchone()
+            if row is None:
+                return None
+            state = json.loads(row["state"])
+            return state if algorithm == SLIDING_LOG else tuple(state)
+
+        row = conn.execute("SELECT * FROM token_buckets WHERE key = ?", (key,)).fetchone()
+        return self._row_to_bucket(row) if row else None
+
+    def _write_state(self, conn: sqlite3.Connection, key: str, algorithm: str, state: Any) -> None:
+        """Upsert the limiter state for a key without committing."""
+        if algorithm == GCRA:
+            conn.execute("INSERT OR REPLACE INTO gcra_state (key, tat) VALUES (?, ?)", (key, state))
+        elif algorithm in (SLIDING_LOG, SLIDING_WINDOW):
+            conn.execute(
+                "INSERT OR REPLACE INTO window_state (key, algorithm, state) VALUES (?, ?, ?)",
+                (key, algorithm, json.dumps(list(state))),
+            )
+        else:
+            self._write_bucket(conn, key, state)
+
+    def _delete_state(self, conn: sqlite3.Connection, key: str, algorithm: str) -> None:
+        """Delete the limiter state for a key without committing."""
+        if algorithm == GCRA:
+            conn.execute("DELETE FROM gcra_state WHERE key = ?", (key,))
+        elif algorithm in (SLIDING_LOG, SLIDING_WINDOW):
+            conn.execute(
+                "DELETE FROM window_state WHERE key = ? AND algorithm = ?", (key, algorithm)
+            )
+        else:
+            conn.execute("DELETE FROM token_buckets WHERE key = ?", (key,))
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Run a read-modify-write under the database write lock."""
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                conn.row_factory = sqlite3.Row
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    yield conn
+                    conn.commit()
+                except BaseException:
+                    conn.rollback()
+                    raise
+            finally:
+                if self._conn is None:
+                    conn.close()
+
+    def _row_to_bucket(self, row: sqlite3.Row) -> TokenBucket:
+        """Build a token bucket from a database row."""
+        return TokenBucket(
+            capacity=row["capacity"],
+            tokens=row["tokens"],
+            refill_rate=row["refill_rate"],
+            last_update=timestamp_to_monotonic(
+                (self._str_to_datetime(row["last_update"]) - _EPOCH).total_seconds()
+            ),
+        )
+
+    def _write_bucket(self, conn: sqlite3.Connection, key: str, bucket: TokenBucket) -> None:
+        """Upsert a token bucket row without committing."""
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO token_buckets
+            (key, capacity, tokens, refill_rate, last_update)
+            VALUES (?, ?, ?, ?, ?)
+        """,
+            (
+                key,
+                bucket.capacity,
+                bucket.tokens,
+                bucket.refill_rate,
+                self._datetime_to_str(
+                    datetime.utcfromtimestamp(monotonic_to_timestamp(bucket.last_update))
+                ),
+            ),
+        )
+
     def clear(self, endpoint: Optional[str] = None) -> None:
         """Clear stored data for endpoint or all data."""
         with self._lock:
@@ -296,16 +1065,204 @@ class SQLiteStorage(StorageBackend):
                         "DELETE FROM token_buckets WHERE key LIKE ?",
                         (f"{endpoint}%",),
                     )
+                    conn.execute(
+                        "DELETE FROM gcra_state WHERE key LIKE ?",
+                        (f"{endpoint}%",),
+                    )
+                    conn.execute(
+                        "DELETE FROM window_state WHERE key LIKE ?",
+                        (f"{endpoint}%",),
+                    )
+                    conn.execute(
+                        "DELETE FROM concurrency_slots WHERE key LIKE ?",
+                        (f"{endpoint}%",),
+                    )
+                    conn.execute(
+                        "DELETE FROM adaptive_rates WHERE key LIKE ?",
+                        (f"{endpoint}%",),
+                    )
                 else:
                     conn.execute("DELETE FROM rate_limits")
                     conn.execute("DELETE FROM token_buckets")
+                    conn.execute("DELETE FROM gcra_state")
+                    conn.execute("DELETE FROM window_state")
+                    conn.execute("DELETE FROM concurrency_slots")
+                    conn.execute("DELETE FROM adaptive_rates")
                 conn.commit()
             finally:
                 if self._conn is None:
                     conn.close()
 
 
-class RedisStorage(StorageBackend):
+class _RedisLayout:
+    """
+    How limiter state is laid out in Redis.
+
+    Key names, hash encodings and Lua script arguments, shared by
+    ``RedisStorage`` and the asyncio backend so both work on the same data.
+    """
+
+    key_prefix = "ratelimit:"
+
+    # Kinds of per-key state cleared with an endpoint
+    STATE_KINDS = ("token_bucket", "gcra", "sliding_log", "sliding_window", "slots", "adaptive")
+
+    def _make_key(self, key: str) -> bytes:
+        """Create a Redis key with prefix."""
+        return f"{self.key_prefix}{key}".encode("utf-8")
+
+    def _datetime_to_str(self, dt: datetime) -> str:
+        """Convert datetime to ISO format string."""
+        return dt.isoformat()
+
+    def _str_to_datetime(self, s: bytes) -> datetime:
+        """Convert bytes to datetime."""
+        return datetime.fromisoformat(s.decode("utf-8"))
+
+    def _hash_to_rate_limit(self, endpoint: str, data: Dict[bytes, bytes]) -> RateLimit:
+        """Build a rate limit from a Redis hash."""
+        return RateLimit(
+            endpoint=endpoint,
+            limit=int(data[b"limit"]),
+            remaining=int(data[b"remaining"]),
+            reset_time=self._str_to_datetime(data[b"reset_time"]),
+            window=timedelta(seconds=float(data[b"window_seconds"])),
+            last_updated=self._str_to_datetime(data[b"last_updated"]),
+        )
+
+    def _rate_limit_to_hash(self, rate_limit: RateLimit) -> Tuple[Dict[bytes, bytes], int]:
+        """Serialise a rate limit to a Redis hash mapping and its TTL in seconds."""
+        data = {
+            b"limit": str(rate_limit.limit).encode("utf-8"),
+            b"remaining": str(rate_limit.remaining).encode("utf-8"),
+            b"reset_time": self._datetime_to_str(rate_limit.reset_time).encode("utf-8"),
+            b"window_seconds": str(rate_limit.window.total_seconds()).encode("utf-8"),
+            b"last_updated": self._datetime_to_str(rate_limit.last_updated).encode("utf-8"),
+        }
+        # Expire an hour after the window for cleanup
+        return data, int((rate_limit.window + timedelta(hours=1)).total_seconds())
+
+    def _hash_to_bucket(self, data: Dict[bytes, bytes]) -> TokenBucket:
+        """Build a token bucket from a Redis hash."""
+        return TokenBucket(
+            capacity=float(data[b"capacity"]),
+            tokens=float(data[b"tokens"]),
+            refill_rate=float(data[b"refill_rate"]),
+            last_update=timestamp_to_monotonic(self._parse_timestamp(data[b"last_update"])),
+        )
+
+    def _bucket_to_hash(self, bucket: TokenBucket) -> Dict[bytes, bytes]:
+        """Serialise a token bucket to a Redis hash mapping."""
+        last_update = monotonic_to_timestamp(bucket.last_update)
+        return {
+            b"capacity": str(bucket.capacity).encode("utf-8"),
+            b"tokens": str(bucket.tokens).encode("utf-8"),
+            b"refill_rate": str(bucket.refill_rate).encode("utf-8"),
+            b"last_update": f"{last_update:.6f}".encode("utf-8"),
+        }
+
+    def _parse_timestamp(self, s: bytes) -> float:
+        """Parse a Unix timestamp written by the Lua scripts."""
+        try:
+            return float(s)
+        except ValueError:
+            # Buckets written by older versions store ISO strings
+            return (self._str_to_datetime(s) - _EPOCH).total_seconds()
+
+    def _acquire_call(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float],
+        algorithm: str,
+    ) -> Optional[Tuple[str, List[bytes], List[Any]]]:
+        """Get the script, keys and arguments taking tokens, or None if they never fit."""
+        keys: List[bytes] = []
+        args: List[Any] = [tokens, -1 if max_wait is None else max_wait]
+        if algorithm == TOKEN_BUCKET:
+            args.append(86400)
+
+        for key, limit, window in limits:
+            window_seconds = window.total_seconds()
+            if algorithm == TOKEN_BUCKET:
+                keys.append(self._make_key(f"token_bucket:{key}"))
+                refill_rate = float(limit) / window_seconds if window_seconds > 0 else 0.0
+                args.extend([float(limit), refill_rate])
+                continue
+
+            if window_seconds <= 0 or limit <= 0 or tokens > limit:
+                return None
+            if algorithm == GCRA:
+                keys.append(self._make_key(f"gcra:{key}"))
+                args.extend([window_seconds / limit, limit])
+            else:
+                keys.append(self._make_key(f"{algorithm}:{key}"))
+                if algorithm == SLIDING_LOG:
+                    keys.append(self._make_key(f"sliding_log:{key}:seq"))
+                args.extend([limit, window_seconds])
+
+        if algorithm == SLIDING_LOG:
+            args[0] = int(math.ceil(tokens))
+        return f"{algorithm.upper()}_ACQUIRE", keys, args
+
+    def _refund_call(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str,
+    ) -> Optional[Tuple[str, List[bytes], List[Any]]]:
+        """Get the script, keys and arguments giving tokens back, or None if there are none."""
+        keys: List[bytes] = []
+        args: List[Any] = [int(math.ceil(tokens)) if algorithm == SLIDING_LOG else tokens]
+        for key, limit, window in limits:
+            keys.append(self._make_key(f"{algorithm}:{key}"))
+            if algorithm == GCRA:
+                window_seconds = window.total_seconds()
+                if limit <= 0 or window_seconds <= 0:
+                    return None
+                args.append(window_seconds / limit)
+        return f"{algorithm.upper()}_REFUND", keys, args
+
+    def _remaining_call(
+        self, key: str, remaining: int, limit: int, window: timedelta, algorithm: str
+    ) -> Optional[Tuple[str, List[bytes], List[Any]]]:
+        """Get the script, keys and arguments resetting a GCRA or sliding key to ``remaining``."""
+        window_seconds = window.total_seconds()
+        if limit <= 0 or window_seconds <= 0:
+            return None
+        used = max(0, limit - remaining)
+        if algorithm == GCRA:
+            return (
+                "GCRA_SET_REMAINING",
+                [self._make_key(f"gcra:{key}")],
+                [used, window_seconds / limit],
+            )
+        keys = [self._make_key(f"{algorithm}:{key}")]
+        if algorithm == SLIDING_LOG:
+            # The log keeps at most ``limit`` entries, as acquiring does
+            keys.append(self._make_key(f"sliding_log:{key}:seq"))
+            used = min(used, limit)
+        return f"{algorithm.upper()}_SET_REMAINING", keys, [used, window_seconds]
+
+    def _adapt_call(
+        self,
+        key: str,
+        initial: float,
+        increase: float,
+        factor: float,
+        minimum: float,
+        maximum: Optional[float],
+        hold: float,
+    ) -> Tuple[str, List[bytes], List[Any]]:
+        """Get the script, keys and arguments adjusting an adaptive rate."""
+        return (
+            "ADAPT_RATE",
+            [self._make_key(f"adaptive:{key}")],
+            [initial, increase, factor, minimum, "" if maximum is None else maximum, hold],
+        )
+
+
+class RedisStorage(_RedisLayout, StorageBackend):
     """Redis-based distributed storage backend."""
 
     def __init__(self, redis_url: str = "redis://localhost:6379/0", key_prefix: str = "ratelimit:"):
@@ -327,18 +1284,7 @@ class RedisStorage(StorageBackend):
         self.redis_client = redis.from_url(redis_url, decode_responses=False)
         self.key_prefix = key_prefix
         self._lock = threading.RLock()
-
-    def _make_key(self, key: str) -> bytes:
-        """Create a Redis key with prefix."""
-        return f"{self.key_prefix}{key}".encode("utf-8")
-
-    def _datetime_to_str(self, dt: datetime) -> str:
-        """Convert datetime to ISO format string."""
-        return dt.isoformat()
-
-    def _str_to_datetime(self, s: bytes) -> datetime:
-        """Convert bytes to datetime."""
-        return datetime.fromisoformat(s.decode("utf-8"))
+        self._script_shas: Dict[str, str] = {}
 
     def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
         """Get rate limit for an endpoint."""
@@ -349,14 +1295,7 @@ class RedisStorage(StorageBackend):
                 if not data:
                     return None
 
-                return RateLimit(
-                    endpoint=endpoint,
-                    limit=int(data[b"limit"]),
-                    remaining=int(data[b"remaining"]),
-                    reset_time=self._str_to_datetime(data[b"reset_time"]),
-                    window=timedelta(seconds=float(data[b"window_seconds"])),
-                    last_updated=self._str_to_datetime(data[b"last_updated"]),
-                )
+                return self._hash_to_rate_limit(endpoint, data)
             except Exception:
                 return None
 
@@ -365,16 +1304,8 @@ class RedisStorage(StorageBackend):
         with self._lock:
             try:
                 key = self._make_key(f"rate_limit:{endpoint}")
-                data = {
-                    b"limit": str(rate_limit.limit).encode("utf-8"),
-                    b"remaining": str(rate_limit.remaining).encode("utf-8"),
-                    b"reset_time": self._datetime_to_str(rate_limit.reset_time).encode("utf-8"),
-                    b"window_seconds": str(rate_limit.window.total_seconds()).encode("utf-8"),
-                    b"last_updated": self._datetime_to_str(rate_limit.last_updated).encode("utf-8"),
-                }
+                data, ttl = self._rate_limit_to_hash(rate_limit)
                 self.redis_client.hset(key, mapping=data)
-                # Set expiration to window + 1 hour for cleanup
-                ttl = int((rate_limit.window + timedelta(hours=1)).total_seconds())
                 self.redis_client.expire(key, ttl)
             except Exception:
                 pass  # Graceful degradation
@@ -388,12 +1319,7 @@ class RedisStorage(StorageBackend):
                 if not data:
                     return None
 
-                return TokenBucket(
-                    capacity=float(data[b"capacity"]),
-                    tokens=float(data[b"tokens"]),
-                    refill_rate=float(data[b"refill_rate"]),
-                    last_update=self._str_to_datetime(data[b"last_update"]),
-                )
+                return self._hash_to_bucket(data)
             except Exception:
                 return None
 
@@ -402,18 +1328,152 @@ class RedisStorage(StorageBackend):
         with self._lock:
             try:
                 redis_key = self._make_key(f"token_bucket:{key}")
-                data = {
-                    b"capacity": str(bucket.capacity).encode("utf-8"),
-                    b"tokens": str(bucket.tokens).encode("utf-8"),
-                    b"refill_rate": str(bucket.refill_rate).encode("utf-8"),
-                    b"last_update": self._datetime_to_str(bucket.last_update).encode("utf-8"),
-                }
-                self.redis_client.hset(redis_key, mapping=data)
+                self.redis_client.hset(redis_key, mapping=self._bucket_to_hash(bucket))
                 # Set expiration to 24 hours for cleanup
                 self.redis_client.expire(redis_key, 86400)
             except Exception:
                 pass  # Graceful degradation
 
+    def acquire(
+        self,
+        key: str,
+        tokens: float,
+        limit: int,
+        window: timedelta,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """
+        Atomically take tokens from the limiter state for a key.
+
+        Refill, consume and the wait computation run in one Lua script timed
+        by Redis ``TIME``, so every worker shares the server's clock.
+        """
+        return self.acquire_many([(key, limit, window)], tokens, max_wait, algorithm)
+
+    def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from several limits in a single script call."""
+        call = self._acquire_call(limits, tokens, max_wait, algorithm)
+        if call is None:
+            return False, float("inf")
+        try:
+            granted, wait = self._run_script(*call)
+            return bool(granted), float(wait)
+        except Exception:
+            return True, 0.0  # Graceful degradation
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit but not used, in one script call."""
+        call = self._refund_call(limits, tokens, algorithm)
+        if call is None:
+            return
+        try:
+            self._run_script(*call)
+        except Exception:
+            pass  # Graceful degradation
+
+    def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key so ``remaining`` requests are available."""
+        if algorithm == TOKEN_BUCKET:
+            self.set_token_bucket(key, TokenBucket.for_limit(limit, window, tokens=remaining))
+            return
+
+        # One script call, so no acquire from another worker is lost in between
+        call = self._remaining_call(key, remaining, limit, window, algorithm)
+        if call is None:
+            return
+        try:
+            self._run_script(*call)
+        except Exception:
+            pass  # Graceful degradation
+
+    def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """
+        Take one of ``limit`` concurrency slots for a key.
+
+        Slots are members of a sorted set scored by their expiry on the Redis
+        clock, reclaimed and counted in one script call.
+        """
+        slot = uuid.uuid4().hex
+        try:
+            taken = self._run_script(
+                "CONCURRENCY_ACQUIRE", [self._make_key(f"slots:{key}")], [slot, limit, ttl]
+            )
+        except Exception:
+            return slot  # Graceful degradation
+        return slot if taken else None
+
+    def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot."""
+        try:
+            self.redis_client.zrem(self._make_key(f"slots:{key}"), slot)
+        except Exception:
+            pass  # Graceful degradation
+
+    def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """
+        Adjust an adaptively learned rate shared by every process.
+
+        The rate and the time of its last cut live in a hash updated by one
+        script call on the Redis clock.
+        """
+        try:
+            rate = self._run_script(
+                *self._adapt_call(key, initial, increase, factor, minimum, maximum, hold)
+            )
+        except Exception:
+            return initial  # Graceful degradation
+        return float(rate)
+
+    def _run_script(self, name: str, keys: list, args: list):
+        """Run a Lua script by cached SHA, reloading it if Redis lost it."""
+        from redis.exceptions import NoScriptError
+
+        sha = self._script_shas.get(name)
+        if sha is None:
+            sha = self._load_script(name)
+        try:
+            return self.redis_client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            # Script cache was flushed or we failed over to a fresh server
+            sha = self._load_script(name)
+            return self.redis_client.evalsha(sha, len(keys), *keys, *args)
+
+    def _load_script(self, name: str) -> str:
+        """Load a script into the Redis script cache and remember its SHA."""
+        sha = self.redis_client.script_load(getattr(redis_scripts, name))
+        if isinstance(sha, bytes):
+            sha = sha.decode("utf-8")
+        self._script_shas[name] = sha
+        return sha
+
     def clear(self, endpoint: Optional[str] = None) -> None:
         """Clear stored data for endpoint or all data."""
         with self._lock:
@@ -422,10 +1482,11 @@ class RedisStorage(StorageBackend):
                     # Delete rate limit
                     rate_limit_key = self._make_key(f"rate_limit:{endpoint}")
                     self.redis_client.delete(rate_limit_key)
-                    # Delete token buckets for this endpoint
-                    pattern = self._make_key(f"token_bucket:{endpoint}*")
-                    for key in self.redis_client.scan_iter(match=pattern):
-                        self.redis_client.delete(key)
+                    # Delete limiter state for this endpoint
+                    for kind in self.STATE_KINDS:
+                        pattern = self._make_key(f"{kind}:{endpoint}*")
+                        for key in self.redis_client.scan_iter(match=pattern):
+                            self.redis_client.delete(key)
                 else:
                     # Delete all keys with prefix
                     pattern = self._make_key("*")
@@ -434,3 +1495,291 @@ class RedisStorage(StorageBackend):
             except Exception:
                 pass  # Graceful degradation
 
+
+class CachedStorage(StorageBackend):
+    """
+    Read-through, write-behind cache in front of another storage backend.
+
+    Rate limits and token buckets are read from the wrapped backend at most
+    once per ``ttl`` seconds. Writes (``set_rate_limit``, ``set_token_bucket``
+    and ``set_remaining``) are kept in process and written by a background
+    flusher every ``flush_interval`` seconds, so repeated writes to the same
+    key cost one backend write. Atomic operations (``acquire``,
+    ``acquire_many`` and ``refund``) always go to the wrapped backend, after
+    any pending write to their keys, as do concurrency slots and
+    adaptive rates.
+    """
+
+    def __init__(
+        self,
+        backend: StorageBackend,
+        ttl: float = 1.0,
+        flush_interval: float = 0.5,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            backend: Storage backend to cache, e.g. a RedisStorage
+            ttl: Seconds a value read from the backend may be served from
+                cache (how stale reads may be)
+            flush_interval: Seconds between background writes of pending
+                changes (how late writes may reach the backend)
+        """
+        if ttl < 0:
+            raise ValueError(f"ttl must not be negative: {ttl}")
+        if flush_interval <= 0:
+            raise ValueError(f"flush_interval must be positive: {flush_interval}")
+
+        self.backend = backend
+        self._ttl = ttl
+        self._flush_interval = flush_interval
+        # key -> (expires_at, value), on the time.monotonic() clock
+        self._rate_limits: Dict[str, Tuple[float, Optional[RateLimit]]] = {}
+        self._token_buckets: Dict[str, Tuple[float, Optional[TokenBucket]]] = {}
+        # Pending writes, newest value per key
+        self._dirty_rate_limits: Dict[str, RateLimit] = {}
+        self._dirty_buckets: Dict[str, TokenBucket] = {}
+        self._dirty_remaining: Dict[str, Tuple[int, int, timedelta, str]] = {}
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def get_rate_limit(self, endpoint: str) -> Optional[RateLimit]:
+        """Get rate limit for an endpoint, from cache while it is fresh."""
+        with self._lock:
+            if endpoint in self._dirty_rate_limits:
+                return self._dirty_rate_limits[endpoint]
+            cached = self._rate_limits.get(endpoint)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+
+        rate_limit = self.backend.get_rate_limit(endpoint)
+        if rate_limit is not None:
+            with self._lock:
+                self._rate_limits[endpoint] = (time.monotonic() + self._ttl, rate_limit)
+        return rate_limit
+
+    def set_rate_limit(self, endpoint: str, rate_limit: RateLimit) -> None:
+        """Store rate limit for an endpoint; written to the backend later."""
+        with self._lock:
+            self._dirty_rate_limits[endpoint] = rate_limit
+            self._start_flusher()
+
+    def get_token_bucket(self, key: str) -> Optional[TokenBucket]:
+        """Get token bucket for a key, from cache while it is fresh."""
+        with self._lock:
+            if key in self._dirty_buckets:
+                return self._dirty_buckets[key]
+            pending = key in self._dirty_remaining
+            cached = self._token_buckets.get(key)
+            if not pending and cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+        if pending:
+            self._flush_keys([key])
+
+        bucket = self.backend.get_token_bucket(key)
+        if bucket is not None:
+            with self._lock:
+                self._token_buckets[key] = (time.monotonic() + self._ttl, bucket)
+        return bucket
+
+    def set_token_bucket(self, key: str, bucket: TokenBucket) -> None:
+        """Store token bucket for a key; written to the backend later."""
+        with self._lock:
+            self._dirty_remaining.pop(key, None)
+            self._dirty_buckets[key] = bucket
+            self._start_flusher()
+
+    def acquire(
+        self,
+        key: str,
+        tokens: float,
+        limit: int,
+        window: timedelta,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from the limiter state for a key."""
+        return self.acquire_many([(key, limit, window)], tokens, max_wait, algorithm)
+
+    def acquire_many(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        max_wait: Optional[float] = 0.0,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> Tuple[bool, float]:
+        """Atomically take tokens from several limits in the wrapped backend."""
+        self._flush_keys([key for key, _, _ in limits])
+        return self.backend.acquire_many(limits, tokens, max_wait=max_wait, algorithm=algorithm)
+
+    def refund(
+        self,
+        limits: Sequence[Tuple[str, int, timedelta]],
+        tokens: float,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Give back tokens taken from each limit in the wrapped backend."""
+        self._flush_keys([key for key, _, _ in limits])
+        self.backend.refund(limits, tokens, algorithm=algorithm)
+
+    def set_remaining(
+        self,
+        key: str,
+        remaining: int,
+        limit: int,
+        window: timedelta,
+        algorithm: str = TOKEN_BUCKET,
+    ) -> None:
+        """Overwrite the limiter state for a key; written to the backend later."""
+        with self._lock:
+            if algorithm == TOKEN_BUCKET:
+                self._dirty_buckets.pop(key, None)
+            self._token_buckets.pop(key, None)
+            self._dirty_remaining[key] = (remaining, limit, window, algorithm)
+            self._start_flusher()
+
+    def acquire_slot(self, key: str, limit: int, ttl: float) -> Optional[str]:
+        """Take a concurrency slot in the wrapped backend."""
+        return self.backend.acquire_slot(key, limit, ttl)
+
+    def release_slot(self, key: str, slot: str) -> None:
+        """Give back a concurrency slot in the wrapped backend."""
+        self.backend.release_slot(key, slot)
+
+    def adapt_rate(
+        self,
+        key: str,
+        initial: float,
+        increase: float = 0.0,
+        factor: float = 1.0,
+        minimum: float = 1.0,
+        maximum: Optional[float] = None,
+        hold: float = 0.0,
+    ) -> float:
+        """Adjust an adaptively learned rate in the wrapped backend."""
+        return self.backend.adapt_rate(key, initial, increase, factor, minimum, maximum, hold)
+
+    def flush(self) -> None:
+        """Write every pending change to the wrapped backend now."""
+        self._flush_keys(None)
+
+    def close(self) -> None:
+        """Stop the background flusher and write pending changes."""
+        self._stop.set()
+        flusher = self._flusher
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+        self._flusher = None
+        self.flush()
+        self.backend.close()
+
+    def clear(self, endpoint: Optional[str] = None) -> None:
+        """Clear stored data for endpoint or all data, dropping pending writes."""
+        with self._flush_lock, self._lock:
+            for store in (
+                self._rate_limits,
+                self._token_buckets,
+                self._dirty_rate_limits,
+                self._dirty_buckets,
+                self._dirty_remaining,
+            ):
+                if endpoint is None:
+                    store.clear()
+                else:
+                    for key in [k for k in store if k.startswith(endpoint)]:
+                        del store[key]
+            self.backend.clear(endpoint)
+
+    def _start_flusher(self) -> None:
+        """Start the background flusher if it is not running (lock held)."""
+        if self._flusher is not None and self._flusher.is_alive():
+            return
+        self._stop.clear()
+        self._flusher = threading.Thread(
+            target=self._run_flusher, name="smartratelimit-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    def _run_flusher(self) -> None:
+        """Write pending changes every flush interval until stopped or idle."""
+        while not self._stop.wait(self._flush_interval):
+            self.flush()
+            with self._lock:
+                if not (self._dirty_rate_limits or self._dirty_buckets or self._dirty_remaining):
+                    # The next write starts a new flusher
+                    self._flusher = None
+                    return
+
+    def _flush_keys(self, keys: Optional[Sequence[str]]) -> None:
+        """Write pending changes for ``keys`` (or all) to the wrapped backend."""
+        with self._flush_lock:
+            with self._lock:
+                if keys is None:
+                    rate_limits = self._dirty_rate_limits
+                    buckets = self._dirty_buckets
+                    remaining = self._dirty_remaining
+                    self._dirty_rate_limits = {}
+                    self._dirty_buckets = {}
+                    self._dirty_remaining = {}
+                else:
+                    rate_limits = {}
+                    buckets = {
+                        k: self._dirty_buckets.pop(k) for k in keys if k in self._dirty_buckets
+                    }
+                    remaining = {
+                        k: self._dirty_remaining.pop(k) for k in keys if k in self._dirty_remaining
+                    }
+                    # State is about to change in the backend
+                    for key in keys:
+                        self._token_buckets.pop(key, None)
+                if not (rate_limits or buckets or remaining):
+                    return
+
+                # Serve written values from cache until they expire
+                expires_at = time.monotonic() + self._ttl
+                for endpoint, rate_limit in rate_limits.items():
+                    self._rate_limits[endpoint] = (expires_at, rate_limit)
+                for key, bucket in buckets.items():
+                    self._token_buckets[key] = (expires_at, bucket)
+
+            # Each change is dropped from its map once written, so a failure
+            # leaves exactly the unwritten ones behind
+            try:
+                for endpoint in list(rate_limits):
+                    self.backend.set_rate_limit(endpoint, rate_limits[endpoint])
+                    del rate_limits[endpoint]
+                for key in list(buckets):
+                    self.backend.set_token_bucket(key, buckets[key])
+                    del buckets[key]
+                for key in list(remaining):
+                    left, limit, window, algorithm = remaining[key]
+                    self.backend.set_remaining(key, left, limit, window, algorithm=algorithm)
+                    del remaining[key]
+            except Exception as e:
+                self._requeue(rate_limits, buckets, remaining)
+                logger.warning(
+                    f"Failed to write {len(rate_limits) + len(buckets) + len(remaining)} "
+                    f"pending changes to storage, retrying on the next flush: {e}"
+                )
+
+    def _requeue(
+        self,
+        rate_limits: Dict[str, RateLimit],
+        buckets: Dict[str, TokenBucket],
+        remaining: Dict[str, Tuple[int, int, timedelta, str]],
+    ) -> None:
+        """Put back changes that failed to write, unless newer ones were made meanwhile."""
+        with self._lock:
+            for endpoint, rate_limit in rate_limits.items():
+                self._dirty_rate_limits.setdefault(endpoint, rate_limit)
+            for key, bucket in buckets.items():
+                if key not in self._dirty_remaining:
+                    self._dirty_buckets.setdefault(key, bucket)
+            for key, value in remaining.items():
+                if key not in self._dirty_buckets:
+                    self._dirty_remaining.setdefault(key, value)
+            if not self._stop.is_set():
+                self._start_flusher()
@@ -1,6 +1,7 @@
 """Performance benchmarks for smartratelimit."""
 
 import time
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 from smartratelimit import RateLimiter
@@ -84,33 +85,271 @@ def benchmark_sqlite_storage():
     print(f"  token_bucket ops (1000 ops): {bucket_time*1000:.2f}ms ({bucket_time/1000*1e6:.2f}μs per op)")
 
 
+@dataclass
+class _DatetimeTokenBucket:
+    """The previous datetime-based bucket, kept as a benchmark baseline."""
+
+    capacity: float
+    tokens: float
+    refill_rate: float
+    last_update: datetime = field(default_factory=datetime.utcnow)
+
+    def refill(self) -> None:
+        now = datetime.utcnow()
+        elapsed = (now - self.last_update).total_seconds()
+        if elapsed <= 0:
+            return
+        self.tokens = min(self.capacity, self.tokens + (elapsed * self.refill_rate))
+        self.last_update = now
+
+    def consume(self, tokens: float = 1.0) -> bool:
+        self.refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+
+def benchmark_token_bucket():
+    """Benchmark monotonic TokenBucket against the datetime-based baseline."""
+    ops = 100000
+
+    legacy = _DatetimeTokenBucket(capacity=1e9, tokens=1e9, refill_rate=1.0)
+    start = time.perf_counter()
+    for _ in range(ops):
+        legacy.consume()
+    legacy_time = time.perf_counter() - start
+
+    bucket = TokenBucket(capacity=1e9, tokens=1e9, refill_rate=1.0)
+    start = time.perf_counter()
+    for _ in range(ops):
+        bucket.consume()
+    bucket_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        bucket.reserve()
+    reserve_time = time.perf_counter() - start
+
+    print("\nToken Bucket Benchmarks:")
+    print(
+        f"  datetime consume ({ops} ops): {legacy_time*1000:.2f}ms "
+        f"({legacy_time/ops*1e6:.3f}μs per op)"
+    )
+    print(
+        f"  monotonic consume ({ops} ops): {bucket_time*1000:.2f}ms "
+        f"({bucket_time/ops*1e6:.3f}μs per op)"
+    )
+    print(
+        f"  monotonic reserve ({ops} ops): {reserve_time*1000:.2f}ms "
+        f"({reserve_time/ops*1e6:.3f}μs per op)"
+    )
+    print(f"  speedup: {legacy_time/bucket_time:.1f}x")
+
+
+def benchmark_algorithms():
+    """Benchmark acquire for each algorithm on each local backend."""
+    window = timedelta(minutes=1)
+    ops = 1000
+
+    print("\nAlgorithm Benchmarks (acquire):")
+    for name, storage in (("memory", MemoryStorage()), ("sqlite", SQLiteStorage(":memory:"))):
+        for algorithm in ("token_bucket", "gcra", "sliding_log", "sliding_window"):
+            start = time.perf_counter()
+            for i in range(ops):
+                storage.acquire(f"key{i % 10}", 1, 1000000, window, algorithm=algorithm)
+            elapsed = time.perf_counter() - start
+            print(
+                f"  {name} {algorithm} ({ops} ops): {elapsed*1000:.2f}ms "
+                f"({elapsed/ops*1e6:.2f}μs per op)"
+            )
+
+        # Per-second, per-minute and per-day windows in one call
+        limits = [
+            ("composite:1s", 1000000, timedelta(seconds=1)),
+            ("composite:60s", 1000000, timedelta(minutes=1)),
+            ("composite:86400s", 1000000, timedelta(days=1)),
+        ]
+        start = time.perf_counter()
+        for _ in range(ops):
+            storage.acquire_many(limits, 1)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {name} 3-window composite ({ops} ops): {elapsed*1000:.2f}ms "
+            f"({elapsed/ops*1e6:.2f}μs per op)"
+        )
+
+
+def benchmark_leasing():
+    """Benchmark leased acquire against a file-backed SQLite backend."""
+    import os
+    import tempfile
+
+    from smartratelimit.leasing import LeaseManager, LeasePolicy
+
+    limits = [("key", 1000000, timedelta(minutes=1))]
+    ops = 1000
+
+    print("\nLeasing Benchmarks (sqlite file):")
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        for _ in range(ops):
+            storage.acquire_many(limits, 1)
+        direct_time = time.perf_counter() - start
+
+        leases = LeaseManager(storage)
+        policy = LeasePolicy(lease_seconds=1.0, max_share=0.01)
+        start = time.perf_counter()
+        for _ in range(ops):
+            leases.acquire(limits, 1, policy)
+        leased_time = time.perf_counter() - start
+        leases.release()
+
+    print(
+        f"  direct acquire ({ops} ops): {direct_time*1000:.2f}ms "
+        f"({direct_time/ops*1e6:.2f}μs per op)"
+    )
+    print(
+        f"  leased acquire ({ops} ops): {leased_time*1000:.2f}ms "
+        f"({leased_time/ops*1e6:.2f}μs per op)"
+    )
+    print(f"  speedup: {direct_time/leased_time:.1f}x")
+
+
+def benchmark_route_lookup():
+    """Benchmark route template matching with many registered routes."""
+    from smartratelimit.routes import RouteTable
+
+    routes = RouteTable()
+    for i in range(1000):
+        routes.add("api.example.com", f"/v1/resource{i}/{{id}}/items")
+    ops = 100000
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        routes.match("api.example.com", "/v1/resource999/42/items")
+    elapsed = time.perf_counter() - start
+
+    print("\nRoute Lookup (1000 routes):")
+    print(f"  match ({ops} ops): {elapsed*1000:.2f}ms ({elapsed/ops*1e6:.3f}μs per op)")
+
+
+def benchmark_thread_accuracy():
+    """Benchmark admission accuracy and throughput with many threads."""
+    import threading
+
+    limit, seconds, workers = 200, 2.0, 16
+    limiter = RateLimiter(raise_on_limit=True)
+    limiter.set_limit("api.example.com", limit=limit, window="1s")
+    limiter.set_limit("other.example.com", limit=1000000, window="1s")
+    limited_since = time.monotonic()
+    admitted = []
+    attempts = []
+
+    def worker(url):
+        count = tries = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            tries += 1
+            count += limiter.try_acquire(url)[0]
+        admitted.append((url, count))
+        attempts.append(tries)
+
+    threads = [
+        threading.Thread(target=worker, args=(f"https://{host}/x",))
+        for host in ["api.example.com", "other.example.com"] * (workers // 2)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    limited = sum(count for url, count in admitted if "api." in url)
+    # Initial burst plus the refill since the limit was set
+    allowed = limit * (1 + time.monotonic() - limited_since)
+    print(f"\nThread Accuracy ({workers} threads, {seconds:g}s):")
+    print(f"  admitted {limited} of at most {allowed:.0f} on the limited endpoint")
+    print(f"  {sum(attempts)/elapsed:.0f} acquires/s across both endpoints")
+
+
+def benchmark_endpoint_resolution():
+    """Benchmark URL to endpoint key resolution, uncached and memoised per origin."""
+    limiter = RateLimiter(routes={"api.example.com": ["/v1/users/{id}"]})
+    url = "https://api.example.com/v1/users/42?page=2"
+    ops = 100000
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        limiter._parse_endpoint(url)
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(ops):
+        limiter._request_context(url)
+    cached_time = time.perf_counter() - start
+
+    # REST paths carry IDs, so most requests are to a URL not seen before
+    plain = RateLimiter()
+    urls = [f"https://api.example.com/users/{i}" for i in range(5000)]
+
+    start = time.perf_counter()
+    for i in range(ops):
+        plain._parse_endpoint(urls[i % len(urls)])
+    distinct_parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(ops):
+        plain._request_context(urls[i % len(urls)])
+    distinct_time = time.perf_counter() - start
+
+    print("\nEndpoint Resolution:")
+    for label, elapsed in (
+        ("urlparse + route match, same URL", parse_time),
+        ("memoised + route match, same URL", cached_time),
+        ("urlparse, 5000 distinct paths", distinct_parse_time),
+        ("memoised, 5000 distinct paths", distinct_time),
+    ):
+        print(f"  {label} ({ops} ops): {elapsed*1000:.2f}ms ({elapsed/ops*1e6:.3f}μs per op)")
+
+
 def benchmark_rate_limiter_overhead():
-    """Benchmark rate limiter overhead per request."""
+    """Benchmark rate limiter overhead per request, without HTTP calls."""
+    import requests
+
+    response = requests.Response()
+    response.status_code = 200
+    response.url = "https://api.example.com/v1/users"
+
     limiter = RateLimiter()
-    limiter.set_limit("api.example.com", limit=10000, window="1m")
+    limiter.set_limit("api.example.com", limit=1000000, window="1m")
+    limiter._session.request = lambda method, url, **kwargs: response
+    ops = 10000
 
-    # Simulate requests (without actual HTTP calls)
     start = time.perf_counter()
-    for _ in range(1000):
-        # Simulate the rate limiting check
-        status = limiter.get_status("api.example.com")
-        if status:
-            bucket = limiter._storage.get_token_bucket(
-                limiter._get_bucket_key("https://api.example.com")
-            )
-            if bucket:
-                bucket.refill()
-                bucket.consume()
+    for _ in range(ops):
+        limiter.request("GET", "https://api.example.com/v1/users")
     overhead_time = time.perf_counter() - start
 
     print("\nRate Limiter Overhead:")
-    print(f"  Per-request overhead (1000 ops): {overhead_time*1000:.2f}ms ({overhead_time/1000*1e6:.2f}μs per op)")
+    print(
+        f"  Per-request overhead ({ops} ops): {overhead_time*1000:.2f}ms "
+        f"({overhead_time/ops*1e6:.2f}μs per op)"
+    )
 
 
 if __name__ == "__main__":
     print("Running performance benchmarks...\n")
     benchmark_memory_storage()
     benchmark_sqlite_storage()
+    benchmark_token_bucket()
+    benchmark_algorithms()
+    benchmark_leasing()
+    benchmark_route_lookup()
+    benchmark_endpoint_resolution()
     benchmark_rate_limiter_overhead()
+    benchmark_thread_accuracy()
     print("\nBenchmarks completed!")
 
@@ -0,0 +1,100 @@
+"""Tests for adaptive rate limits."""
+
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from smartratelimit.adaptive import AdaptiveRate
+from smartratelimit.storage import MemoryStorage
+
+
+class TestAdaptiveRate:
+    """Test AdaptiveRate."""
+
+    def test_additive_increase(self):
+        """Test a window's worth of successes raises the limit by one."""
+        adaptive = AdaptiveRate(MemoryStorage(), "key:adaptive", 10, timedelta(seconds=1))
+
+        # Increases are held back until the window is over
+        assert [adaptive.update(200) for _ in range(10)] == [None] * 10
+        assert adaptive.limit == 10
+        with patch("smartratelimit.adaptive.time.monotonic", return_value=time.monotonic() + 1):
+            assert adaptive.update(200) == 11
+
+        # Client errors other than 429 say nothing about the rate
+        assert adaptive.update(404) is None
+        assert adaptive.rate == pytest.approx(11.1)
+
+    def test_writes_increases_once_per_window(self):
+        """Test successes cost one storage write per window and cuts are written at once."""
+        storage = MemoryStorage()
+        adaptive = AdaptiveRate(storage, "key:adaptive", 10, timedelta(seconds=1))
+
+        with patch.object(storage, "adapt_rate", wraps=storage.adapt_rate) as adapt_rate:
+            for _ in range(200):
+                adaptive.update(200)
+            assert adapt_rate.call_count == 0
+
+            # The cut halves the rate the summed increases reached
+            assert adaptive.update(429) == 15
+            assert adapt_rate.call_count == 1
+
+    def test_multiplicative_decrease_once_per_window(self):
+        """Test a burst of 429s halves the limit once, within its bounds."""
+        adaptive = AdaptiveRate(
+            MemoryStorage(), "key:adaptive", 40, timedelta(minutes=1), min_limit=15, max_limit=50
+        )
+
+        assert adaptive.update(429) == 20
+        assert adaptive.update(503) is None
+        assert adaptive.limit == 20
+
+        with patch("smartratelimit.storage.time.monotonic", return_value=time.monotonic() + 61):
+            assert adaptive.update(429) == 15
+
+    def test_converges_on_server_limit(self):
+        """Test workers sharing storage settle near the server's real limit."""
+        storage = MemoryStorage()
+        workers = [
+            AdaptiveRate(storage, "key:adaptive", 5, timedelta(seconds=1), increase=2.0)
+            for _ in range(3)
+        ]
+        server_limit = 30
+
+        limits = []
+        now = time.monotonic()
+        for window in range(40):
+            with patch("smartratelimit.storage.time.monotonic", return_value=now + window):
+                limit = workers[0].limit
+                for i in range(limit):
+                    workers[i % len(workers)].update(200 if i < server_limit else 429)
+            limits.append(limit)
+
+        # Additive increase probes past the limit, one backoff per window halves it
+        assert max(limits) <= server_limit + 2
+        assert min(limits[15:]) >= server_limit // 2
+        assert limits.count(server_limit) + limits.count(server_limit + 1) > 0
+
+    def test_starts_from_stored_rate(self):
+        """Test a new limiter resumes from the rate other processes learned."""
+        storage = MemoryStorage()
+        first = AdaptiveRate(storage, "key:adaptive", 100, timedelta(minutes=1))
+        first.update(429)
+
+        second = AdaptiveRate(storage, "key:adaptive", 100, timedelta(minutes=1))
+        assert second.limit == 50
+
+    def test_invalid_arguments(self):
+        """Test nonsensical tuning is rejected."""
+        storage = MemoryStorage()
+        window = timedelta(seconds=1)
+        with pytest.raises(ValueError):
+            AdaptiveRate(storage, "key", 10, window, min_limit=0)
+        with pytest.raises(ValueError):
+            AdaptiveRate(storage, "key", 10, window, min_limit=5, max_limit=4)
+        with pytest.raises(ValueError):
+            AdaptiveRate(storage, "key", 10, window, decrease=1.0)
+        with pytest.raises(ValueError):
+            AdaptiveRate(storage, "key", 10, window, increase=0)
@@ -0,0 +1,148 @@
+"""Tests for the aiohttp trace config."""
+
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from smartratelimit import AsyncRateLimiter, RateLimitExceeded
+from smartratelimit.aiohttp_trace import RateLimitTraceConfig
+
+
+async def limited(request):
+    """Reply with GitHub-style rate limit headers."""
+    return web.Response(
+        text="ok",
+        headers={
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": "9999999999",
+        },
+    )
+
+
+async def plain(request):
+    """Reply without rate limit headers."""
+    return web.Response(text="ok")
+
+
+async def moved(request):
+    """Redirect to the plain route."""
+    raise web.HTTPFound("/plain")
+
+
+async def download(request):
+    """Stream a body in chunks, pausing between them."""
+    response = web.StreamResponse()
+    await response.prepare(request)
+    for _ in range(3):
+        await response.write(b"x" * 1024)
+        await asyncio.sleep(0.01)
+    await response.write_eof()
+    return response
+
+
+@pytest.fixture
+async def server():
+    """Run a local API server for the duration of a test."""
+    app = web.Application()
+    app.router.add_get("/limited", limited)
+    app.router.add_get("/plain", plain)
+    app.router.add_get("/download", download)
+    app.router.add_get("/moved", moved)
+    server = TestServer(app)
+    await server.start_server()
+    yield server
+    await server.close()
+
+
+@pytest.mark.asyncio
+class TestRateLimitTraceConfig:
+    """Test RateLimitTraceConfig."""
+
+    async def test_limits_every_request(self, server):
+        """Test session requests take tokens and fail fast when out."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit(str(server.make_url("/")), limit=1, window="1m")
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/plain")) as response:
+                assert await response.text() == "ok"
+            with pytest.raises(RateLimitExceeded):
+                await session.get(server.make_url("/plain"))
+
+    async def test_redirects_are_limited(self, server):
+        """Test each redirect hop is a request of its own."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit(str(server.make_url("/")), limit=1, window="1m")
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            with pytest.raises(RateLimitExceeded):
+                await session.get(server.make_url("/moved"))
+
+    async def test_redirect_gives_back_slot(self, server):
+        """Test a redirect's concurrency slot is given back before the next hop."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit(str(server.make_url("/")), limit=2, window="1m")
+        limiter.set_concurrency(str(server.make_url("/")), 1)
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/moved")) as response:
+                assert await response.text() == "ok"
+            with pytest.raises(RateLimitExceeded):
+                await session.get(server.make_url("/plain"))
+
+    async def test_learns_limits_from_headers(self, server):
+        """Test headers update the limiter before the body is read."""
+        limiter = AsyncRateLimiter()
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/limited")) as response:
+                assert isinstance(response, aiohttp.ClientResponse)
+                assert limiter.get_status(str(server.make_url("/"))).limit == 5000
+
+    async def test_streamed_body_holds_slot(self, server):
+        """Test a concurrency slot is held until the streamed body is released."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_concurrency(str(server.make_url("/")), 1)
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/download")) as response:
+                with pytest.raises(RateLimitExceeded):
+                    await session.get(server.make_url("/limited"))
+                chunks = [chunk async for chunk in response.content.iter_chunked(1024)]
+                assert sum(len(chunk) for chunk in chunks) == 3 * 1024
+            await asyncio.sleep(0)
+
+            async with session.get(server.make_url("/limited")) as response:
+                assert response.status == 200
+
+    async def test_concurrency_refusal_refunds_tokens(self, server):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit(str(server.make_url("/")), limit=2, window="1h")
+        limiter.set_concurrency(str(server.make_url("/")), 1)
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/download")) as response:
+                with pytest.raises(RateLimitExceeded):
+                    await session.get(server.make_url("/plain"))
+                await response.read()
+            await asyncio.sleep(0)
+
+            async with session.get(server.make_url("/plain")) as response:
+                assert response.status == 200
+
+    async def test_trace_request_ctx_overrides(self, server):
+        """Test per-request settings come from trace_request_ctx."""
+        limiter = AsyncRateLimiter()
+        limiter.set_limit(str(server.make_url("/")), limit=5, window="1m")
+
+        async with aiohttp.ClientSession(trace_configs=[RateLimitTraceConfig(limiter)]) as session:
+            async with session.get(server.make_url("/plain"), trace_request_ctx={"cost": 5}):
+                pass
+            with pytest.raises(RateLimitExceeded):
+                await session.get(server.make_url("/plain"), trace_request_ctx={"max_wait": 0})
@@ -0,0 +1,174 @@
+"""Tests for rate limiting algorithms."""
+
+from collections import deque
+
+import pytest
+
+from smartratelimit.algorithms import (
+    GCRA,
+    GCRA_TOLERANCE,
+    SLIDING_LOG,
+    SLIDING_WINDOW,
+    TOKEN_BUCKET,
+    gcra_acquire,
+    gcra_tat_for_remaining,
+    sliding_log_acquire,
+    sliding_log_refund,
+    sliding_window_acquire,
+    validate_algorithm,
+)
+from smartratelimit.redis_scripts import GCRA_ACQUIRE
+
+
+class TestValidateAlgorithm:
+    """Test algorithm name validation."""
+
+    def test_known(self):
+        """Test known algorithms are accepted."""
+        assert validate_algorithm(TOKEN_BUCKET) == "token_bucket"
+        assert validate_algorithm(GCRA) == "gcra"
+        assert validate_algorithm(SLIDING_LOG) == "sliding_log"
+        assert validate_algorithm(SLIDING_WINDOW) == "sliding_window"
+
+    def test_unknown(self):
+        """Test unknown algorithms are rejected."""
+        with pytest.raises(ValueError):
+            validate_algorithm("leaky")
+
+
+class TestGCRA:
+    """Test the GCRA state transition."""
+
+    def test_allows_burst_of_limit(self):
+        """Test a fresh key allows ``limit`` requests at once."""
+        tat = None
+        for _ in range(5):
+            granted, wait, tat = gcra_acquire(tat, 100.0, 1, 5, 10.0)
+            assert granted is True
+            assert wait == 0.0
+
+        granted, wait, new_tat = gcra_acquire(tat, 100.0, 1, 5, 10.0)
+        assert granted is False
+        assert wait == pytest.approx(2.0)  # One emission interval
+        assert new_tat is None
+
+    def test_refills_at_emission_interval(self):
+        """Test one request becomes available per interval."""
+        tat = 110.0  # Fully used at now=100 with 5 per 10s
+        assert gcra_acquire(tat, 101.9, 1, 5, 10.0)[0] is False
+        assert gcra_acquire(tat, 102.0, 1, 5, 10.0)[0] is True
+
+    def test_reserve_within_max_wait(self):
+        """Test requests are booked ahead when the wait is acceptable."""
+        granted, wait, tat = gcra_acquire(110.0, 100.0, 1, 5, 10.0, max_wait=None)
+        assert granted is True
+        assert wait == pytest.approx(2.0)
+        assert tat == pytest.approx(112.0)
+
+    def test_idle_key_does_not_accumulate_credit(self):
+        """Test a long-idle TAT is clamped to now."""
+        granted, wait, tat = gcra_acquire(0.0, 100.0, 1, 5, 10.0)
+        assert granted is True
+        assert tat == pytest.approx(102.0)
+
+    def test_rounding_error_is_no_wait(self):
+        """Test a wait left by float rounding counts as none."""
+        tat = 108.0 + 1e-12  # One token free, give or take rounding
+        granted, wait, new_tat = gcra_acquire(tat, 100.0, 1, 5, 10.0, max_wait=0)
+        assert granted is True
+        assert wait == 0.0
+        assert new_tat == pytest.approx(110.0)
+
+    def test_redis_script_shares_tolerance(self):
+        """Test the Redis script ignores the same rounding as the Python step."""
+        assert GCRA_TOLERANCE == 1e-9
+        assert "key_wait > 1e-9" in GCRA_ACQUIRE
+
+    def test_zero_limit(self):
+        """Test a zero limit never grants."""
+        assert gcra_acquire(None, 100.0, 1, 0, 10.0) == (False, float("inf"), None)
+
+    def test_tat_for_remaining(self):
+        """Test resynchronising from a remaining count."""
+        tat = gcra_tat_for_remaining(100.0, 3, 5, 10.0)
+        assert tat == pytest.approx(104.0)
+        assert gcra_acquire(tat, 100.0, 1, 5, 10.0)[0] is True
+
+
+class TestSlidingLog:
+    """Test the sliding-window-log state transition."""
+
+    def test_no_boundary_burst(self):
+        """Test a full window blocks until the oldest request ages out."""
+        log = deque(maxlen=3)
+        for now in (100.0, 101.0, 102.0):
+            assert sliding_log_acquire(log, now, 1, 3, 10.0) == (True, 0.0)
+
+        granted, wait = sliding_log_acquire(log, 109.0, 1, 3, 10.0)
+        assert granted is False
+        assert wait == pytest.approx(1.0)
+        assert sliding_log_acquire(log, 110.0, 1, 3, 10.0) == (True, 0.0)
+        assert sliding_log_acquire(log, 110.5, 1, 3, 10.0)[0] is False
+
+    def test_booked_requests_are_logged_in_the_future(self):
+        """Test booked entries push later requests further out."""
+        log = deque([100.0, 101.0], maxlen=2)
+        assert sliding_log_acquire(log, 102.0, 1, 2, 10.0, max_wait=None) == (True, 8.0)
+        granted, wait = sliding_log_acquire(log, 102.0, 1, 2, 10.0, max_wait=None)
+        assert granted is True
+        assert wait == pytest.approx(9.0)
+        assert list(log) == [110.0, 111.0]
+
+    def test_memory_bounded(self):
+        """Test the log never grows past the limit."""
+        log = deque(maxlen=5)
+        for _ in range(100):
+            sliding_log_acquire(log, 100.0, 1, 5, 1.0, max_wait=None)
+        assert len(log) == 5
+
+    def test_cost_above_limit(self):
+        """Test a request larger than the limit never fits."""
+        assert sliding_log_acquire(deque(maxlen=2), 100.0, 3, 2, 10.0) == (False, float("inf"))
+
+    def test_fractional_refund(self):
+        """Test a fractional cost is refunded as whole entries, as it was charged."""
+        log = deque(maxlen=3)
+        assert sliding_log_acquire(log, 100.0, 1.5, 3, 10.0) == (True, 0.0)
+        assert len(log) == 2
+        sliding_log_refund(log, 1.5)
+        assert len(log) == 0
+
+
+class TestSlidingWindow:
+    """Test the sliding-window-counter state transition."""
+
+    def test_fills_current_window(self):
+        """Test ``limit`` requests fit in an empty window."""
+        state = None
+        for _ in range(4):
+            granted, wait, state = sliding_window_acquire(state, 105.0, 1, 4, 10.0)
+            assert granted is True
+        assert state == (10, 0.0, 4.0)
+
+        granted, wait, new_state = sliding_window_acquire(state, 105.0, 1, 4, 10.0)
+        assert granted is False
+        assert wait == pytest.approx(7.5)  # Rollover, then a quarter of the window
+        assert new_state is None
+
+    def test_previous_window_is_weighted(self):
+        """Test the previous window's count decays across the current one."""
+        state = (10, 0.0, 4.0)
+        # 2.5s into the next window: 4 * 0.75 = 3 estimated, one slot free
+        granted, wait, state = sliding_window_acquire(state, 112.5, 1, 4, 10.0)
+        assert granted is True
+        assert state == (11, 4.0, 1.0)
+
+        granted, wait, _ = sliding_window_acquire(state, 112.5, 1, 4, 10.0)
+        assert granted is False
+        assert wait == pytest.approx(2.5)
+
+    def test_stale_state_is_ignored(self):
+        """Test counts older than the previous window are dropped."""
+        granted, wait, state = sliding_window_acquire((1, 9.0, 9.0), 105.0, 1, 4, 10.0)
+        assert granted is True
+        assert state == (10, 0.0, 1.0)
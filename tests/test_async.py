@@ -42,6 +42,21 @@ class TestAsyncRateLimiter:
         assert status is not None
         assert status.limit == 50
 
+    async def test_set_limits(self):
+        """Test setting a composite limit from async limiter."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limits("api.example.com", {"1s": 5, "1m": 1})
+        rate_limit = limiter._storage.get_rate_limit("https://api.example.com")
+        assert rate_limit.limit == 5
+
+        await limiter._acquire(
+            "https://api.example.com", rate_limit, "https://api.example.com/test"
+        )
+        with pytest.raises(RateLimitExceeded):
+            await limiter._acquire(
+                "https://api.example.com", rate_limit, "https://api.example.com/test"
+            )
+
     async def test_clear(self):
         """Test clearing data from async limiter."""
         limiter = AsyncRateLimiter()
@@ -184,25 +199,106 @@ class TestAsyncRateLimiter:
         assert response.status_code == 200
 
     @pytest.mark.asyncio
-    async def test_wait_for_token(self):
-        """Test async token waiting."""
-        from smartratelimit.models import TokenBucket
-
+    async def test_acquire_waits(self):
+        """Test async acquire sleeps for a booked token."""
         limiter = AsyncRateLimiter()
-        bucket = TokenBucket(capacity=1.0, tokens=0.0, refill_rate=1.0)
+        limiter.set_limit("api.example.com", limit=1, window="1m")
+        rate_limit = limiter._storage.get_rate_limit("https://api.example.com")
 
         with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
-            await limiter._wait_for_token(bucket, "https://api.example.com/test")
+            await limiter._acquire(
+                "https://api.example.com", rate_limit, "https://api.example.com/test"
+            )
+            assert not mock_sleep.called
+            await limiter._acquire(
+                "https://api.example.com", rate_limit, "https://api.example.com/test"
+            )
             assert mock_sleep.called
 
     @pytest.mark.asyncio
-    async def test_wait_for_token_raise_on_limit(self):
-        """Test async token waiting with raise_on_limit."""
-        from smartratelimit.models import TokenBucket
-
+    async def test_acquire_raise_on_limit(self):
+        """Test async acquire with raise_on_limit."""
         limiter = AsyncRateLimiter(raise_on_limit=True)
-        bucket = TokenBucket(capacity=1.0, tokens=0.0, refill_rate=1.0)
+        limiter.set_limit("api.example.com", limit=1, window="1m")
+        rate_limit = limiter._storage.get_rate_limit("https://api.example.com")
 
+        await limiter._acquire(
+            "https://api.example.com", rate_limit, "https://api.example.com/test"
+        )
         with pytest.raises(RateLimitExceeded):
-            await limiter._wait_for_token(bucket, "https://api.example.com/test")
+            await limiter._acquire(
+                "https://api.example.com", rate_limit, "https://api.example.com/test"
+            )
+
+    @pytest.mark.asyncio
+    async def test_max_wait_and_try_acquire(self):
+        """Test max_wait fails fast and try_acquire never waits (async)."""
+        limiter = AsyncRateLimiter()
+        limiter.set_limit("api.example.com", limit=1, window="1m")
 
+        assert await limiter.try_acquire("https://api.example.com/test") == (True, 0.0)
+        granted, wait = await limiter.try_acquire("https://api.example.com/test")
+        assert not granted
+        assert wait > 50
+
+        mock_client = AsyncMock()
+        with patch("asyncio.sleep", new_callable=AsyncMock) as mock_sleep:
+            with pytest.raises(RateLimitExceeded):
+                await limiter.arequest_httpx(
+                    mock_client, "GET", "https://api.example.com/test", max_wait=1.0
+                )
+            assert not mock_sleep.called
+        assert not mock_client.request.called
+
+    @pytest.mark.asyncio
+    async def test_set_concurrency(self):
+        """Test async requests past the concurrency cap wait for a slot."""
+        limiter = AsyncRateLimiter()
+        limiter.set_concurrency("api.example.com", 2)
+        in_flight = []
+        most = []
+
+        async def request(method, url, **kwargs):
+            in_flight.append(url)
+            most.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(url)
+            return Mock(url=url, status_code=200, headers={})
+
+        mock_client = Mock()
+        mock_client.request = request
+        await asyncio.gather(
+            *(
+                limiter.arequest_httpx(mock_client, "GET", "https://api.example.com/test")
+                for _ in range(6)
+            )
+        )
+        assert max(most) == 2
+
+        # Both slots held elsewhere: the request gives up at its deadline
+        limit = limiter._concurrency["https://api.example.com"]
+        for _ in range(2):
+            await limit.acquire_async()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.arequest_httpx(
+                mock_client, "GET", "https://api.example.com/test", max_wait=0.05
+            )
+
+    @pytest.mark.asyncio
+    async def test_concurrency_refusal_refunds_tokens(self):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=1, window="1h")
+        limiter.set_concurrency("api.example.com", 1)
+        limit = limiter._concurrency["https://api.example.com"]
+        slot = await limit.acquire_async()
+
+        mock_client = Mock()
+        mock_client.request = AsyncMock(
+            return_value=Mock(url="https://api.example.com/test", status_code=200, headers={})
+        )
+        with pytest.raises(RateLimitExceeded):
+            await limiter.arequest_httpx(mock_client, "GET", "https://api.example.com/test")
+        await limit.release_async(slot)
+        await limiter.arequest_httpx(mock_client, "GET", "https://api.example.com/test")
+        assert mock_client.request.call_count == 1
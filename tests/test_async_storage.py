@@ -0,0 +1,219 @@
+"""Tests for async storage backends."""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from smartratelimit import AsyncRateLimiter
+from smartratelimit.async_storage import (
+    AsyncRedisStorage,
+    AsyncStorageBackend,
+    AsyncSQLiteStorage,
+    InlineStorage,
+    ThreadedStorage,
+)
+from smartratelimit.models import RateLimit
+from smartratelimit.storage import MemoryStorage, SQLiteStorage
+
+
+def redis_available():
+    """Check if Redis is available."""
+    try:
+        import redis
+        client = redis.from_url("redis://localhost:6379/0")
+        client.ping()
+        return True
+    except (ImportError, Exception):
+        return False
+
+
+def make_rate_limit(endpoint="https://api.example.com", limit=2):
+    """Build a rate limit with a one minute window."""
+    return RateLimit(
+        endpoint=endpoint,
+        limit=limit,
+        remaining=limit,
+        reset_time=datetime.utcnow() + timedelta(minutes=1),
+        window=timedelta(minutes=1),
+    )
+
+
+@pytest.mark.asyncio
+class TestThreadedStorage:
+    """Test backends that run blocking storage off the event loop."""
+
+    @pytest.mark.parametrize(
+        "make_storage",
+        [
+            lambda: ThreadedStorage(MemoryStorage()),
+            lambda: AsyncSQLiteStorage(":memory:"),
+            lambda: InlineStorage(MemoryStorage()),
+        ],
+    )
+    async def test_operations(self, make_storage):
+        """Test every operation reaches the wrapped backend."""
+        storage = make_storage()
+        limits = [("key", 2, timedelta(minutes=1))]
+
+        await storage.set_rate_limit("https://api.example.com", make_rate_limit())
+        stored = await storage.get_rate_limit("https://api.example.com")
+        assert stored.limit == 2
+        assert storage.sync_backend.get_rate_limit("https://api.example.com").limit == 2
+
+        assert (await storage.acquire_many(limits, 2))[0]
+        assert not (await storage.acquire_many(limits, 1))[0]
+        await storage.refund(limits, 1)
+        assert (await storage.acquire_many(limits, 1))[0]
+
+        await storage.set_remaining("key", 2, 2, timedelta(minutes=1))
+        assert (await storage.acquire_many(limits, 2))[0]
+
+        slot = await storage.acquire_slot("key:concurrency", 1, 60.0)
+        assert slot is not None
+        assert await storage.acquire_slot("key:concurrency", 1, 60.0) is None
+        await storage.release_slot("key:concurrency", slot)
+        assert await storage.acquire_slot("key:concurrency", 1, 60.0) is not None
+
+        assert await storage.adapt_rate("key:adaptive", 10.0) == 10.0
+        assert await storage.adapt_rate("key:adaptive", 10.0, factor=0.5) == 5.0
+        await storage.close()
+
+    async def test_event_loop_stays_responsive(self):
+        """Test a slow backend call does not hold up other coroutines."""
+        release = threading.Event()
+
+        class SlowStorage(MemoryStorage):
+            def get_rate_limit(self, endpoint):
+                release.wait(1.0)
+                return super().get_rate_limit(endpoint)
+
+        storage = ThreadedStorage(SlowStorage())
+        lookup = asyncio.ensure_future(storage.get_rate_limit("https://api.example.com"))
+        await asyncio.sleep(0.01)
+        # The loop got here while the lookup was still blocked
+        assert not lookup.done()
+        release.set()
+        assert await lookup is None
+        await storage.close()
+
+
+@pytest.mark.asyncio
+class TestAsyncRateLimiterStorage:
+    """Test AsyncRateLimiter awaiting its storage."""
+
+    async def test_memory_runs_inline(self):
+        """Test in-memory storage skips the thread pool."""
+        limiter = AsyncRateLimiter()
+        assert isinstance(limiter._async_storage, InlineStorage)
+        await limiter.aclose()
+
+    async def test_sqlite_runs_on_thread(self, tmp_path):
+        """Test SQLite storage is awaited through a worker thread."""
+        async with AsyncRateLimiter(storage=f"sqlite:///{tmp_path / 'limits.db'}") as limiter:
+            assert isinstance(limiter._async_storage, ThreadedStorage)
+            limiter.set_limit("api.example.com", limit=2, window="1m")
+
+            assert (await limiter.try_acquire("https://api.example.com/a"))[0]
+            assert (await limiter.try_acquire("https://api.example.com/b"))[0]
+            granted, wait = await limiter.try_acquire("https://api.example.com/c")
+            assert not granted
+            assert wait > 0
+
+    async def test_async_backend_instance(self, tmp_path):
+        """Test an async backend shares its state with configuration calls."""
+        storage = AsyncSQLiteStorage(str(tmp_path / "limits.db"))
+        async with AsyncRateLimiter(storage=storage) as limiter:
+            assert limiter._async_storage is storage
+            assert isinstance(limiter._storage, SQLiteStorage)
+            limiter.set_limit("api.example.com", limit=1, window="1m")
+
+            assert (await limiter.try_acquire("https://api.example.com"))[0]
+            assert not (await limiter.try_acquire("https://api.example.com"))[0]
+
+    async def test_lease_refill_off_event_loop(self):
+        """Test a leased endpoint refilling from slow storage does not stall the loop."""
+        release = threading.Event()
+
+        class SlowStorage(MemoryStorage):
+            def acquire_many(self, *args, **kwargs):
+                release.wait(1.0)
+                return super().acquire_many(*args, **kwargs)
+
+        async with AsyncRateLimiter(storage=ThreadedStorage(SlowStorage())) as limiter:
+            limiter.set_limit("api.example.com", limit=10, window="1m")
+            limiter.set_lease("api.example.com", lease_seconds=60, max_share=0.5)
+
+            take = asyncio.ensure_future(limiter.try_acquire("https://api.example.com"))
+            await asyncio.sleep(0.01)
+            # The loop got here while the refill was still blocked
+            assert not take.done()
+            release.set()
+            assert (await take)[0]
+
+    async def test_aclose_off_event_loop(self):
+        """Test closing gives back leased tokens without stalling the loop."""
+        release = threading.Event()
+
+        class SlowStorage(MemoryStorage):
+            def refund(self, *args, **kwargs):
+                release.wait(1.0)
+                return super().refund(*args, **kwargs)
+
+        storage = SlowStorage()
+        limiter = AsyncRateLimiter(storage=ThreadedStorage(storage))
+        limiter.set_limit("api.example.com", limit=10, window="1m")
+        limiter.set_lease("api.example.com", lease_seconds=60, max_share=0.5)
+        for _ in range(2):
+            assert (await limiter.try_acquire("https://api.example.com"))[0]
+
+        closing = asyncio.ensure_future(limiter.aclose())
+        await asyncio.sleep(0.01)
+        # The loop got here while the lease refund was still blocked
+        assert not closing.done()
+        release.set()
+        await closing
+        assert storage.acquire_many(
+            limiter._sync_limiter._bucket_limits(
+                "https://api.example.com", storage.get_rate_limit("https://api.example.com")
+            ),
+            8,
+        )[0]
+
+    async def test_run_sync_default(self):
+        """Test backends without threads of their own run blocking calls on the loop's executor."""
+        caller = threading.current_thread()
+        storage = InlineStorage(MemoryStorage())
+        assert await storage.run_sync(threading.current_thread) is caller
+        assert await AsyncStorageBackend.run_sync(storage, threading.current_thread) is not caller
+
+
+@pytest.mark.asyncio
+@pytest.mark.skipif(not redis_available(), reason="Redis not available")
+class TestAsyncRedisStorage:
+    """Test AsyncRedisStorage."""
+
+    async def test_shares_state_with_sync_storage(self):
+        """Test async and sync workers see the same limiter state."""
+        storage = AsyncRedisStorage("redis://localhost:6379/0", key_prefix="test:async:")
+        storage.sync_backend.clear()
+        limits = [("key", 2, timedelta(minutes=1))]
+
+        await storage.set_rate_limit("https://api.example.com", make_rate_limit())
+        assert storage.sync_backend.get_rate_limit("https://api.example.com").limit == 2
+
+        assert (await storage.acquire_many(limits, 1))[0]
+        assert storage.sync_backend.acquire_many(limits, 1)[0]
+        assert not (await storage.acquire_many(limits, 1))[0]
+
+        slot = await storage.acquire_slot("key:concurrency", 1, 60.0)
+        assert slot is not None
+        assert storage.sync_backend.acquire_slot("key:concurrency", 1, 60.0) is None
+        await storage.release_slot("key:concurrency", slot)
+
+        assert await storage.adapt_rate("key:adaptive", 10.0) == 10.0
+        assert storage.sync_backend.adapt_rate("key:adaptive", 10.0, factor=0.5) == 5.0
+
+        storage.sync_backend.clear()
+        await storage.close()
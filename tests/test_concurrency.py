@@ -0,0 +1,94 @@
+"""Tests for concurrency limits."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from smartratelimit.concurrency import ConcurrencyLimit
+from smartratelimit.storage import MemoryStorage, SQLiteStorage
+
+
+class TestConcurrencyLimit:
+    """Test ConcurrencyLimit."""
+
+    def test_caps_threads_in_flight(self):
+        """Test no more than the limit of threads hold a slot at once."""
+        limit = ConcurrencyLimit(MemoryStorage(), "key:concurrency", 3)
+        in_flight = []
+        most = []
+        lock = threading.Lock()
+
+        def worker():
+            slot = limit.acquire()
+            with lock:
+                in_flight.append(slot)
+                most.append(len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.remove(slot)
+            limit.release(slot)
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert max(most) == 3
+        assert not in_flight
+
+    def test_shared_across_limiters(self):
+        """Test slots held through one storage count against every process."""
+        storage = SQLiteStorage(":memory:")
+        first = ConcurrencyLimit(storage, "key:concurrency", 1)
+        second = ConcurrencyLimit(storage, "key:concurrency", 1)
+
+        slot = first.acquire()
+        assert slot is not None
+        assert second.acquire(timeout=0.1) is None
+
+        first.release(slot)
+        assert second.acquire(timeout=0.1) is not None
+
+    def test_dead_holder_expires(self):
+        """Test a slot that is never released frees up after its lease."""
+        storage = MemoryStorage()
+        ConcurrencyLimit(storage, "key:concurrency", 1, lease_seconds=0.1).acquire()
+
+        limit = ConcurrencyLimit(storage, "key:concurrency", 1, lease_seconds=0.1)
+        started = time.monotonic()
+        assert limit.acquire(timeout=1.0) is not None
+        assert time.monotonic() - started >= 0.05
+
+    def test_invalid_arguments(self):
+        """Test limits below one slot and non-positive leases are rejected."""
+        with pytest.raises(ValueError):
+            ConcurrencyLimit(MemoryStorage(), "key", 0)
+        with pytest.raises(ValueError):
+            ConcurrencyLimit(MemoryStorage(), "key", 1, lease_seconds=0)
+
+    @pytest.mark.asyncio
+    async def test_async_caps_in_flight(self):
+        """Test coroutines wait for a slot without blocking the event loop."""
+        limit = ConcurrencyLimit(MemoryStorage(), "key:concurrency", 2)
+        in_flight = []
+        most = []
+
+        async def worker():
+            slot = await limit.acquire_async()
+            in_flight.append(slot)
+            most.append(len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.remove(slot)
+            await limit.release_async(slot)
+
+        await asyncio.gather(*(worker() for _ in range(6)))
+        assert max(most) == 2
+
+        slots = [await limit.acquire_async(timeout=0), await limit.acquire_async()]
+        assert await limit.acquire_async(timeout=0.05) is None
+        assert await limit.acquire_async(timeout=0) is None
+        for slot in slots:
+            await limit.release_async(slot)
@@ -1,5 +1,6 @@
 """Tests for core RateLimiter class."""
 
+import time
 from datetime import datetime, timedelta
 from unittest.mock import Mock, patch
 
@@ -8,7 +9,7 @@ import requests
 
 from smartratelimit import RateLimiter, RateLimitExceeded
 from smartratelimit.models import RateLimit
-from smartratelimit.storage import MemoryStorage
+from smartratelimit.storage import CachedStorage, MemoryStorage
 
 
 class TestRateLimiter:
@@ -31,12 +32,310 @@ class TestRateLimiter:
         limiter = RateLimiter(headers_map=headers_map)
         assert limiter._detector.custom_headers_map == headers_map
 
+    def test_init_with_algorithm(self):
+        """Test selecting the GCRA algorithm."""
+        limiter = RateLimiter(algorithm="gcra")
+        assert limiter._algorithm == "gcra"
+
+        with pytest.raises(ValueError):
+            RateLimiter(algorithm="leaky")
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_request_raises_on_limit_gcra(self, mock_request):
+        """Test GCRA limits requests like the token bucket does."""
+        limiter = RateLimiter(raise_on_limit=True, algorithm="gcra")
+        limiter.set_limit("api.example.com", limit=2, window="1m")
+
+        mock_response = Mock()
+        mock_response.url = "https://api.example.com/test"
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_request.return_value = mock_response
+
+        limiter.request("GET", "https://api.example.com/test")
+        limiter.request("GET", "https://api.example.com/test")
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.example.com/test")
+
+    def test_set_limit_with_algorithm(self):
+        """Test selecting an algorithm per endpoint."""
+        limiter = RateLimiter(
+            default_limits={"requests_per_second": 5, "algorithm": "sliding_window"}
+        )
+        limiter.set_limit("api.example.com", limit=10, window="1m", algorithm="sliding_log")
+
+        assert limiter._algorithm_for("https://api.example.com") == "sliding_log"
+        assert limiter._algorithm_for("https://other.example.com") == "token_bucket"
+
+        limiter._apply_default_limits("https://other.example.com/path")
+        assert limiter._algorithm_for("https://other.example.com") == "sliding_window"
+
+        with pytest.raises(ValueError):
+            limiter.set_limit("api.example.com", limit=10, algorithm="leaky")
+        with pytest.raises(ValueError):
+            RateLimiter(default_limits={"algorithm": "leaky"})
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_request_enforces_all_default_windows(self, mock_request):
+        """Test every default limit window is enforced, not just the first."""
+        mock_response = Mock()
+        mock_response.url = "https://api.example.com/test"
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_request.return_value = mock_response
+
+        limiter = RateLimiter(
+            default_limits={"requests_per_second": 10, "requests_per_minute": 2},
+            raise_on_limit=True,
+        )
+        limiter.request("GET", "https://api.example.com/test")
+        limiter.request("GET", "https://api.example.com/test")
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.example.com/test")
+
+        status = limiter.get_status("api.example.com")
+        assert status.limit == 10
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_set_limits(self, mock_request):
+        """Test a composite limit and resync of a detected window."""
+        mock_response = Mock()
+        mock_response.url = "https://api.example.com/test"
+        mock_response.status_code = 200
+        mock_response.headers = {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(int(datetime.utcnow().timestamp()) + 3600),
+        }
+        mock_request.return_value = mock_response
+
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limits("api.example.com", {"1s": 5, "1d": 1000})
+        limits = limiter._bucket_limits(
+            "https://api.example.com", limiter._storage.get_rate_limit("https://api.example.com")
+        )
+        assert [limit for _, limit, _ in limits] == [5, 1000]
+
+        # The detected hourly quota is enforced alongside the configured windows
+        limiter.request("GET", "https://api.example.com/test")
+        limits = limiter._bucket_limits(
+            "https://api.example.com", limiter._storage.get_rate_limit("https://api.example.com")
+        )
+        assert [limit for _, limit, _ in limits] == [5000, 5, 1000]
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.example.com/test")
+
+        limiter.set_limit("api.example.com", limit=10, window="1m")
+        assert "https://api.example.com" not in limiter._composite_limits
+
+        with pytest.raises(ValueError):
+            limiter.set_limits("api.example.com", {})
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_routes_have_separate_limits(self, mock_request):
+        """Test registered routes get their own buckets and status."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+
+        limiter = RateLimiter(
+            raise_on_limit=True,
+            routes={"api.github.com": ["/search", "/repos/{owner}/{repo}/issues"]},
+        )
+        limiter.set_limit("api.github.com/search", limit=1, window="1m")
+        limiter.set_limit("api.github.com/repos/{owner}/{repo}/issues", limit=2, window="1m")
+
+        assert (
+            limiter._get_endpoint_key("https://api.github.com/search/code?q=x")
+            == "https://api.github.com/search"
+        )
+        assert limiter._get_endpoint_key("https://api.github.com/users") == "https://api.github.com"
+
+        limiter.request("GET", "https://api.github.com/search/code")
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.github.com/search/issues")
+
+        # Issues on any repository share the issues quota, not the search one
+        limiter.request("GET", "https://api.github.com/repos/psf/requests/issues")
+        limiter.request("GET", "https://api.github.com/repos/pallets/flask/issues")
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.github.com/repos/psf/requests/issues")
+
+        assert limiter.get_status("https://api.github.com/search/code").limit == 1
+        assert limiter.get_status("api.github.com/repos/a/b/issues").limit == 2
+        assert limiter.get_status("api.github.com") is None
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_request_cost_reconciled(self, mock_request):
+        """Test weighted costs are pre-charged and settled from the response."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}, used=kwargs["json"]["used"]
+        )
+        limiter = RateLimiter(
+            raise_on_limit=True,
+            cost=lambda method, url, kwargs: kwargs["json"]["estimate"],
+            actual_cost=lambda response: response.used,
+        )
+        limiter.set_limit("api.example.com", limit=100, window="1h")
+        url = "https://api.example.com/v1/completions"
+
+        # Estimated 60, used 10: the 50 unused tokens are refunded
+        limiter.request("POST", url, json={"estimate": 60, "used": 10})
+        limiter.request("POST", url, json={"estimate": 60, "used": 60})
+
+        # Estimated 10, used 25: the extra 15 are debited, leaving 5
+        limiter.request("POST", url, json={"estimate": 10, "used": 25})
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("POST", url, json={"estimate": 6, "used": 6})
+        limiter.request("POST", url, cost=5, actual_cost=lambda response: None, json={"used": 0})
+
+        with pytest.raises(ValueError):
+            limiter.request("POST", url, cost=-1, json={"used": 0})
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_request_waits_on_binding_bucket(self, mock_request):
+        """Test OpenAI-style token budgets are enforced next to the request limit."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url,
+            status_code=200,
+            headers={
+                "x-ratelimit-limit-requests": "500",
+                "x-ratelimit-remaining-requests": "499",
+                "x-ratelimit-reset-requests": "120ms",
+                "x-ratelimit-limit-tokens": "1000",
+                "x-ratelimit-remaining-tokens": "900",
+                "x-ratelimit-reset-tokens": "6s",
+            },
+        )
+        limiter = RateLimiter(raise_on_limit=True)
+        url = "https://api.openai.com/v1/chat/completions"
+
+        limiter.request("POST", url, cost=100)
+        assert limiter._token_limits["https://api.openai.com"].limit == 1000
+
+        # Plenty of requests left, but the token budget binds
+        limiter.request("POST", url, cost=900)
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("POST", url, cost=950)
+
+        # The refused request took nothing from the request bucket either
+        assert limiter._storage.get_token_bucket("https://api.openai.com:default").tokens >= 499
+
+        limiter.clear("api.openai.com")
+        assert limiter._token_limits == {}
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_set_lease(self, mock_request):
+        """Test leased endpoints still enforce the limit and return tokens on exit."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+
+        with RateLimiter(raise_on_limit=True) as limiter:
+            limiter.set_limit("api.example.com", limit=10, window="1h")
+            limiter.set_lease("api.example.com", lease_seconds=60, max_share=1.0)
+            for _ in range(10):
+                limiter.request("GET", "https://api.example.com/test")
+            with pytest.raises(RateLimitExceeded):
+                limiter.request("GET", "https://api.example.com/test")
+
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=10, window="1h")
+        limiter.set_lease("api.example.com", lease_seconds=60, max_share=0.5)
+        limiter.request("GET", "https://api.example.com/test")
+        limiter.request("GET", "https://api.example.com/test")
+        limiter.close()
+        bucket = limiter._storage.get_token_bucket("https://api.example.com:default")
+        assert 8 <= bucket.tokens < 8.01
+
+        limiter.set_lease("api.example.com", lease_seconds=None)
+        assert limiter._lease_policies == {}
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_leased_cost_reconciled(self, mock_request):
+        """Test cost differences on a leased endpoint are settled with the lease."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+        limiter = RateLimiter(raise_on_limit=True, actual_cost=lambda response: 1)
+        limiter.set_limit("api.example.com", limit=100, window="1h")
+        limiter.set_lease("api.example.com", lease_seconds=60, max_share=0.5)
+        url = "https://api.example.com/test"
+
+        limiter.request("GET", url)
+        with patch.object(limiter._storage, "refund") as mock_refund:
+            # Estimated 10, used 1: the 9 unused tokens go back to the lease
+            limiter.request("GET", url, cost=10)
+            assert not mock_refund.called
+        limiter.close()
+        bucket = limiter._storage.get_token_bucket("https://api.example.com:default")
+        assert 98 <= bucket.tokens < 98.01
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_cached_storage(self, mock_request):
+        """Test a storage instance is used as given and flushed on close."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, ttl=60, flush_interval=60)
+
+        with RateLimiter(storage=storage) as limiter:
+            assert limiter._storage is storage
+            limiter.set_limit("api.example.com", limit=10, window="1m")
+            limiter.request("GET", "https://api.example.com/test")
+            assert backend.get_rate_limit("https://api.example.com") is None
+        assert backend.get_rate_limit("https://api.example.com").limit == 10
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_no_limit_cache(self, mock_request):
+        """Test endpoints without limits skip storage until a limit is recorded."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+        limiter = RateLimiter(raise_on_limit=True)
+
+        with patch.object(
+            limiter._storage, "get_rate_limit", wraps=limiter._storage.get_rate_limit
+        ) as mock_get:
+            for _ in range(5):
+                limiter.request("GET", "https://api.example.com/test")
+            assert mock_get.call_count == 1
+
+        # Recording a limit takes effect on the next request
+        limiter.set_limit("api.example.com", limit=1, window="1m")
+        limiter.request("GET", "https://api.example.com/test")
+        with pytest.raises(RateLimitExceeded):
+            limiter.request("GET", "https://api.example.com/test")
+
+        limiter = RateLimiter(no_limit_ttl=0)
+        limiter.request("GET", "https://api.example.com/test")
+        assert limiter._no_limits == {}
+
     def test_get_endpoint_key(self):
         """Test endpoint key extraction."""
         limiter = RateLimiter()
         key = limiter._get_endpoint_key("https://api.example.com/v1/users")
         assert key == "https://api.example.com"
 
+    def test_endpoint_resolution_cache(self):
+        """Test endpoint keys are memoised per origin and reset by add_route."""
+        limiter = RateLimiter()
+        context = limiter._request_context("https://API.example.com/v1/users?page=1")
+        assert context.host == "api.example.com"
+        assert context.bucket_key("tokens") == "https://API.example.com:tokens"
+
+        # Paths, query strings and fragments do not take separate cache entries
+        assert limiter._request_context("https://API.example.com/v1/users?page=2#top") is context
+        assert limiter._request_context("https://API.example.com/v1/users/42") is context
+        assert limiter._resolve_origin.cache_info().currsize == 1
+
+        limiter.add_route("API.example.com", "/v1/users")
+        assert limiter._get_endpoint_key("https://API.example.com/v1/users?page=1") == (
+            "https://API.example.com/v1/users"
+        )
+        assert limiter._get_endpoint_key("https://API.example.com/v2") == "https://API.example.com"
+
     def test_set_limit(self):
         """Test manually setting rate limit."""
         limiter = RateLimiter()
@@ -170,6 +469,171 @@ class TestRateLimiter:
         with pytest.raises(RateLimitExceeded):
             limiter.request("GET", "https://api.example.com/test")
 
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_request_max_wait(self, mock_request):
+        """Test max_wait fails fast instead of sleeping past the deadline."""
+        mock_request.side_effect = lambda method, url, **kwargs: Mock(
+            url=url, status_code=200, headers={}
+        )
+        limiter = RateLimiter()
+        limiter.set_limit("api.example.com", limit=60, window="1m")
+        for _ in range(60):
+            limiter.request("GET", "https://api.example.com/test")
+
+        with patch("smartratelimit.core.time.sleep") as mock_sleep:
+            with pytest.raises(RateLimitExceeded):
+                limiter.request("GET", "https://api.example.com/test", max_wait=0.5)
+            assert not mock_sleep.called
+
+            limiter.request("GET", "https://api.example.com/test", max_wait=2.0)
+            assert mock_sleep.called
+        assert mock_request.call_count == 61
+
+        # A 429 asking for longer than the deadline is returned, not retried
+        mock_request.side_effect = None
+        mock_request.return_value = Mock(
+            url="https://other.example.com/test", status_code=429, headers={"Retry-After": "30"}
+        )
+        with patch("smartratelimit.core.time.sleep") as mock_sleep:
+            response = limiter.request("GET", "https://other.example.com/test", max_wait=5)
+        assert response.status_code == 429
+        assert not mock_sleep.called
+
+    def test_session_per_thread(self):
+        """Test each thread sends requests through its own session."""
+        import threading
+
+        limiter = RateLimiter()
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(limiter._session))
+        thread.start()
+        thread.join()
+
+        assert limiter._session is limiter._session
+        assert sessions[0] is not limiter._session
+
+    def test_set_concurrency(self):
+        """Test requests past the concurrency cap wait for a slot or raise."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_concurrency("api.example.com", 1)
+        limit = limiter._concurrency["https://api.example.com"]
+        slot = limit.acquire()
+
+        with patch.object(requests.Session, "request") as mock_request:
+            mock_request.return_value = Mock(
+                url="https://api.example.com/test", status_code=200, headers={}
+            )
+            with pytest.raises(RateLimitExceeded):
+                limiter.request("GET", "https://api.example.com/test")
+            assert not mock_request.called
+
+            limit.release(slot)
+            limiter.request("GET", "https://api.example.com/test")
+            assert mock_request.call_count == 1
+        # The slot is given back once the request is done
+        assert limit.acquire(timeout=0) is not None
+
+        limiter.set_concurrency("api.example.com", None)
+        assert "https://api.example.com" not in limiter._concurrency
+        with pytest.raises(ValueError):
+            limiter.set_concurrency("api.example.com", 0)
+
+    def test_concurrency_refusal_refunds_tokens(self):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=1, window="1h")
+        limiter.set_concurrency("api.example.com", 1)
+        limit = limiter._concurrency["https://api.example.com"]
+        slot = limit.acquire()
+
+        with patch.object(requests.Session, "request") as mock_request:
+            mock_request.return_value = Mock(
+                url="https://api.example.com/test", status_code=200, headers={}
+            )
+            with pytest.raises(RateLimitExceeded):
+                limiter.request("GET", "https://api.example.com/test")
+            limit.release(slot)
+            limiter.request("GET", "https://api.example.com/test")
+            assert mock_request.call_count == 1
+
+    @patch("smartratelimit.core.requests.Session.request")
+    def test_set_adaptive(self, mock_request):
+        """Test header-less responses tune the stored limit up and down."""
+        limiter = RateLimiter()
+        limiter.set_adaptive("api.example.com", 4, window="1s")
+        assert limiter.get_status("api.example.com").limit == 4
+
+        mock_request.return_value = Mock(
+            url="https://api.example.com/test", status_code=200, headers={}
+        )
+        with patch("smartratelimit.core.time.sleep"):
+            for _ in range(4):
+                limiter.request("GET", "https://api.example.com/test")
+        # Increases are written once the window is over
+        assert limiter.get_status("api.example.com").limit == 4
+        with patch("smartratelimit.adaptive.time.monotonic", return_value=time.monotonic() + 1):
+            limiter.request("GET", "https://api.example.com/test")
+        assert limiter.get_status("api.example.com").limit == 5
+
+        mock_request.return_value = Mock(
+            url="https://api.example.com/test", status_code=429, headers={}
+        )
+        limiter.request("GET", "https://api.example.com/test")
+        assert limiter.get_status("api.example.com").limit == 2
+
+        limiter.set_adaptive("api.example.com", None)
+        mock_request.return_value = Mock(
+            url="https://api.example.com/test", status_code=200, headers={}
+        )
+        with patch("smartratelimit.core.time.sleep"):
+            for _ in range(4):
+                limiter.request("GET", "https://api.example.com/test")
+        assert limiter.get_status("api.example.com").limit == 2
+
+    def test_set_pacing(self):
+        """Test paced requests go out at an even interval, not in a burst."""
+        limiter = RateLimiter()
+        limiter.set_limit("api.example.com", limit=3600, window="1h")
+        limiter.set_pacing("api.example.com", burst=2)
+
+        assert limiter.try_acquire("https://api.example.com/x")[0]
+        assert limiter.try_acquire("https://api.example.com/x")[0]
+        granted, wait = limiter.try_acquire("https://api.example.com/x")
+        assert not granted
+        assert wait == pytest.approx(1.0, abs=0.01)
+
+        # Server-reported quota refills the bucket, but only up to the burst
+        limiter._set_remaining("https://api.example.com", 3000, 3600, timedelta(hours=1))
+        assert limiter.try_acquire("https://api.example.com/x", cost=2)[0]
+        assert not limiter.try_acquire("https://api.example.com/x")[0]
+        limiter._set_remaining("https://api.example.com", 0, 3600, timedelta(hours=1))
+        assert limiter.try_acquire("https://api.example.com/x")[1] == pytest.approx(1.0, abs=0.01)
+
+        limiter.set_pacing("api.example.com", None)
+        rate_limit = limiter._storage.get_rate_limit("https://api.example.com")
+        assert limiter._bucket_limits("https://api.example.com", rate_limit) == [
+            ("https://api.example.com:default", 3600, timedelta(hours=1))
+        ]
+        with pytest.raises(ValueError):
+            limiter.set_pacing("api.example.com", 0)
+
+    def test_try_acquire(self):
+        """Test try_acquire takes available tokens and never blocks."""
+        limiter = RateLimiter()
+        assert limiter.try_acquire("https://unlimited.example.com/x") == (True, 0.0)
+
+        limiter.set_limit("api.example.com", limit=10, window="10s")
+        assert limiter.try_acquire("https://api.example.com/x", cost=10) == (True, 0.0)
+
+        with patch("smartratelimit.core.time.sleep") as mock_sleep:
+            granted, wait = limiter.try_acquire("https://api.example.com/x", cost=2)
+        assert not granted
+        assert wait == pytest.approx(2.0, abs=0.01)
+        assert not mock_sleep.called
+
+        with pytest.raises(ValueError):
+            limiter.try_acquire("https://api.example.com/x", cost=-1)
+
     @patch("smartratelimit.core.requests.Session.request")
     def test_request_429_handling(self, mock_request):
         """Test handling of 429 responses."""
@@ -200,11 +664,17 @@ class TestRateLimiter:
         session = requests.Session()
         limiter = RateLimiter()
 
-        limiter.wrap_session(session)
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=32))
+
+        assert limiter.wrap_session(session) is session
+
+        # Verify the session sends through a rate-limited adapter
+        from smartratelimit.requests_adapter import RateLimitedAdapter
 
-        # Verify session.request is wrapped
-        assert hasattr(session, "request")
-        assert callable(session.request)
+        adapter = session.get_adapter("https://api.example.com")
+        assert isinstance(adapter, RateLimitedAdapter)
+        assert adapter._pool_maxsize == 32
+        assert isinstance(session.get_adapter("http://api.example.com"), RateLimitedAdapter)
 
     def test_parse_window(self):
         """Test window parsing."""
@@ -5,7 +5,7 @@ from unittest.mock import Mock
 
 import pytest
 
-from smartratelimit.detector import RateLimitDetector
+from smartratelimit.detector import RateLimitDetector, parse_duration
 
 
 class TestRateLimitDetector:
@@ -119,3 +119,67 @@ class TestRateLimitDetector:
         # Allow some tolerance for timing
         assert 25 < window.total_seconds() < 35
 
+
+    def test_parse_reset_time_duration(self):
+        """Test parsing Go-style duration reset times."""
+        detector = RateLimitDetector()
+
+        _, window = detector._parse_reset_time("6m0s", "api.openai.com")
+        assert window == timedelta(minutes=6)
+        _, window = detector._parse_reset_time("20ms", "api.openai.com")
+        assert window == timedelta(milliseconds=20)
+        _, window = detector._parse_reset_time("1h2m3.5s", "api.openai.com")
+        assert window == timedelta(hours=1, minutes=2, seconds=3.5)
+
+        assert parse_duration("6m0") is None
+        assert parse_duration("soon") is None
+
+    def test_detect_openai_request_and_token_buckets(self):
+        """Test OpenAI headers give a request bucket and a token bucket."""
+        detector = RateLimitDetector()
+
+        response = Mock()
+        response.url = "https://api.openai.com/v1/chat/completions"
+        response.status_code = 200
+        response.headers = {
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "499",
+            "x-ratelimit-reset-requests": "120ms",
+            "x-ratelimit-limit-tokens": "30000",
+            "x-ratelimit-remaining-tokens": "27000",
+            "x-ratelimit-reset-tokens": "6s",
+        }
+
+        result = detector.detect_from_response(response)
+        assert result["limit"] == 500
+        assert result["remaining"] == 499
+        # 120ms refills one request, so the whole bucket refills in a minute
+        assert result["window"] == timedelta(minutes=1)
+        assert result["tokens"]["limit"] == 30000
+        assert result["tokens"]["remaining"] == 27000
+        assert result["tokens"]["window"] == timedelta(minutes=1)
+
+    def test_detect_openai_full_bucket(self):
+        """Test a full bucket keeps its reset as the window instead of a default."""
+        detector = RateLimitDetector()
+
+        response = Mock()
+        response.url = "https://api.openai.com/v1/chat/completions"
+        response.status_code = 200
+        response.headers = {
+            "x-ratelimit-limit-requests": "500",
+            "x-ratelimit-remaining-requests": "500",
+            "x-ratelimit-reset-requests": "1m0s",
+        }
+
+        result = detector.detect_from_response(response)
+        assert result["remaining"] == 500
+        assert result["window"] == timedelta(minutes=1)
+
+    def test_get_retry_after_ms(self):
+        """Test retry-after-ms is preferred over Retry-After."""
+        detector = RateLimitDetector()
+
+        assert detector.get_retry_after({"retry-after-ms": "1500", "Retry-After": "2"}) == 1.5
+        assert detector.get_retry_after({"Retry-After": "2"}) == 2
+        assert detector.get_retry_after({}) is None
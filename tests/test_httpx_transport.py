@@ -0,0 +1,217 @@
+"""Tests for the httpx transports."""
+
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from smartratelimit import AsyncRateLimiter, RateLimiter, RateLimitExceeded
+from smartratelimit.httpx_transport import AsyncRateLimitedTransport, RateLimitedTransport
+
+
+def limit_headers(request):
+    """Answer every request with GitHub-style rate limit headers."""
+    return httpx.Response(
+        200,
+        headers={
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": "9999999999",
+        },
+        json={"path": request.url.path},
+    )
+
+
+class Body(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body read from the network rather than preloaded."""
+
+    def __iter__(self):
+        yield b"data"
+
+    async def __aiter__(self):
+        yield b"data"
+
+
+def streamed(request):
+    """Answer with a body the client has to stream."""
+    return httpx.Response(200, stream=Body())
+
+
+class TestRateLimitedTransport:
+    """Test RateLimitedTransport."""
+
+    def test_limits_every_request(self):
+        """Test requests through the client take tokens and fail fast when out."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=2, window="1m")
+        transport = RateLimitedTransport(
+            limiter, transport=httpx.MockTransport(lambda r: httpx.Response(200))
+        )
+
+        with httpx.Client(transport=transport) as client:
+            assert client.get("https://api.example.com/a").status_code == 200
+            assert client.get("https://api.example.com/b").status_code == 200
+            with pytest.raises(RateLimitExceeded):
+                client.get("https://api.example.com/c")
+
+    def test_redirects_are_limited(self):
+        """Test each redirect hop is a request of its own."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=1, window="1m")
+
+        def handler(request):
+            if request.url.path == "/old":
+                return httpx.Response(301, headers={"Location": "https://api.example.com/new"})
+            return httpx.Response(200)
+
+        transport = RateLimitedTransport(limiter, transport=httpx.MockTransport(handler))
+        with httpx.Client(transport=transport, follow_redirects=True) as client:
+            with pytest.raises(RateLimitExceeded):
+                client.get("https://api.example.com/old")
+
+    def test_learns_limits_from_headers(self):
+        """Test response headers update the limiter."""
+        limiter = RateLimiter()
+        transport = RateLimitedTransport(limiter, transport=httpx.MockTransport(limit_headers))
+
+        with httpx.Client(transport=transport) as client:
+            client.get("https://api.github.com/users/octocat")
+
+        status = limiter.get_status("api.github.com")
+        assert status.limit == 5000
+
+    def test_streamed_response_holds_slot(self):
+        """Test a concurrency slot is held until the streamed response is closed."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_concurrency("api.example.com", 1)
+        transport = RateLimitedTransport(limiter, transport=httpx.MockTransport(streamed))
+
+        with httpx.Client(transport=transport) as client:
+            with client.stream("GET", "https://api.example.com/a") as response:
+                with pytest.raises(RateLimitExceeded):
+                    client.get("https://api.example.com/b")
+                assert response.read() == b"data"
+            assert client.get("https://api.example.com/b").status_code == 200
+
+    def test_concurrency_refusal_refunds_tokens(self):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=2, window="1h")
+        limiter.set_concurrency("api.example.com", 1)
+        transport = RateLimitedTransport(limiter, transport=httpx.MockTransport(streamed))
+
+        with httpx.Client(transport=transport) as client:
+            with client.stream("GET", "https://api.example.com/a"):
+                with pytest.raises(RateLimitExceeded):
+                    client.get("https://api.example.com/b")
+            assert client.get("https://api.example.com/b").status_code == 200
+
+    def test_request_extension_overrides(self):
+        """Test per-request settings come from the request extension."""
+        limiter = RateLimiter()
+        limiter.set_limit("api.example.com", limit=5, window="1m")
+        transport = RateLimitedTransport(
+            limiter, transport=httpx.MockTransport(lambda r: httpx.Response(200))
+        )
+
+        with httpx.Client(transport=transport) as client:
+            client.get("https://api.example.com", extensions={"smartratelimit": {"cost": 5}})
+            with pytest.raises(RateLimitExceeded):
+                client.get(
+                    "https://api.example.com", extensions={"smartratelimit": {"max_wait": 0}}
+                )
+
+    def test_actual_cost_reconciled(self):
+        """Test the cost read from the response settles the charged estimate."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=10, window="1h")
+        transport = RateLimitedTransport(
+            limiter,
+            transport=httpx.MockTransport(lambda r: httpx.Response(200, headers={"X-Used": "2"})),
+            cost=5,
+            actual_cost=lambda response: float(response.headers["X-Used"]),
+        )
+
+        with httpx.Client(transport=transport) as client:
+            # Charged 5 each but used 2: three fit in ten tokens instead of two
+            for _ in range(3):
+                client.get("https://api.example.com")
+            with pytest.raises(RateLimitExceeded):
+                client.get("https://api.example.com")
+
+    def test_pool_sized_to_concurrency(self):
+        """Test capped endpoints get a connection pool no larger than their cap."""
+        limiter = RateLimiter()
+        limiter.set_concurrency("api.example.com", 3)
+        transport = RateLimitedTransport(limiter)
+
+        capped = transport._pools.get("https://api.example.com", 3)
+        assert capped._pool._max_connections == 3
+        assert transport._pools.get("https://api.example.com", 3) is capped
+        assert transport._pools.get("https://other.example.com", None) is not capped
+        transport.close()
+
+
+class TestAsyncRateLimitedTransport:
+    """Test AsyncRateLimitedTransport."""
+
+    @pytest.mark.asyncio
+    async def test_limits_every_request(self):
+        """Test requests through the async client take tokens and learn limits."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=1, window="1m")
+        transport = AsyncRateLimitedTransport(limiter, transport=httpx.MockTransport(limit_headers))
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get("https://api.example.com/a")
+            assert response.json() == {"path": "/a"}
+
+        assert limiter.get_status("api.example.com").limit == 5000
+
+    @pytest.mark.asyncio
+    async def test_streamed_response_holds_slot(self):
+        """Test a concurrency slot is held until the async stream is closed."""
+        limiter = AsyncRateLimiter()
+        limiter.set_concurrency("api.example.com", 1)
+        transport = AsyncRateLimitedTransport(limiter, transport=httpx.MockTransport(streamed))
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://api.example.com/a") as response:
+                second = asyncio.ensure_future(client.get("https://api.example.com/b"))
+                await asyncio.sleep(0.1)
+                assert not second.done()
+                assert await response.aread() == b"data"
+            assert (await second).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_concurrency_refusal_refunds_tokens(self):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=2, window="1h")
+        limiter.set_concurrency("api.example.com", 1)
+        transport = AsyncRateLimitedTransport(limiter, transport=httpx.MockTransport(streamed))
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", "https://api.example.com/a"):
+                with pytest.raises(RateLimitExceeded):
+                    await client.get("https://api.example.com/b")
+            assert (await client.get("https://api.example.com/b")).status_code == 200
+
+    @pytest.mark.asyncio
+    async def test_actual_cost_reconciled(self):
+        """Test the async transport settles the charged estimate too."""
+        limiter = AsyncRateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=10, window="1h")
+        transport = AsyncRateLimitedTransport(
+            limiter,
+            transport=httpx.MockTransport(lambda r: httpx.Response(200)),
+            cost=5,
+        )
+
+        async with httpx.AsyncClient(transport=transport) as client:
+            used = {"smartratelimit": {"actual_cost": lambda response: 2}}
+            for _ in range(3):
+                await client.get("https://api.example.com", extensions=used)
+            with pytest.raises(RateLimitExceeded):
+                await client.get("https://api.example.com", extensions=used)
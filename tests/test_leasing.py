@@ -0,0 +1,140 @@
+"""Tests for local token leases."""
+
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from smartratelimit.leasing import LeaseManager, LeasePolicy
+from smartratelimit.storage import MemoryStorage
+
+LIMITS = [("key", 100, timedelta(minutes=1))]
+
+
+class TestLeasePolicy:
+    """Test LeasePolicy sizing."""
+
+    def test_lease_size(self):
+        """Test leases follow the rate but stay within the share of the limit."""
+        policy = LeasePolicy(lease_seconds=2.0, max_share=0.1)
+
+        assert policy.lease_size(0.0, LIMITS) == 1.0
+        assert policy.lease_size(3.0, LIMITS) == 6.0
+        assert policy.lease_size(1000.0, LIMITS) == 10.0
+
+    def test_invalid(self):
+        """Test invalid policies are rejected."""
+        with pytest.raises(ValueError):
+            LeasePolicy(lease_seconds=0)
+        with pytest.raises(ValueError):
+            LeasePolicy(max_share=1.5)
+
+
+class TestLeaseManager:
+    """Test LeaseManager."""
+
+    @patch("smartratelimit.leasing.time.monotonic")
+    def test_spends_locally_and_grows(self, mock_monotonic):
+        """Test leases are spent without storage calls and sized by the local rate."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        policy = LeasePolicy(lease_seconds=1.0, max_share=0.5)
+        mock_monotonic.return_value = 0.0
+
+        # No rate seen yet: the first request only takes its own token
+        assert leases.acquire(LIMITS, 1, policy) == (True, 0.0)
+
+        # One request per 0.1s leases 10 tokens at a time
+        mock_monotonic.return_value = 0.1
+        assert leases.acquire(LIMITS, 1, policy) == (True, 0.0)
+        with patch.object(storage, "acquire_many") as mock_acquire:
+            for _ in range(9):
+                assert leases.acquire(LIMITS, 1, policy) == (True, 0.0)
+            assert not mock_acquire.called
+
+    @patch("smartratelimit.leasing.time.monotonic")
+    def test_release_refunds_unused(self, mock_monotonic):
+        """Test unused leased tokens go back to storage."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        policy = LeasePolicy(lease_seconds=1.0, max_share=0.5)
+        mock_monotonic.return_value = 0.0
+        leases.acquire(LIMITS, 1, policy)
+        mock_monotonic.return_value = 0.01
+        leases.acquire(LIMITS, 1, policy)  # Leases 50 tokens, spends 1
+
+        # Only 50 are left in storage while the lease is held
+        assert storage.acquire("key", 51, 100, timedelta(minutes=1))[0] is False
+
+        leases.release()
+        assert storage.acquire("key", 98, 100, timedelta(minutes=1))[0] is True
+
+    @patch("smartratelimit.leasing.time.monotonic")
+    def test_expired_lease_refilled(self, mock_monotonic):
+        """Test an expired lease is returned before leasing again."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        policy = LeasePolicy(lease_seconds=1.0, max_share=0.5)
+        mock_monotonic.return_value = 0.0
+        leases.acquire(LIMITS, 1, policy)
+        mock_monotonic.return_value = 0.01
+        leases.acquire(LIMITS, 1, policy)
+
+        mock_monotonic.return_value = 5.0
+        with patch.object(storage, "refund", wraps=storage.refund) as mock_refund:
+            assert leases.acquire(LIMITS, 1, policy) == (True, 0.0)
+            mock_refund.assert_called_once_with(LIMITS, 49.0, algorithm="token_bucket")
+
+    def test_refused_when_storage_refuses(self):
+        """Test a request is refused when storage cannot cover even its own tokens."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        limits = [("key", 1, timedelta(minutes=1))]
+
+        assert leases.acquire(limits, 1, LeasePolicy())[0] is True
+        granted, wait = leases.acquire(limits, 1, LeasePolicy())
+        assert granted is False
+        assert wait > 0
+
+    def test_idle_lease_returned_when_it_expires(self):
+        """Test an expired lease is refunded even if no request follows."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        policy = LeasePolicy(lease_seconds=0.1, max_share=0.5)
+        leases.acquire(LIMITS, 1, policy)
+        time.sleep(0.01)
+        leases.acquire(LIMITS, 1, policy)  # Leases a block at the rate seen
+        assert storage.acquire("key", 98, 100, timedelta(minutes=1))[0] is False
+
+        time.sleep(0.3)
+        assert storage.acquire("key", 98, 100, timedelta(minutes=1))[0] is True
+
+    def test_storage_calls_hold_no_other_lease(self):
+        """Test one lease refilling from slow storage does not block the others."""
+        storage = MemoryStorage()
+        leases = LeaseManager(storage)
+        refilling = threading.Event()
+        resume = threading.Event()
+        acquire_many = storage.acquire_many
+
+        def slow_acquire_many(limits, *args, **kwargs):
+            if limits[0][0] == "slow":
+                refilling.set()
+                resume.wait(5)
+            return acquire_many(limits, *args, **kwargs)
+
+        with patch.object(storage, "acquire_many", side_effect=slow_acquire_many):
+            slow = threading.Thread(
+                target=leases.acquire,
+                args=([("slow", 100, timedelta(minutes=1))], 1, LeasePolicy()),
+            )
+            slow.start()
+            assert refilling.wait(5)
+            try:
+                assert leases.acquire(LIMITS, 1, LeasePolicy()) == (True, 0.0)
+                leases.release("key")
+            finally:
+                resume.set()
+                slow.join()
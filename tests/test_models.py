@@ -1,12 +1,18 @@
 """Tests for data models."""
 
 from datetime import datetime, timedelta
-from time import sleep
+from time import monotonic, time
+from unittest.mock import patch
 
 import pytest
 
-from smartratelimit.models import RateLimit, RateLimitStatus, TokenBucket
-
+from smartratelimit.models import (
+    CompositeLimit,
+    RateLimit,
+    RateLimitStatus,
+    TokenBucket,
+    paced_limit,
+)
 
 class TestTokenBucket:
     """Test TokenBucket implementation."""
@@ -28,19 +34,17 @@ class TestTokenBucket:
         """Test failed token consumption when insufficient tokens."""
         bucket = TokenBucket(capacity=10.0, tokens=2.0, refill_rate=1.0)
         # Freeze time to prevent refill during consume
-        from datetime import datetime
-        now = datetime.utcnow()
+        now = monotonic()
         bucket.last_update = now
         assert bucket.consume(5.0, now=now) is False
-        # Tokens should remain unchanged (or slightly more due to refill)
-        assert bucket.tokens <= 2.1  # Allow small tolerance
+        assert bucket.tokens == 2.0
 
     def test_refill(self):
         """Test token refill over time."""
         bucket = TokenBucket(capacity=10.0, tokens=5.0, refill_rate=2.0)
-        initial_time = datetime.utcnow()
+        initial_time = monotonic()
         bucket.last_update = initial_time
-        later_time = initial_time + timedelta(seconds=2)
+        later_time = initial_time + 2
 
         bucket.refill(later_time)
         assert abs(bucket.tokens - 9.0) < 0.1  # 5 + (2 * 2) = 9, allow small tolerance
@@ -48,22 +52,44 @@ class TestTokenBucket:
     def test_refill_capacity_limit(self):
         """Test refill doesn't exceed capacity."""
         bucket = TokenBucket(capacity=10.0, tokens=9.0, refill_rate=5.0)
-        initial_time = datetime.utcnow()
-        later_time = initial_time + timedelta(seconds=1)
+        later_time = bucket.last_update + 1
 
         bucket.refill(later_time)
         assert bucket.tokens == 10.0  # Capped at capacity
 
+    def test_refill_ignores_wall_clock_steps(self):
+        """Test a wall-clock jump does not mint or destroy tokens."""
+        bucket = TokenBucket(capacity=10.0, tokens=5.0, refill_rate=1.0)
+        with patch("time.time", return_value=time() + 3600):
+            bucket.refill(bucket.last_update)
+        assert bucket.tokens == 5.0
+
     def test_wait_time(self):
         """Test wait time calculation."""
         bucket = TokenBucket(capacity=10.0, tokens=2.0, refill_rate=2.0)
         # Freeze time for consistent calculation
-        from datetime import datetime
-        now = datetime.utcnow()
+        now = monotonic()
         bucket.last_update = now
         wait = bucket.wait_time(5.0, now=now)
         assert abs(wait - 1.5) < 0.1  # Need 3 more tokens, at 2/sec = 1.5 seconds
 
+    def test_reserve_books_ahead(self):
+        """Test reserve debits tokens it has to wait for."""
+        bucket = TokenBucket(capacity=1.0, tokens=0.0, refill_rate=1.0)
+        now = bucket.last_update
+
+        assert bucket.reserve(1.0, max_wait=0.5, now=now) == (False, 1.0)
+        assert bucket.tokens == 0.0
+        assert bucket.reserve(1.0, max_wait=None, now=now) == (True, 1.0)
+        assert bucket.tokens == -1.0
+
+    def test_slots(self):
+        """Test the bucket has no per-instance dict."""
+        bucket = TokenBucket(capacity=10.0, tokens=10.0, refill_rate=1.0)
+        assert not hasattr(bucket, "__dict__")
+        with pytest.raises(AttributeError):
+            bucket.extra = 1
+
     def test_wait_time_zero(self):
         """Test wait time is zero when tokens available."""
         bucket = TokenBucket(capacity=10.0, tokens=10.0, refill_rate=1.0)
@@ -157,3 +183,31 @@ class TestRateLimit:
         assert status.limit == 100
         assert status.remaining == 50
 
+
+
+class TestCompositeLimit:
+    """Test CompositeLimit model."""
+
+    def test_windows_sorted_shortest_first(self):
+        """Test windows are ordered and the shortest describes the endpoint."""
+        composite = CompositeLimit([(5000, timedelta(days=1)), (10, timedelta(seconds=1))])
+        assert composite.windows == [(10, timedelta(seconds=1)), (5000, timedelta(days=1))]
+
+        rate_limit = composite.to_rate_limit("https://api.example.com")
+        assert rate_limit.limit == 10
+        assert rate_limit.window == timedelta(seconds=1)
+
+    def test_bucket_limits(self):
+        """Test each window gets its own state key."""
+        composite = CompositeLimit([(10, timedelta(seconds=1)), (100, timedelta(minutes=1))])
+        assert composite.bucket_limits("https://api.example.com:default") == [
+            ("https://api.example.com:default:1s", 10, timedelta(seconds=1)),
+            ("https://api.example.com:default:60s", 100, timedelta(minutes=1)),
+        ]
+
+
+def test_paced_limit():
+    """Test pacing keeps the average rate with a smaller burst."""
+    assert paced_limit(5000, timedelta(hours=1), 1) == (1, timedelta(seconds=0.72))
+    assert paced_limit(100, timedelta(minutes=1), 10) == (10, timedelta(seconds=6))
+    assert paced_limit(10, timedelta(seconds=1), 50) == (10, timedelta(seconds=1))
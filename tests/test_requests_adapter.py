@@ -0,0 +1,130 @@
+"""Tests for the requests transport adapter."""
+
+import gc
+import io
+from unittest.mock import patch
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+from smartratelimit import RateLimiter, RateLimitExceeded
+from smartratelimit.requests_adapter import RateLimitedAdapter
+
+
+def make_response(request, status_code=200, headers=None):
+    """Build the response HTTPAdapter.send would return."""
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response.url = request.url
+    response.request = request
+    response.raw = io.BytesIO(b"{}")
+    return response
+
+
+@pytest.fixture
+def sent():
+    """Record requests the wrapped HTTPAdapter would put on the wire."""
+    requests_sent = []
+
+    def send(self, request, **kwargs):
+        requests_sent.append(request)
+        return make_response(request, headers=getattr(self, "reply_headers", None))
+
+    with patch.object(HTTPAdapter, "send", send):
+        yield requests_sent
+
+
+class TestRateLimitedAdapter:
+    """Test RateLimitedAdapter."""
+
+    def test_limits_session_requests(self, sent):
+        """Test requests through a mounted adapter take tokens and keep session settings."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=2, window="1m")
+        session = requests.Session()
+        session.headers["Authorization"] = "Bearer token"
+        session.mount("https://api.example.com/", RateLimitedAdapter(limiter))
+
+        session.get("https://api.example.com/a")
+        session.get("https://api.example.com/b")
+        with pytest.raises(RateLimitExceeded):
+            session.get("https://api.example.com/c")
+
+        assert len(sent) == 2
+        assert sent[0].headers["Authorization"] == "Bearer token"
+
+    def test_learns_limits_from_headers(self, sent):
+        """Test response headers update the limiter."""
+        limiter = RateLimiter()
+        adapter = RateLimitedAdapter(limiter)
+        adapter.reply_headers = {
+            "X-RateLimit-Limit": "5000",
+            "X-RateLimit-Remaining": "4999",
+            "X-RateLimit-Reset": "9999999999",
+        }
+        session = requests.Session()
+        session.mount("https://", adapter)
+
+        session.get("https://api.github.com/users/octocat")
+        assert limiter.get_status("api.github.com").limit == 5000
+
+    def test_retries_429_once(self):
+        """Test a 429 with Retry-After is retried after the requested wait."""
+        limiter = RateLimiter()
+        replies = iter([429, 200])
+
+        def send(self, request, **kwargs):
+            status = next(replies)
+            return make_response(request, status, {"Retry-After": "1"} if status == 429 else None)
+
+        session = requests.Session()
+        session.mount("https://", RateLimitedAdapter(limiter))
+        with patch.object(HTTPAdapter, "send", send), patch(
+            "smartratelimit.requests_adapter.time.sleep"
+        ) as sleep:
+            assert session.get("https://api.example.com").status_code == 200
+        sleep.assert_called_once_with(1)
+
+    def test_streamed_response_holds_slot(self, sent):
+        """Test a streamed response holds its concurrency slot until closed."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_concurrency("api.example.com", 1)
+        session = requests.Session()
+        session.mount("https://", RateLimitedAdapter(limiter))
+
+        with session.get("https://api.example.com/a", stream=True):
+            with pytest.raises(RateLimitExceeded):
+                session.get("https://api.example.com/b")
+        session.get("https://api.example.com/b")
+
+        # A streamed response that is dropped unclosed frees its slot too
+        session.get("https://api.example.com/c", stream=True)
+        gc.collect()
+        session.get("https://api.example.com/d")
+
+    def test_concurrency_refusal_refunds_tokens(self, sent):
+        """Test a request refused a concurrency slot gives back its tokens."""
+        limiter = RateLimiter(raise_on_limit=True)
+        limiter.set_limit("api.example.com", limit=2, window="1h")
+        limiter.set_concurrency("api.example.com", 1)
+        session = requests.Session()
+        session.mount("https://", RateLimitedAdapter(limiter))
+
+        with session.get("https://api.example.com/a", stream=True):
+            with pytest.raises(RateLimitExceeded):
+                session.get("https://api.example.com/b")
+        session.get("https://api.example.com/b")
+        assert len(sent) == 2
+
+    def test_pool_sized_to_concurrency(self):
+        """Test capped endpoints get urllib3 pools of their concurrency."""
+        limiter = RateLimiter()
+        limiter.set_concurrency("api.example.com", 3)
+        adapter = RateLimitedAdapter(limiter, pool_maxsize=10)
+
+        capped = requests.Request("GET", "https://api.example.com/a").prepare()
+        other = requests.Request("GET", "https://other.example.com/a").prepare()
+        assert adapter.get_connection_with_tls_context(capped, True).pool.maxsize == 3
+        assert adapter.get_connection_with_tls_context(other, True).pool.maxsize == 10
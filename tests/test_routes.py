@@ -0,0 +1,73 @@
+"""Tests for route templates."""
+
+import pytest
+
+from smartratelimit.routes import RouteTable
+
+
+class TestRouteTable:
+    """Test RouteTable matching."""
+
+    def test_match_placeholders(self):
+        """Test placeholders match any single segment."""
+        routes = RouteTable()
+        routes.add("api.github.com", "/repos/{owner}/{repo}/issues")
+
+        assert (
+            routes.match("api.github.com", "/repos/psf/requests/issues")
+            == "/repos/{owner}/{repo}/issues"
+        )
+        assert routes.match("api.github.com", "/repos/psf/issues") is None
+        assert routes.match("api.example.com", "/repos/psf/requests/issues") is None
+
+    def test_deepest_route_wins(self):
+        """Test the most specific registered prefix is used."""
+        routes = RouteTable()
+        routes.add("api.github.com", "/search")
+        routes.add("api.github.com", "/search/code")
+
+        assert routes.match("api.github.com", "/search/code") == "/search/code"
+        assert routes.match("api.github.com", "/search/issues") == "/search"
+        assert routes.match("api.github.com", "/search/code/extra") == "/search/code"
+        assert routes.match("api.github.com", "/users") is None
+
+    def test_literal_preferred_over_placeholder(self):
+        """Test literal segments win, falling back to placeholders."""
+        routes = RouteTable()
+        routes.add("api.github.com", "/repos/{owner}/{repo}")
+        routes.add("api.github.com", "/repos/octocat/hello/issues")
+
+        assert (
+            routes.match("api.github.com", "/repos/octocat/hello/issues")
+            == "/repos/octocat/hello/issues"
+        )
+        # The literal branch dead-ends, so the placeholder route applies
+        assert routes.match("api.github.com", "/repos/octocat/other") == "/repos/{owner}/{repo}"
+
+    def test_equivalent_templates_share_a_route(self):
+        """Test placeholder names do not create separate routes."""
+        routes = RouteTable()
+        assert routes.add("api.github.com", "/users/{user}") == "/users/{user}"
+        assert routes.add("api.github.com", "/users/{name}") == "/users/{user}"
+
+    def test_host_case_and_slashes(self):
+        """Test hosts are case-insensitive and empty segments ignored."""
+        routes = RouteTable()
+        routes.add("API.GitHub.com", "search/")
+
+        assert routes.match("api.github.com", "//search/") == "/search"
+
+    def test_invalid_template(self):
+        """Test an empty template is rejected."""
+        with pytest.raises(ValueError):
+            RouteTable().add("api.github.com", "/")
+
+    def test_clear(self):
+        """Test removing all routes."""
+        routes = RouteTable()
+        routes.add("api.github.com", "/search")
+        assert routes
+
+        routes.clear()
+        assert not routes
+        assert routes.match("api.github.com", "/search") is None
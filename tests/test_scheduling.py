@@ -0,0 +1,293 @@
+"""Tests for waiting request admission."""
+
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from smartratelimit.scheduling import AsyncWaitQueue, WaitQueue, _Schedule
+from smartratelimit.storage import MemoryStorage
+
+
+class TestWaitQueue:
+    """Test WaitQueue."""
+
+    def test_admits_in_arrival_order(self):
+        """Test contending threads go out in the order they arrived, one slot apart."""
+        storage = MemoryStorage()
+        limits = [("key", 20, timedelta(seconds=1))]
+        storage.acquire_many(limits, 20)  # Exhaust the burst
+
+        queue = WaitQueue()
+        admitted = []
+        sleeping = []
+        most_sleeping = []
+        lock = threading.Lock()
+
+        def sleep(wait):
+            with lock:
+                sleeping.append(threading.get_ident())
+                most_sleeping.append(len(sleeping))
+            time.sleep(wait)
+            with lock:
+                sleeping.remove(threading.get_ident())
+
+        def worker(i):
+            granted, _ = queue.admit(
+                lambda max_wait: storage.acquire_many(limits, 1, max_wait=max_wait), None, sleep
+            )
+            assert granted
+            admitted.append((i, time.monotonic()))
+
+        threads = []
+        for i in range(5):
+            thread = threading.Thread(target=worker, args=(i,))
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+
+        assert [i for i, _ in admitted] == list(range(5))
+        gaps = [b - a for (_, a), (_, b) in zip(admitted, admitted[1:])]
+        assert all(gap < 0.1 for gap in gaps)
+        # Only the head sleeps on tokens; the others wait for their turn
+        assert max(most_sleeping) == 1
+        assert len(queue) == 0
+
+    def test_deadline_while_queued(self):
+        """Test a request that cannot be admitted in time leaves the queue."""
+        queue = WaitQueue()
+        release = threading.Event()
+        takes = []
+
+        def take(max_wait):
+            takes.append(max_wait)
+            return (False, 0.5) if max_wait == 0.0 else (True, 0.5)
+
+        head = threading.Thread(target=queue.admit, args=(take, None, lambda wait: release.wait(1)))
+        head.start()
+        while not takes or takes[-1] is not None:
+            time.sleep(0.001)
+
+        # Tokens are free, but a waiter is ahead and the caller will not wait
+        granted, wait = queue.admit(lambda max_wait: (True, 0.0), max_wait=0.0)
+        assert not granted
+        assert 0 < wait <= 0.5
+        assert len(queue) == 1
+
+        release.set()
+        head.join()
+        assert takes == [0.0, None]
+        assert len(queue) == 0
+
+    def test_priority_goes_first(self):
+        """Test higher-priority waiters overtake lower ones, but not the head."""
+        queue = WaitQueue()
+        release = threading.Event()
+        admitted = []
+
+        def take(max_wait):
+            return (False, 0.1) if max_wait == 0.0 else (True, 0.0)
+
+        def worker(name, priority):
+            queue.admit(take, None, priority=priority)
+            admitted.append(name)
+
+        def head_sleep(wait):
+            release.wait(1)
+
+        head = threading.Thread(
+            target=queue.admit,
+            args=(
+                lambda max_wait: (False, 0.1) if max_wait == 0.0 else (True, 0.1),
+                None,
+                head_sleep,
+            ),
+        )
+        head.start()
+        threads = []
+        for name, priority in [("backfill-1", 0), ("backfill-2", 0), ("interactive", 10)]:
+            while len(queue) != len(threads) + 1:
+                time.sleep(0.001)
+            thread = threading.Thread(target=worker, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+        while len(queue) != 4:
+            time.sleep(0.001)
+
+        release.set()
+        for thread in [head] + threads:
+            thread.join()
+        assert admitted == ["interactive", "backfill-1", "backfill-2"]
+
+    def test_fair_shares(self):
+        """Test fair scheduling admits classes in proportion to their weights."""
+        schedule = _Schedule("fair")
+        schedule.push("head", 0, 1.0, 1.0)
+        for i in range(6):
+            schedule.push(f"backfill-{i}", 0, 1.0, 1.0)
+            schedule.push(f"interactive-{i}", 1, 2.0, 1.0)
+
+        order = [schedule.advance() for _ in range(9)]
+        assert sum(name.startswith("interactive") for name in order) == 6
+        assert sum(name.startswith("backfill") for name in order) == 3
+
+        with pytest.raises(ValueError):
+            _Schedule("random")
+        with pytest.raises(ValueError):
+            WaitQueue().admit(lambda max_wait: (True, 0.0), None, weight=0)
+
+
+class TestAsyncWaitQueue:
+    """Test AsyncWaitQueue."""
+
+    @pytest.mark.asyncio
+    async def test_one_sleeper_in_order(self):
+        """Test coroutines are admitted by priority with one timer running at a time."""
+        queue = AsyncWaitQueue()
+        storage = MemoryStorage()
+        limits = [("key", 100, timedelta(seconds=1))]
+        storage.acquire_many(limits, 100)
+        admitted = []
+        sleeping = []
+
+        async def sleep(wait):
+            sleeping.append(wait)
+            assert len(sleeping) - len(admitted) == 1
+            await asyncio.sleep(wait)
+
+        async def take(max_wait):
+            return storage.acquire_many(limits, 1, max_wait=max_wait)
+
+        async def worker(name, priority):
+            granted, _ = await queue.admit(
+                take,
+                None,
+                sleep,
+                priority=priority,
+            )
+            assert granted
+            admitted.append(name)
+
+        tasks = [asyncio.ensure_future(worker("first", 0))]
+        await asyncio.sleep(0)
+        tasks += [asyncio.ensure_future(worker("low", 0)), asyncio.ensure_future(worker("high", 1))]
+        await asyncio.gather(*tasks)
+
+        assert admitted == ["first", "high", "low"]
+        assert len(queue) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_leaves_queue(self):
+        """Test a cancelled coroutine gives up its place without stalling the queue."""
+        queue = AsyncWaitQueue()
+        release = asyncio.Event()
+
+        async def head_sleep(wait):
+            await release.wait()
+
+        async def take(max_wait):
+            return (False, 1.0) if max_wait == 0.0 else (True, 1.0)
+
+        head = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        await asyncio.sleep(0)
+        assert len(queue) == 2
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert len(queue) == 1
+
+        release.set()
+        assert (await head)[0]
+        assert len(queue) == 0
+
+    @pytest.mark.asyncio
+    async def test_waiter_cancelled_as_it_reaches_head(self):
+        """Test a waiter cancelled in the tick the head finishes is passed over."""
+        queue = AsyncWaitQueue()
+        release = asyncio.Event()
+
+        async def head_sleep(wait):
+            await release.wait()
+
+        async def take(max_wait):
+            return (False, 1.0) if max_wait == 0.0 else (True, 1.0)
+
+        head = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        last = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        await asyncio.sleep(0)
+        assert len(queue) == 3
+
+        release.set()
+        waiter.cancel()
+        assert (await asyncio.wait_for(head, 1))[0]
+        assert (await asyncio.wait_for(last, 1))[0]
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert len(queue) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_head_refunds_tokens(self):
+        """Test a head cancelled while sleeping gives back the tokens it booked."""
+        queue = AsyncWaitQueue()
+        storage = MemoryStorage()
+        limits = [("key", 1, timedelta(seconds=10))]
+        storage.acquire_many(limits, 1)
+
+        async def take(max_wait):
+            return storage.acquire_many(limits, 1, max_wait=max_wait)
+
+        async def refund():
+            storage.refund(limits, 1)
+
+        head = asyncio.ensure_future(queue.admit(take, None, refund=refund))
+        await asyncio.sleep(0.01)
+        # The head booked the next token and is sleeping until it is usable
+        assert storage.acquire_many(limits, 1, max_wait=None)[1] > 15
+
+        head.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await head
+        storage.refund(limits, 1)
+        assert 5 < storage.acquire_many(limits, 1, max_wait=None)[1] < 15
+        assert len(queue) == 0
+
+    @pytest.mark.asyncio
+    async def test_deadlines_share_one_timer(self):
+        """Test queued coroutines time out in deadline order from a single timer."""
+        queue = AsyncWaitQueue()
+        release = asyncio.Event()
+
+        async def head_sleep(wait):
+            await release.wait()
+
+        async def take(max_wait):
+            return (False, 1.0) if max_wait == 0.0 else (True, 1.0)
+
+        head = asyncio.ensure_future(queue.admit(take, None, head_sleep))
+        await asyncio.sleep(0)
+        waiters = [
+            asyncio.ensure_future(queue.admit(take, max_wait, head_sleep))
+            for max_wait in (0.05, 0.02, 5.0)
+        ]
+        await asyncio.sleep(0)
+        assert len(queue) == 4
+        assert queue._timer is not None
+
+        done, _ = await asyncio.wait(waiters[:2])
+        assert all(not task.result()[0] for task in done)
+        assert len(queue) == 2
+
+        release.set()
+        assert (await head)[0]
+        assert (await waiters[2])[0]
+        assert len(queue) == 0
+        assert queue._timer is None
@@ -1,9 +1,13 @@
 """Tests for storage backends."""
 
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
 import pytest
 
 from smartratelimit.models import RateLimit, TokenBucket
-from smartratelimit.storage import MemoryStorage
+from smartratelimit.storage import CachedStorage, MemoryStorage, StorageBackend
 
 
 class TestMemoryStorage:
@@ -47,6 +51,160 @@ class TestMemoryStorage:
         assert retrieved.capacity == bucket.capacity
         assert retrieved.tokens == bucket.tokens
 
+    def test_acquire(self):
+        """Test atomic acquire grants until the bucket is empty."""
+        storage = MemoryStorage()
+
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+
+        granted, wait = storage.acquire("key", 1, 2, timedelta(minutes=1))
+        assert granted is False
+        assert 29 < wait <= 30  # 2 tokens per minute
+        assert storage.get_token_bucket("key").tokens < 1
+
+    def test_acquire_reserves_within_max_wait(self):
+        """Test acquire books tokens ahead when the wait is acceptable."""
+        storage = MemoryStorage()
+        storage.acquire("key", 1, 1, timedelta(seconds=10))
+
+        granted, wait = storage.acquire("key", 1, 1, timedelta(seconds=10), max_wait=None)
+        assert granted is True
+        assert 9 < wait <= 10
+        # The booked token is already spent, so the next caller queues behind it
+        granted, wait = storage.acquire("key", 1, 1, timedelta(seconds=10), max_wait=None)
+        assert granted is True
+        assert 19 < wait <= 20
+
+    def test_acquire_gcra(self):
+        """Test GCRA acquire keeps a single TAT per key."""
+        storage = MemoryStorage()
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra") == (
+                True,
+                0.0,
+            )
+        granted, wait = storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")
+        assert granted is False
+        assert 19 < wait <= 20
+        assert storage.get_token_bucket("key") is None
+
+        storage.set_remaining("key", 3, 3, timedelta(minutes=1), algorithm="gcra")
+        assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")[0] is True
+
+        storage.clear("key")
+        assert storage._gcra_tats == {}
+
+    @pytest.mark.parametrize("algorithm", ["sliding_log", "sliding_window"])
+    def test_acquire_sliding(self, algorithm):
+        """Test sliding-window acquire and resync."""
+        storage = MemoryStorage()
+        window = timedelta(minutes=1)
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, window, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire("key", 1, 3, window, algorithm=algorithm)
+        assert granted is False
+        assert 0 < wait <= 120
+
+        storage.set_remaining("key", 1, 3, window, algorithm=algorithm)
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is True
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is False
+
+        storage.clear("key")
+        assert storage._window_logs == {}
+        assert storage._window_counters == {}
+
+    def test_sliding_log_bounded_by_limit(self):
+        """Test the in-process log is capped at the limit."""
+        storage = MemoryStorage()
+        for _ in range(10):
+            storage.acquire(
+                "key", 1, 4, timedelta(seconds=1), max_wait=None, algorithm="sliding_log"
+            )
+        assert len(storage._window_logs["key"]) == 4
+
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_acquire_many(self, algorithm):
+        """Test composite limits debit every window or none."""
+        storage = MemoryStorage()
+        limits = [("key:1s", 5, timedelta(seconds=1)), ("key:60s", 1, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 1, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire_many(limits, 1, algorithm=algorithm)
+        assert granted is False
+        assert 1 < wait <= 120  # Held back by the per-minute window
+
+        # The refused request left the per-second window untouched
+        for _ in range(4):
+            assert (
+                storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0]
+                is True
+            )
+        assert (
+            storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0] is False
+        )
+
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_refund(self, algorithm):
+        """Test refunded tokens can be taken again."""
+        storage = MemoryStorage()
+        limits = [("key", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 3, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+        storage.refund(limits, 2, algorithm=algorithm)
+        assert storage.acquire_many(limits, 2, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+        # Refunding a key without state does nothing
+        storage.refund([("other", 3, timedelta(minutes=1))], 1, algorithm=algorithm)
+        assert (
+            storage.acquire_many([("other", 3, timedelta(minutes=1))], 3, algorithm=algorithm)[0]
+            is True
+        )
+
+    def test_refund_fractional_sliding_log(self):
+        """Test a fractional refund frees the whole entries its charge logged."""
+        storage = MemoryStorage()
+        limits = [("key", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 1.5, algorithm="sliding_log")[0] is True
+        storage.refund(limits, 1.5, algorithm="sliding_log")
+        assert storage.acquire_many(limits, 3, algorithm="sliding_log")[0] is True
+
+    def test_acquire_release_slot(self):
+        """Test concurrency slots are capped, released and expire."""
+        storage = MemoryStorage()
+
+        first = storage.acquire_slot("key:concurrency", 2, 60)
+        second = storage.acquire_slot("key:concurrency", 2, 60)
+        assert first and second and first != second
+        assert storage.acquire_slot("key:concurrency", 2, 60) is None
+
+        storage.release_slot("key:concurrency", first)
+        assert storage.acquire_slot("key:concurrency", 2, 60) is not None
+
+        # A slot that is never released expires
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is None
+        time.sleep(0.1)
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+
+    def test_adapt_rate(self):
+        """Test adaptive rates grow, are cut once per hold and stay in bounds."""
+        storage = MemoryStorage()
+
+        assert storage.adapt_rate("key:adaptive", 10.0) == 10.0
+        assert storage.adapt_rate("key:adaptive", 99.0, increase=0.5) == 10.5
+        assert storage.adapt_rate("key:adaptive", 10.5, factor=0.5, hold=60) == 5.25
+        # A second cut within the hold is skipped
+        assert storage.adapt_rate("key:adaptive", 5.25, factor=0.5, hold=60) == 5.25
+        assert storage.adapt_rate("key:adaptive", 5.25, increase=100, maximum=20) == 20
+        assert storage.adapt_rate("other:adaptive", 3.0, factor=0.1, minimum=2) == 2
+
     def test_clear_specific_endpoint(self):
         """Test clearing specific endpoint."""
         storage = MemoryStorage()
@@ -112,3 +270,230 @@ class TestMemoryStorage:
 
         assert len(errors) == 0
 
+    def test_concurrent_acquire_is_exact(self):
+        """Test threads racing on shared and separate keys never over-admit."""
+        import threading
+
+        storage = MemoryStorage()
+        window = timedelta(hours=1)
+        granted = []
+
+        def worker(i):
+            count = 0
+            for _ in range(200):
+                count += storage.acquire_many([("shared", 100, window)], 1)[0]
+                count += storage.acquire_many(
+                    [(f"own{i}", 50, window), ("shared:all", 300, window)], 1
+                )[0]
+            granted.append(count)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        # 100 from the shared key plus 300 under the combined limit
+        assert sum(granted) == 400
+
+    def test_rate_limits_skip_global_lock(self):
+        """Test rate limit lookups take only their key's stripe, not the global lock."""
+        import threading
+
+        storage = MemoryStorage()
+        rate_limit = RateLimit(
+            endpoint="https://api.example.com",
+            limit=100,
+            remaining=50,
+            reset_time=datetime.utcnow() + timedelta(hours=1),
+            window=timedelta(hours=1),
+        )
+        held = threading.Event()
+        done = threading.Event()
+
+        def hold_global_lock():
+            with storage._lock:
+                held.set()
+                done.wait(1.0)
+
+        holder = threading.Thread(target=hold_global_lock)
+        holder.start()
+        held.wait(1.0)
+        try:
+            start = time.monotonic()
+            storage.set_rate_limit("https://api.example.com", rate_limit)
+            assert storage.get_rate_limit("https://api.example.com") is rate_limit
+            # Neither call waited for the holder to let go
+            assert time.monotonic() - start < 0.5
+        finally:
+            done.set()
+            holder.join()
+
+
+
+class DictStorage(StorageBackend):
+    """Custom backend implementing only the required methods."""
+
+    def __init__(self):
+        self.rate_limits = {}
+        self.buckets = {}
+
+    def get_rate_limit(self, endpoint):
+        return self.rate_limits.get(endpoint)
+
+    def set_rate_limit(self, endpoint, rate_limit):
+        self.rate_limits[endpoint] = rate_limit
+
+    def get_token_bucket(self, key):
+        return self.buckets.get(key)
+
+    def set_token_bucket(self, key, bucket):
+        self.buckets[key] = bucket
+
+    def clear(self, endpoint=None):
+        self.rate_limits.clear()
+        self.buckets.clear()
+
+
+class TestStorageBackendDefaults:
+    """Test the limiter primitives a custom backend inherits."""
+
+    def test_token_bucket_primitives(self):
+        """Test acquire, refund and set_remaining work from get/set_token_bucket."""
+        storage = DictStorage()
+        limits = [("key:1s", 2, timedelta(seconds=1)), ("key:1m", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 2)[0] is True
+        granted, wait = storage.acquire_many(limits, 1)
+        assert granted is False
+        assert 0 < wait <= 1
+
+        storage.refund(limits, 1)
+        assert storage.acquire_many(limits, 1)[0] is True
+
+        storage.set_remaining("key:1s", 0, 2, timedelta(seconds=1))
+        assert storage.acquire("key:1s", 1, 2, timedelta(seconds=1))[0] is False
+
+    def test_optional_features(self):
+        """Test features without a default say so."""
+        storage = DictStorage()
+
+        with pytest.raises(NotImplementedError):
+            storage.acquire("key", 1, 2, timedelta(seconds=1), algorithm="gcra")
+        with pytest.raises(NotImplementedError):
+            storage.acquire_slot("key", 1, 60)
+        with pytest.raises(NotImplementedError):
+            storage.adapt_rate("key", 10.0)
+
+    def test_limiter_uses_custom_backend(self):
+        """Test a backend written against the required methods limits requests."""
+        from smartratelimit import RateLimiter
+
+        limiter = RateLimiter(storage=DictStorage())
+        limiter.set_limit("api.example.com", limit=2, window="1m")
+        assert limiter.try_acquire("https://api.example.com")[0] is True
+        assert limiter.try_acquire("https://api.example.com")[0] is True
+        assert limiter.try_acquire("https://api.example.com")[0] is False
+
+
+class TestCachedStorage:
+    """Test CachedStorage."""
+
+    def _rate_limit(self, limit: int) -> RateLimit:
+        return RateLimit(
+            endpoint="https://api.example.com",
+            limit=limit,
+            remaining=limit,
+            reset_time=datetime.utcnow() + timedelta(hours=1),
+            window=timedelta(hours=1),
+        )
+
+    def test_reads_cached_within_ttl(self):
+        """Test reads hit the backend once per TTL."""
+        backend = MemoryStorage()
+        backend.set_rate_limit("https://api.example.com", self._rate_limit(100))
+        storage = CachedStorage(backend, ttl=60)
+
+        with patch.object(backend, "get_rate_limit", wraps=backend.get_rate_limit) as mock_get:
+            for _ in range(5):
+                assert storage.get_rate_limit("https://api.example.com").limit == 100
+            assert mock_get.call_count == 1
+
+    def test_writes_coalesced_until_flush(self):
+        """Test repeated writes reach the backend once, on flush."""
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, ttl=60, flush_interval=60)
+
+        with patch.object(backend, "set_rate_limit", wraps=backend.set_rate_limit) as mock_set:
+            for limit in (10, 20, 30):
+                storage.set_rate_limit("https://api.example.com", self._rate_limit(limit))
+            assert storage.get_rate_limit("https://api.example.com").limit == 30
+            assert backend.get_rate_limit("https://api.example.com") is None
+
+            storage.flush()
+            assert mock_set.call_count == 1
+        assert backend.get_rate_limit("https://api.example.com").limit == 30
+        storage.close()
+
+    def test_failed_write_kept_for_next_flush(self):
+        """Test changes a backend fails to write are retried, newer ones winning."""
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, ttl=60, flush_interval=60)
+        set_token_bucket = backend.set_token_bucket
+        failures = [ConnectionError("backend down")]
+
+        def flaky_set_token_bucket(key, bucket):
+            if failures:
+                raise failures.pop()
+            set_token_bucket(key, bucket)
+
+        storage.set_token_bucket("a", TokenBucket(capacity=10, tokens=1, refill_rate=1))
+        storage.set_token_bucket("b", TokenBucket(capacity=10, tokens=2, refill_rate=1))
+        with patch.object(backend, "set_token_bucket", side_effect=flaky_set_token_bucket):
+            storage.flush()
+            assert backend.get_token_bucket("a") is None
+            assert backend.get_token_bucket("b") is None
+
+            # A change made since the failure is newer than the one put back
+            storage.set_token_bucket("b", TokenBucket(capacity=10, tokens=3, refill_rate=1))
+            storage.flush()
+        assert backend.get_token_bucket("a").tokens == pytest.approx(1, abs=0.1)
+        assert backend.get_token_bucket("b").tokens == pytest.approx(3, abs=0.1)
+        storage.close()
+
+    def test_acquire_sees_pending_remaining(self):
+        """Test pending resyncs are written before an atomic acquire."""
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, flush_interval=60)
+        window = timedelta(minutes=1)
+
+        storage.set_remaining("key", 1, 10, window)
+        assert storage.acquire("key", 1, 10, window)[0] is True
+        assert storage.acquire("key", 1, 10, window)[0] is False
+        storage.close()
+
+    def test_background_flush(self):
+        """Test the flusher writes pending changes on its own."""
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, flush_interval=0.01)
+
+        storage.set_rate_limit("https://api.example.com", self._rate_limit(100))
+        deadline = time.monotonic() + 2
+        while (
+            backend.get_rate_limit("https://api.example.com") is None
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.01)
+        assert backend.get_rate_limit("https://api.example.com").limit == 100
+        storage.close()
+
+    def test_clear_drops_pending(self):
+        """Test clearing an endpoint drops its pending writes."""
+        backend = MemoryStorage()
+        storage = CachedStorage(backend, flush_interval=60)
+
+        storage.set_rate_limit("https://api.example.com", self._rate_limit(100))
+        storage.clear("https://api.example.com")
+        storage.flush()
+        assert storage.get_rate_limit("https://api.example.com") is None
+        assert backend.get_rate_limit("https://api.example.com") is None
@@ -1,7 +1,9 @@
 """Tests for Redis storage backend."""
 
+import time
 import pytest
 from datetime import datetime, timedelta
+from unittest.mock import patch
 
 from smartratelimit.models import RateLimit, TokenBucket
 from smartratelimit.storage import RedisStorage
@@ -79,6 +81,176 @@ class TestRedisStorage:
 
         storage.clear()  # Clean up
 
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_acquire(self):
+        """Test atomic acquire against Redis."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+        granted, wait = storage.acquire("key", 1, 2, timedelta(minutes=1))
+        assert granted is False
+        assert wait > 0
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_acquire_reloads_flushed_script(self):
+        """Test acquire recovers when Redis drops its script cache."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+
+        assert storage.acquire("key", 1, 5, timedelta(minutes=1)) == (True, 0.0)
+        storage.redis_client.script_flush()
+        assert storage.acquire("key", 1, 5, timedelta(minutes=1)) == (True, 0.0)
+
+        bucket = storage.get_token_bucket("key")
+        assert 2.9 < bucket.tokens < 3.1
+        assert abs(bucket.last_update - time.monotonic()) < 5
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_acquire_gcra(self):
+        """Test GCRA acquire against Redis."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra") == (
+                True,
+                0.0,
+            )
+        granted, wait = storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")
+        assert granted is False
+        assert 19 < wait <= 20
+
+        storage.set_remaining("key", 3, 3, timedelta(minutes=1), algorithm="gcra")
+        assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")[0] is True
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    @pytest.mark.parametrize("algorithm", ["sliding_log", "sliding_window"])
+    def test_acquire_sliding(self, algorithm):
+        """Test sliding-window acquire against Redis."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+        window = timedelta(minutes=1)
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, window, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire("key", 1, 3, window, algorithm=algorithm)
+        assert granted is False
+        assert 0 < wait <= 120
+
+        # The resync is one atomic script call
+        with patch.object(storage, "_run_script", wraps=storage._run_script) as run_script:
+            storage.set_remaining("key", 1, 3, window, algorithm=algorithm)
+        assert run_script.call_count == 1
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is True
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is False
+
+        storage.set_remaining("key", 3, 3, window, algorithm=algorithm)
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is True
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_acquire_many(self, algorithm):
+        """Test composite limits debit every window or none."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+        limits = [("key:1s", 5, timedelta(seconds=1)), ("key:60s", 1, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 1, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire_many(limits, 1, algorithm=algorithm)
+        assert granted is False
+        assert 1 < wait <= 120  # Held back by the per-minute window
+
+        # The refused request left the per-second window untouched
+        for _ in range(4):
+            assert (
+                storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0]
+                is True
+            )
+        assert (
+            storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0] is False
+        )
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_refund(self, algorithm):
+        """Test refunded tokens can be taken again."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+        limits = [("key", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 3, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+        storage.refund(limits, 2, algorithm=algorithm)
+        assert storage.acquire_many(limits, 2, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_refund_fractional_sliding_log(self):
+        """Test a fractional refund frees the whole entries its charge logged."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+        limits = [("key", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 1.5, algorithm="sliding_log")[0] is True
+        storage.refund(limits, 1.5, algorithm="sliding_log")
+        assert storage.acquire_many(limits, 3, algorithm="sliding_log")[0] is True
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_acquire_release_slot(self):
+        """Test concurrency slots are capped, released and expire."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+
+        first = storage.acquire_slot("key:concurrency", 2, 60)
+        second = storage.acquire_slot("key:concurrency", 2, 60)
+        assert first and second and first != second
+        assert storage.acquire_slot("key:concurrency", 2, 60) is None
+
+        storage.release_slot("key:concurrency", first)
+        assert storage.acquire_slot("key:concurrency", 2, 60) is not None
+
+        # A slot that is never released expires
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is None
+        time.sleep(0.1)
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+
+        storage.clear()  # Clean up
+
+    @pytest.mark.skipif(not redis_available(), reason="Redis not available")
+    def test_adapt_rate(self):
+        """Test adaptive rates grow, are cut once per hold and stay in bounds."""
+        storage = RedisStorage("redis://localhost:6379/0", key_prefix="test:ratelimit:")
+        storage.clear()  # Clean up
+
+        assert storage.adapt_rate("key:adaptive", 10.0) == 10.0
+        assert storage.adapt_rate("key:adaptive", 99.0, increase=0.5) == 10.5
+        assert storage.adapt_rate("key:adaptive", 10.5, factor=0.5, hold=60) == 5.25
+        # A second cut within the hold is skipped
+        assert storage.adapt_rate("key:adaptive", 5.25, factor=0.5, hold=60) == 5.25
+        assert storage.adapt_rate("key:adaptive", 5.25, increase=100, maximum=20) == 20
+        assert storage.adapt_rate("other:adaptive", 3.0, factor=0.1, minimum=2) == 2
+
+        storage.clear()  # Clean up
+
     @pytest.mark.skipif(not redis_available(), reason="Redis not available")
     def test_clear_specific_endpoint(self):
         """Test clearing specific endpoint."""
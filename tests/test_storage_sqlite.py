@@ -2,6 +2,7 @@
 
 import os
 import tempfile
+import time
 from datetime import datetime, timedelta
 
 import pytest
@@ -70,6 +71,142 @@ class TestSQLiteStorage:
         assert retrieved.capacity == bucket.capacity
         assert retrieved.tokens == bucket.tokens
         assert retrieved.refill_rate == bucket.refill_rate
+        # last_update round-trips through wall-clock time
+        assert abs(retrieved.last_update - bucket.last_update) < 0.01
+
+    def test_acquire(self):
+        """Test atomic acquire persists the bucket."""
+        storage = SQLiteStorage(":memory:")
+
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+        assert storage.acquire("key", 1, 2, timedelta(minutes=1)) == (True, 0.0)
+        granted, wait = storage.acquire("key", 1, 2, timedelta(minutes=1))
+        assert granted is False
+        assert wait > 0
+
+        bucket = storage.get_token_bucket("key")
+        assert bucket.capacity == 2.0
+        assert bucket.tokens < 1
+
+    def test_acquire_shared_file(self):
+        """Test two storage instances on one file never over-admit."""
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".db") as f:
+            db_path = f.name
+
+        try:
+            first = SQLiteStorage(db_path)
+            second = SQLiteStorage(db_path)
+            results = [
+                storage.acquire("key", 1, 3, timedelta(hours=1))[0]
+                for storage in (first, second, first, second, first)
+            ]
+            assert results.count(True) == 3
+        finally:
+            if os.path.exists(db_path):
+                os.unlink(db_path)
+
+    def test_acquire_gcra(self):
+        """Test GCRA acquire against SQLite."""
+        storage = SQLiteStorage(":memory:")
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra") == (
+                True,
+                0.0,
+            )
+        granted, wait = storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")
+        assert granted is False
+        assert 19 < wait <= 20
+
+        storage.set_remaining("key", 1, 3, timedelta(minutes=1), algorithm="gcra")
+        assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")[0] is True
+        assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")[0] is False
+
+        storage.clear("key")
+        assert storage.acquire("key", 1, 3, timedelta(minutes=1), algorithm="gcra")[0] is True
+
+    @pytest.mark.parametrize("algorithm", ["sliding_log", "sliding_window"])
+    def test_acquire_sliding(self, algorithm):
+        """Test sliding-window acquire against SQLite."""
+        storage = SQLiteStorage(":memory:")
+        window = timedelta(minutes=1)
+
+        for _ in range(3):
+            assert storage.acquire("key", 1, 3, window, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire("key", 1, 3, window, algorithm=algorithm)
+        assert granted is False
+        assert 0 < wait <= 120
+
+        storage.set_remaining("key", 1, 3, window, algorithm=algorithm)
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is True
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is False
+
+        storage.clear("key")
+        assert storage.acquire("key", 1, 3, window, algorithm=algorithm)[0] is True
+
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_acquire_many(self, algorithm):
+        """Test composite limits debit every window or none."""
+        storage = SQLiteStorage(":memory:")
+        limits = [("key:1s", 5, timedelta(seconds=1)), ("key:60s", 1, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 1, algorithm=algorithm) == (True, 0.0)
+        granted, wait = storage.acquire_many(limits, 1, algorithm=algorithm)
+        assert granted is False
+        assert 1 < wait <= 120  # Held back by the per-minute window
+
+        # The refused request left the per-second window untouched
+        for _ in range(4):
+            assert (
+                storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0]
+                is True
+            )
+        assert (
+            storage.acquire("key:1s", 1, 5, timedelta(seconds=1), algorithm=algorithm)[0] is False
+        )
+
+    @pytest.mark.parametrize("algorithm", ["token_bucket", "gcra", "sliding_log", "sliding_window"])
+    def test_refund(self, algorithm):
+        """Test refunded tokens can be taken again."""
+        storage = SQLiteStorage(":memory:")
+        limits = [("key", 3, timedelta(minutes=1))]
+
+        assert storage.acquire_many(limits, 3, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+        storage.refund(limits, 2, algorithm=algorithm)
+        assert storage.acquire_many(limits, 2, algorithm=algorithm)[0] is True
+        assert storage.acquire_many(limits, 1, algorithm=algorithm)[0] is False
+
+    def test_acquire_release_slot(self):
+        """Test concurrency slots are capped, released and expire."""
+        storage = SQLiteStorage(":memory:")
+
+        first = storage.acquire_slot("key:concurrency", 2, 60)
+        second = storage.acquire_slot("key:concurrency", 2, 60)
+        assert first and second and first != second
+        assert storage.acquire_slot("key:concurrency", 2, 60) is None
+
+        storage.release_slot("key:concurrency", first)
+        assert storage.acquire_slot("key:concurrency", 2, 60) is not None
+
+        # A slot that is never released expires
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is None
+        time.sleep(0.1)
+        assert storage.acquire_slot("other:concurrency", 1, 0.05) is not None
+
+    def test_adapt_rate(self):
+        """Test adaptive rates grow, are cut once per hold and stay in bounds."""
+        storage = SQLiteStorage(":memory:")
+
+        assert storage.adapt_rate("key:adaptive", 10.0) == 10.0
+        assert storage.adapt_rate("key:adaptive", 99.0, increase=0.5) == 10.5
+        assert storage.adapt_rate("key:adaptive", 10.5, factor=0.5, hold=60) == 5.25
+        # A second cut within the hold is skipped
+        assert storage.adapt_rate("key:adaptive", 5.25, factor=0.5, hold=60) == 5.25
+        assert storage.adapt_rate("key:adaptive", 5.25, increase=100, maximum=20) == 20
+        assert storage.adapt_rate("other:adaptive", 3.0, factor=0.1, minimum=2) == 2
 
     def test_persistence(self):
         """Test that data persists across storage instances."""